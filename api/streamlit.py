@@ -1,33 +1,50 @@
 from http.server import HTTPServer, BaseHTTPRequestHandler
-import streamlit.web.bootstrap as bootstrap
+import json
+import signal
 import sys
 import os
-import threading
-import time
 
-def run_streamlit():
-    sys.argv = ["streamlit", "run", "frontend/app.py", "--server.port=8501", "--server.address=0.0.0.0"]
-    bootstrap.run()
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import settings
+from supervisor import ProcessSupervisor
+
+supervisor = ProcessSupervisor(
+    ["streamlit", "run", "frontend/app.py", "--server.port=8501", "--server.address=0.0.0.0"],
+    "http://localhost:8501/_stcore/health",
+    check_interval=settings.STREAMLIT_HEALTH_INTERVAL,
+    restart_backoff_max=settings.STREAMLIT_RESTART_BACKOFF_MAX
+)
 
 class StreamlitHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        self.wfile.write(b"Streamlit app is running")
+        status = supervisor.status()
+        ready = status["state"] == "ready"
+        self.send_response(200 if ready else 503)
+        if self.path == "/health":
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({"streamlit": status}).encode())
+        else:
+            self.send_header('Content-type', 'text/html')
+            self.end_headers()
+            self.wfile.write(b"Streamlit app is running" if ready else b"Streamlit app is starting")
 
 def run_server():
     server = HTTPServer(('0.0.0.0', int(os.environ.get('PORT', 8080))), StreamlitHandler)
     server.serve_forever()
 
 if __name__ == "__main__":
-    # Start Streamlit in a separate thread
-    streamlit_thread = threading.Thread(target=run_streamlit)
-    streamlit_thread.daemon = True
-    streamlit_thread.start()
-    
-    # Give Streamlit time to start
-    time.sleep(2)
-    
-    # Start the HTTP server
-    run_server() 
\ No newline at end of file
+    # Start Streamlit as a supervised child process
+    supervisor.start()
+
+    # Wait until it answers its health check
+    if not supervisor.wait_ready(settings.STREAMLIT_STARTUP_TIMEOUT):
+        print(f"Streamlit not ready after {settings.STREAMLIT_STARTUP_TIMEOUT}s; serving anyway")
+
+    # Start the HTTP server; SIGTERM exits through finally so the child is stopped too
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    try:
+        run_server()
+    finally:
+        supervisor.stop()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules shared with the Streamlit app (services/ at the project root) are
+# imported from there instead of being copied into the backend
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
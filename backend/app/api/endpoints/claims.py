@@ -1,9 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any
-from app.services.fraud_detector import FraudDetector
-from app.services.eligibility import EligibilityChecker
-from app.services.llm_service import DeepSeekLLM
-from app.schemas.claim import ClaimCreate, ClaimResponse
+from fastapi import APIRouter, HTTPException, Depends, Path, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+import asyncio
+import json
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.core.container import ServiceContainer, get_services
+from app.schemas.claim import ClaimAccepted, ClaimCreate, ClaimStatus
+from app.services.claim_jobs import QUEUED, explanation_context
+from app.services.history import (
+    InvalidCursor, decode_cursor, etag_matches, fetch_history_page, history_etag
+)
 from app.db.session import get_db
 from sqlalchemy.orm import Session
 import logging
@@ -14,64 +21,69 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/submit", response_model=ClaimResponse)
-async def submit_claim(claim: ClaimCreate, db: Session = Depends(get_db)):
+def _claim_data(claim: ClaimCreate) -> Dict[str, Any]:
+    # Convert claim data to dict for processing
+    claim_data = claim.dict()
+    logger.info(f"Processing claim data: {claim_data}")
+    
+    # Ensure numeric types
+    claim_data['earnings'] = float(claim_data['earnings'])
+    claim_data['employment_months'] = int(claim_data['employment_months'])
+    logger.info(f"Converted numeric values: {claim_data}")
+    return claim_data
+
+async def _evaluate_claim(claim: ClaimCreate, services: ServiceContainer) -> Dict[str, Any]:
+    """Fraud and eligibility checks for one claim; returns the explanation context"""
+    claim_data = _claim_data(claim)
+    logger.info("Starting fraud detection and eligibility check")
+    explanation_context = await services.evaluate_claim(claim_data)
+    logger.info(f"Claim status determined: {explanation_context['status']}")
+    return explanation_context
+
+@router.post("/submit", status_code=202, response_model=ClaimAccepted)
+async def submit_claim(
+    claim: ClaimCreate,
+    response: Response,
+    services: ServiceContainer = Depends(get_services)
+):
+    """Accept a claim for processing.
+
+    Answers 202 with the claim id as soon as the claim is stored; fraud
+    checks, eligibility and the explanation run on the background workers.
+    Poll the Location URL (with ``wait`` to long-poll) for the decision.
+    """
     try:
         logger.info(f"Received claim submission: {claim.dict()}")
-        
-        # Initialize services
-        fraud_detector = FraudDetector()
-        eligibility_checker = EligibilityChecker()
-        
-        # Convert claim data to dict for processing
-        claim_data = claim.dict()
-        logger.info(f"Processing claim data: {claim_data}")
-        
-        # Ensure numeric types
-        claim_data['earnings'] = float(claim_data['earnings'])
-        claim_data['employment_months'] = int(claim_data['employment_months'])
-        logger.info(f"Converted numeric values: {claim_data}")
-        
-        # Perform fraud detection
-        logger.info("Starting fraud detection")
-        fraud_result = fraud_detector.analyze_claim(claim_data)
-        logger.info(f"Fraud detection result: {fraud_result}")
-        
-        # Check eligibility
-        logger.info("Checking eligibility")
-        failed_rules = eligibility_checker.evaluate(claim_data)
-        logger.info(f"Eligibility check result: {failed_rules}")
-        
-        # Determine status
-        status = "approved" if not failed_rules else "denied"
-        logger.info(f"Claim status determined: {status}")
-        
-        # Generate explanation
-        logger.info("Generating explanation")
-        llm = DeepSeekLLM()
-        explanation_context = {
-            "status": status,
-            "fraud_analysis": fraud_result,
-            "eligibility": {
-                "failed_rules": [r["message"] for r in failed_rules]
-            },
-            "user_data": claim_data
-        }
-        logger.info(f"Explanation context: {explanation_context}")
-        
-        explanation = llm.generate_explanation(explanation_context)
-        logger.info(f"Generated explanation: {explanation}")
-        
-        response = ClaimResponse(
-            status=status,
-            explanation=explanation,
-            fraud_score=fraud_result["score"],
-            failed_rules=[r["message"] for r in failed_rules]
-        )
-        logger.info(f"Final response: {response.dict()}")
-        
-        return response
-        
+        claim_id = await run_blocking(services.job_queue.enqueue, _claim_data(claim))
+    except ValueError as e:
+        logger.error(f"Invalid data format: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=400, detail=f"Invalid data format: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error queueing claim: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    services.workers.notify()
+    logger.info(f"Claim {claim_id} queued")
+    response.headers["Location"] = f"{settings.API_V1_STR}/claims/{claim_id}"
+    return ClaimAccepted(claim_id=claim_id, state=QUEUED)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/submit/stream")
+async def submit_claim_stream(
+    claim: ClaimCreate,
+    services: ServiceContainer = Depends(get_services)
+):
+    """Server-sent events variant of /submit.
+
+    Sends a ``decision`` event (status, fraud_score, failed_rules) as soon as
+    the checks finish, then ``token`` events as the explanation is
+    generated, and a final ``done`` event with the full explanation.
+    """
+    try:
+        logger.info(f"Received streaming claim submission: {claim.dict()}")
+        explanation_context = await _evaluate_claim(claim, services)
     except ValueError as e:
         logger.error(f"Invalid data format: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail=f"Invalid data format: {str(e)}")
@@ -79,7 +91,218 @@ async def submit_claim(claim: ClaimCreate, db: Session = Depends(get_db)):
         logger.error(f"Error processing claim: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def events() -> AsyncIterator[str]:
+        yield _sse("decision", {
+            "status": explanation_context["status"],
+            "fraud_score": explanation_context["fraud_analysis"]["score"],
+            "failed_rules": explanation_context["eligibility"]["failed_rules"]
+        })
+        parts = []
+        async for token in services.llm.astream_explanation(explanation_context):
+            parts.append(token)
+            yield _sse("token", {"text": token})
+        yield _sse("done", {"explanation": "".join(parts).strip()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class _DuplexStreamingResponse(Response):
+    """Streamed response for endpoints that are still reading the request body.
+
+    StreamingResponse polls receive() for a client disconnect while it
+    streams, which would swallow the body chunks the generator is reading.
+    This one only sends; the generator is the only reader, and a disconnect
+    surfaces from request.stream() as ClientDisconnect instead.
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], status_code: int = 200, media_type: Optional[str] = None):
+        self.body_iterator = content
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers()
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+async def _ndjson_lines(stream: AsyncIterator[bytes], max_line: int) -> AsyncIterator[Optional[bytes]]:
+    """Split a streamed request body into lines without buffering all of it.
+
+    Each chunk is only scanned once. A line longer than ``max_line`` bytes
+    is yielded as None and the rest of it, up to the next newline, dropped.
+    """
+    parts: List[bytes] = []
+    size = 0
+    skipping = False
+    async for chunk in stream:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end < 0 else chunk[start:end]
+            if not skipping:
+                size += len(piece)
+                if size > max_line:
+                    parts, skipping = [], True
+                    yield None
+                elif piece:
+                    parts.append(piece)
+            if end < 0:
+                break
+            if not skipping:
+                yield b"".join(parts)
+            parts, size, skipping = [], 0, False
+            start = end + 1
+    if parts and not skipping:
+        yield b"".join(parts)
+
+def _analyze_chunk(
+    services: ServiceContainer,
+    claims: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[List[Dict]]]:
+    fraud_results = services.fraud_detector.analyze_claims(claims)
+    failed_rules = [services.eligibility_checker.evaluate(claim_data) for claim_data in claims]
+    return fraud_results, failed_rules
+
+async def _process_chunk(
+    services: ServiceContainer,
+    chunk: List[Tuple[int, Dict[str, Any]]],
+    explain: bool
+) -> List[Dict[str, Any]]:
+    claims = [claim_data for _, claim_data in chunk]
+    fraud_results, failed_rules = await run_blocking(_analyze_chunk, services, claims)
+    contexts = [
+        explanation_context(claim_data, fraud_result, failed)
+        for claim_data, fraud_result, failed in zip(claims, fraud_results, failed_rules)
+    ]
+    explanations = [None] * len(contexts)
+    if explain:
+        explanations = await asyncio.gather(
+            *(services.llm.agenerate_explanation(context) for context in contexts)
+        )
+    return [
+        {
+            "line": line,
+            "ssn_last4": context["user_data"]["ssn_last4"],
+            "status": context["status"],
+            "fraud_score": context["fraud_analysis"]["score"],
+            "failed_rules": context["eligibility"]["failed_rules"],
+            "explanation": explanation
+        }
+        for (line, _), context, explanation in zip(chunk, contexts, explanations)
+    ]
+
+async def _process_batch(
+    services: ServiceContainer,
+    lines: AsyncIterator[Optional[bytes]],
+    chunk_size: int,
+    explain: bool
+) -> AsyncIterator[bytes]:
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    processed = errors = 0
+    line_number = 0
+
+    async def flush(chunk):
+        try:
+            results = await _process_chunk(services, chunk, explain)
+        except Exception as e:
+            logger.error(f"Error processing batch chunk: {str(e)}", exc_info=True)
+            results = [{"line": line, "error": str(e)} for line, _ in chunk]
+        return [(json.dumps(result) + "\n").encode() for result in results]
+
+    async for raw in lines:
+        line_number += 1
+        if raw is None:
+            errors += 1
+            message = f"Line longer than {settings.BATCH_MAX_LINE_BYTES} bytes"
+            yield (json.dumps({"line": line_number, "error": message}) + "\n").encode()
+            continue
+        if not raw.strip():
+            continue
+        try:
+            chunk.append((line_number, ClaimCreate(**json.loads(raw)).dict()))
+        except ValueError as e:
+            errors += 1
+            yield (json.dumps({"line": line_number, "error": f"Invalid claim: {str(e)}"}) + "\n").encode()
+            continue
+        if len(chunk) >= chunk_size:
+            for result in await flush(chunk):
+                yield result
+            processed += len(chunk)
+            chunk = []
+    if chunk:
+        for result in await flush(chunk):
+            yield result
+        processed += len(chunk)
+    logger.info(f"Batch finished: {processed} claims processed, {errors} invalid lines")
+
+@router.post("/batch")
+async def submit_claims_batch(
+    request: Request,
+    explain: bool = Query(False, description="Generate an LLM explanation for every claim"),
+    chunk_size: int = Query(settings.BATCH_CHUNK_SIZE, ge=1, le=settings.BATCH_MAX_CHUNK_SIZE),
+    services: ServiceContainer = Depends(get_services)
+):
+    """Process an NDJSON stream of claims, streaming NDJSON results back.
+
+    Records are handled in chunks of ``chunk_size``, so memory stays
+    constant however large the upload is. Each output line carries the
+    1-based input ``line`` it answers; malformed or overlong records
+    produce an ``error`` line instead of failing the batch.
+    """
+    return _DuplexStreamingResponse(
+        _process_batch(
+            services,
+            _ndjson_lines(request.stream(), settings.BATCH_MAX_LINE_BYTES),
+            chunk_size,
+            explain
+        ),
+        media_type="application/x-ndjson"
+    )
+
 @router.get("/history/{ssn_last4}")
-async def get_claim_history(ssn_last4: str, db: Session = Depends(get_db)):
-    # Implementation for getting claim history
-    pass 
\ No newline at end of file
+async def get_claim_history(
+    request: Request,
+    ssn_last4: str = Path(..., pattern=r"^\d{4}$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Claim history and decisions for an SSN, newest first.
+
+    Pages with an opaque ``cursor`` (the previous page's ``next_cursor``).
+    Responses carry an ETag; a matching If-None-Match gets 304 after an
+    index-only version check instead of the page queries.
+    """
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    etag = await run_blocking(history_etag, db, ssn_last4, cursor, limit)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    page = await run_blocking(fetch_history_page, db, ssn_last4, position, limit)
+    return JSONResponse(page, headers={"ETag": etag})
+
+@router.get("/{claim_id}", response_model=ClaimStatus)
+async def get_claim(
+    claim_id: int,
+    wait: float = Query(0, ge=0, le=settings.JOB_MAX_WAIT, description="Seconds to wait for the decision"),
+    services: ServiceContainer = Depends(get_services)
+):
+    """Processing state of a submitted claim, with its decision once done.
+
+    With ``wait`` the request is held until the claim is done or failed
+    (or the wait runs out), so clients need not poll in a tight loop.
+    """
+    status = await services.workers.wait(claim_id, wait)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Claim not found")
+    return status
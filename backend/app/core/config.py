@@ -20,6 +20,52 @@ class Settings(BaseSettings):
     
     # Together AI
     TOGETHER_API_KEY: str = os.getenv("TOGETHER_API_KEY", "")
+    TOGETHER_API_BASE: str = "https://api.together.xyz/v1"
+    LLM_MODEL: str = "mistralai/Mixtral-8x7B-Instruct-v0.1"
+    LLM_TIMEOUT: float = 30.0
+    # Provider quota: requests per minute with a short burst allowance.
+    # Calls beyond LLM_MAX_CONCURRENCY wait in a queue of LLM_MAX_QUEUE;
+    # a call that cannot finish within LLM_DEADLINE seconds (or finds the
+    # queue full) gets the default explanation instead
+    LLM_RATE_PER_MINUTE: float = 60
+    LLM_BURST: int = 10
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_QUEUE: int = 100
+    LLM_DEADLINE: float = 20.0
+    # Explanation templates reused per decision shape ("" keeps them in
+    # memory only); TTL in seconds, 0 never expires
+    EXPLANATION_CACHE_PATH: str = "./explanation_cache.db"
+    EXPLANATION_CACHE_SIZE: int = 1000
+    EXPLANATION_CACHE_TTL: float = 7 * 24 * 3600
+
+    # Threads for blocking work (SQLite, fraud checks) in async endpoints
+    BLOCKING_POOL_SIZE: int = 8
+
+    # Claim processing queue behind POST /api/claims/submit: worker count,
+    # how long a worker may hold a job before another takes it over, tries
+    # per claim (retried after JOB_RETRY_DELAY * attempt seconds), idle
+    # poll interval and the longest GET /api/claims/{id}?wait= long-poll
+    JOB_WORKERS: int = 4
+    JOB_LEASE_SECONDS: float = 120
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY: float = 5.0
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_MAX_WAIT: float = 30.0
+
+    # POST /api/claims/batch: claims processed per chunk (default and cap),
+    # and the longest NDJSON line accepted
+    BATCH_CHUNK_SIZE: int = 500
+    BATCH_MAX_CHUNK_SIZE: int = 5000
+    BATCH_MAX_LINE_BYTES: int = 64 * 1024
+    # GET /api/claims/history: largest page a caller may ask for
+    HISTORY_MAX_PAGE_SIZE: int = 500
+
+    # Fraud detection: flag more than TEMPORAL_MAX_CLAIMS claims for one SSN
+    # within TEMPORAL_WINDOW_DAYS
+    TEMPORAL_WINDOW_DAYS: int = 365
+    TEMPORAL_MAX_CLAIMS: int = 3
+    # Streaming earnings statistics, snapshotted next to the database
+    EARNINGS_SNAPSHOT_PATH: str = "./unemployment.earnings_sketch.json"
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.claim_jobs import ClaimJobQueue, ClaimWorkerPool, explanation_context
+from app.services.eligibility import EligibilityChecker
+from services.explanation_cache import ExplanationCache
+from app.services.fraud_detector import FraudDetector
+from app.services.llm_service import DeepSeekLLM, create_async_client, create_llm_client
+
+logger = logging.getLogger(__name__)
+
+class ServiceContainer:
+    """Services shared by every request for the lifetime of the app"""
+
+    def __init__(self):
+        self.http_client = create_async_client()
+        self.fraud_detector = FraudDetector()
+        self.eligibility_checker = EligibilityChecker()
+        self.explanation_cache = ExplanationCache(
+            settings.EXPLANATION_CACHE_PATH or None,
+            max_entries=settings.EXPLANATION_CACHE_SIZE,
+            ttl=settings.EXPLANATION_CACHE_TTL
+        )
+        self.llm_client = create_llm_client(self.http_client)
+        self.llm = DeepSeekLLM(client=self.llm_client, cache=self.explanation_cache)
+        self.job_queue = ClaimJobQueue(
+            SessionLocal,
+            lease_seconds=settings.JOB_LEASE_SECONDS,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            retry_delay=settings.JOB_RETRY_DELAY
+        )
+        self.workers = ClaimWorkerPool(
+            self.job_queue,
+            self.evaluate_claim,
+            self.llm.agenerate_explanation,
+            workers=settings.JOB_WORKERS,
+            poll_interval=settings.JOB_POLL_INTERVAL
+        )
+        self.ready = False
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+
+    def _warm(self) -> None:
+        self.eligibility_checker.rule_set.refresh(force=True)
+        self.fraud_detector.temporal_counter.warm()
+        self.fraud_detector.anomaly_detector.load()
+
+    async def warm_up(self) -> None:
+        """Load rules, claim history and earnings statistics before traffic arrives"""
+        start = time.monotonic()
+        try:
+            await run_blocking(self._warm)
+        except Exception as e:
+            # Requests still work (everything loads lazily); /ready reports it
+            self.warmup_error = str(e)
+            logger.error(f"Service warm-up failed: {str(e)}", exc_info=True)
+            return
+        self.warmup_seconds = round(time.monotonic() - start, 3)
+        self.ready = True
+        logger.info(f"Services warmed up in {self.warmup_seconds}s")
+
+    async def evaluate_claim(self, claim_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fraud and eligibility checks for one claim; returns the explanation context"""
+        # Fraud detection and eligibility run concurrently, off the event loop
+        fraud_result, failed_rules = await asyncio.gather(
+            self.fraud_detector.aanalyze_claim(claim_data),
+            run_blocking(self.eligibility_checker.evaluate, claim_data)
+        )
+        return explanation_context(claim_data, fraud_result, failed_rules)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.warmup_error,
+        }
+
+    async def metrics(self) -> Dict[str, Any]:
+        return {
+            "llm": self.llm_client.metrics(),
+            "explanation_cache": self.explanation_cache.stats,
+            "jobs": {**self.workers.metrics(), "states": await run_blocking(self.job_queue.counts)},
+        }
+
+    async def aclose(self) -> None:
+        await self.workers.stop()
+        await self.llm.aclose()
+
+def get_services(request: Request) -> ServiceContainer:
+    """FastAPI dependency returning the app's ServiceContainer"""
+    return request.app.state.services
@@ -1,8 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, func
 from app.db.base import Base
 
 class Claim(Base):
     __tablename__ = "claims"
+    __table_args__ = (
+        # Covers the paginated /history listing
+        Index(
+            "ix_claims_ssn_created_id",
+            "ssn_last4", "created_at", "id", "employer", "status", "fraud_score"
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     ssn_last4 = Column(String(4), index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Index
 from app.db.base import Base
 
 class FraudPattern(Base):
@@ -11,6 +11,11 @@ class FraudPattern(Base):
 
 class ClaimHistory(Base):
     __tablename__ = "claim_history"
+    __table_args__ = (
+        # Serves the per-SSN sliding-window lookups in the fraud detector and
+        # covers the paginated /history listing (never the embedding)
+        Index("ix_claim_history_ssn_date_id", "ssn_last4", "claim_date", "id", "employer"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     ssn_last4 = Column(String(4), index=True)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, func
+from app.db.base import Base
+
+class ClaimJob(Base):
+    """Processing job for a submitted claim; see app.services.claim_jobs"""
+    __tablename__ = "claim_jobs"
+    __table_args__ = (
+        # Workers look for the oldest job that is ready to run
+        Index("ix_claim_jobs_state_available_id", "state", "available_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    claim_id = Column(Integer, ForeignKey("claims.id"), unique=True, nullable=False)
+    state = Column(String(20), nullable=False)  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False)
+    lease_expires_at = Column(DateTime)
+    context = Column(Text)  # JSON explanation context, once the claim has been evaluated
+    failed_rules = Column(Text)  # JSON list of rule messages, once done
+    error = Column(String)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
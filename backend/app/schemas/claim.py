@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class ClaimCreate(BaseModel):
     ssn_last4: str
@@ -12,4 +12,17 @@ class ClaimResponse(BaseModel):
     status: str
     explanation: str
     fraud_score: float
-    failed_rules: List[str] 
\ No newline at end of file
+    failed_rules: List[str] 
+
+class ClaimAccepted(BaseModel):
+    claim_id: int
+    state: str
+
+class ClaimStatus(BaseModel):
+    claim_id: int
+    state: str  # queued, running, done or failed
+    status: Optional[str] = None
+    explanation: Optional[str] = None
+    fraud_score: Optional[float] = None
+    failed_rules: Optional[List[str]] = None
+    error: Optional[str] = None
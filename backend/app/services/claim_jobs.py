@@ -0,0 +1,324 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, func, or_
+
+from app.core.concurrency import run_blocking
+from app.models.claim import Claim
+from app.models.job import ClaimJob
+
+logger = logging.getLogger(__name__)
+
+# ClaimJob.state values
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Job id, claim id, the claim fields the pipeline needs and the explanation
+# context saved by an earlier attempt (None until the claim is evaluated)
+Job = Tuple[int, int, Dict[str, Any], Optional[Dict[str, Any]]]
+
+def explanation_context(
+    claim_data: Dict[str, Any],
+    fraud_result: Dict[str, Any],
+    failed_rules: List[Dict]
+) -> Dict[str, Any]:
+    return {
+        "status": "approved" if not failed_rules else "denied",
+        "fraud_analysis": fraud_result,
+        "eligibility": {
+            "failed_rules": [r["message"] for r in failed_rules]
+        },
+        "user_data": claim_data
+    }
+
+class ClaimJobQueue:
+    """Durable claim processing queue kept in the application database.
+
+    Admission writes the Claim and its ClaimJob in one transaction, so an
+    accepted claim survives any crash after that. Workers take the oldest
+    ready job with a conditional UPDATE (two workers, even in different
+    processes, never get the same one) and hold it on a lease; if a worker
+    dies the lease runs out and another worker picks the job up. Jobs run
+    at least once and are retried up to ``max_attempts`` times. Evaluating
+    a claim writes to the claim history, so its result is saved on the job
+    (save_context) and retries only redo the explanation.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        lease_seconds: float = 120,
+        max_attempts: int = 3,
+        retry_delay: float = 5.0
+    ):
+        self.session_factory = session_factory
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def enqueue(self, claim_data: Dict[str, Any]) -> int:
+        """Store a claim and queue it for processing; returns the claim id"""
+        with self.session_factory() as db:
+            claim = Claim(
+                ssn_last4=claim_data['ssn_last4'],
+                employer=claim_data['employer'],
+                separation_reason=claim_data['separation_reason'],
+                earnings=claim_data['earnings'],
+                employment_months=claim_data['employment_months']
+            )
+            db.add(claim)
+            db.flush()
+            db.add(ClaimJob(claim_id=claim.id, state=QUEUED, attempts=0, available_at=datetime.now()))
+            db.commit()
+            return claim.id
+
+    def _ready(self, now: datetime):
+        return or_(
+            and_(ClaimJob.state == QUEUED, ClaimJob.available_at <= now),
+            and_(ClaimJob.state == RUNNING, ClaimJob.lease_expires_at < now)
+        )
+
+    def take(self) -> Optional[Job]:
+        """Lease the oldest ready job, or None if there is nothing to do"""
+        with self.session_factory() as db:
+            while True:
+                now = datetime.now()
+                job_id = db.query(ClaimJob.id).filter(self._ready(now)).order_by(ClaimJob.id).limit(1).scalar()
+                if job_id is None:
+                    return None
+                taken = db.query(ClaimJob).filter(ClaimJob.id == job_id, self._ready(now)).update({
+                    ClaimJob.state: RUNNING,
+                    ClaimJob.attempts: ClaimJob.attempts + 1,
+                    ClaimJob.lease_expires_at: now + self.lease
+                }, synchronize_session=False)
+                db.commit()
+                if not taken:
+                    # Another worker got there first
+                    continue
+
+                job = db.get(ClaimJob, job_id)
+                if job.attempts > self.max_attempts:
+                    # Its lease keeps running out: the job is likely what kills workers
+                    job.state = FAILED
+                    job.error = "Abandoned after repeated worker failures"
+                    job.lease_expires_at = None
+                    db.commit()
+                    continue
+                claim = db.get(Claim, job.claim_id)
+                return job_id, claim.id, {
+                    "ssn_last4": claim.ssn_last4,
+                    "employer": claim.employer,
+                    "separation_reason": claim.separation_reason,
+                    "earnings": float(claim.earnings),
+                    "employment_months": int(claim.employment_months)
+                }, json.loads(job.context) if job.context else None
+
+    def save_context(self, job_id: int, context: Dict[str, Any]) -> None:
+        """Keep a job's evaluation so a retry does not record the claim again"""
+        with self.session_factory() as db:
+            db.query(ClaimJob).filter(ClaimJob.id == job_id).update(
+                {ClaimJob.context: json.dumps(context)}, synchronize_session=False
+            )
+            db.commit()
+
+    def complete(self, job_id: int, claim_id: int, context: Dict[str, Any], explanation: str) -> None:
+        """Write the decision to the Claim and mark its job done"""
+        with self.session_factory() as db:
+            claim = db.get(Claim, claim_id)
+            claim.status = context['status']
+            claim.fraud_score = context['fraud_analysis']['score']
+            claim.explanation = explanation
+            job = db.get(ClaimJob, job_id)
+            job.state = DONE
+            job.failed_rules = json.dumps(context['eligibility']['failed_rules'])
+            job.lease_expires_at = None
+            job.error = None
+            db.commit()
+
+    def fail(self, job_id: int, error: str) -> bool:
+        """Record a failed attempt; returns True if the job will be retried"""
+        with self.session_factory() as db:
+            job = db.get(ClaimJob, job_id)
+            job.error = error
+            job.lease_expires_at = None
+            retry = job.attempts < self.max_attempts
+            if retry:
+                job.state = QUEUED
+                job.available_at = datetime.now() + timedelta(seconds=self.retry_delay * job.attempts)
+            else:
+                job.state = FAILED
+            db.commit()
+            return retry
+
+    def release(self, job_ids: Iterable[int]) -> None:
+        """Put interrupted jobs straight back in the queue (on shutdown)"""
+        with self.session_factory() as db:
+            db.query(ClaimJob).filter(ClaimJob.id.in_(list(job_ids)), ClaimJob.state == RUNNING).update({
+                ClaimJob.state: QUEUED,
+                ClaimJob.attempts: ClaimJob.attempts - 1,
+                ClaimJob.available_at: datetime.now(),
+                ClaimJob.lease_expires_at: None
+            }, synchronize_session=False)
+            db.commit()
+
+    def get(self, claim_id: int) -> Optional[Dict[str, Any]]:
+        """Processing state and decision of a claim, or None if unknown"""
+        with self.session_factory() as db:
+            row = db.query(Claim, ClaimJob).outerjoin(
+                ClaimJob, ClaimJob.claim_id == Claim.id
+            ).filter(Claim.id == claim_id).first()
+        if row is None:
+            return None
+        claim, job = row
+        return {
+            "claim_id": claim.id,
+            # Claims stored before the queue existed were processed inline
+            "state": job.state if job is not None else DONE,
+            "status": claim.status,
+            "explanation": claim.explanation,
+            "fraud_score": claim.fraud_score,
+            "failed_rules": json.loads(job.failed_rules) if job is not None and job.failed_rules else None,
+            "error": job.error if job is not None and job.state == FAILED else None
+        }
+
+    def counts(self) -> Dict[str, int]:
+        with self.session_factory() as db:
+            return dict(db.query(ClaimJob.state, func.count(ClaimJob.id)).group_by(ClaimJob.state).all())
+
+class ClaimWorkerPool:
+    """Workers draining a ClaimJobQueue on the app's event loop.
+
+    Each worker takes one job at a time: ``evaluate(claim_data) -> context``
+    (skipped when an earlier attempt saved the context), then
+    ``explain(context) -> explanation``. The blocking parts already run in
+    the shared thread pool and the LLM call is async, so a handful of
+    workers keep both busy.
+    Idle workers wake on notify() or every ``poll_interval`` seconds (to
+    pick up retries, expired leases and jobs queued by other processes).
+    """
+
+    def __init__(
+        self,
+        queue: ClaimJobQueue,
+        evaluate: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        explain: Callable[[Dict[str, Any]], Awaitable[str]],
+        workers: int = 4,
+        poll_interval: float = 1.0
+    ):
+        self.queue = queue
+        self.evaluate = evaluate
+        self.explain = explain
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Dict[int, asyncio.Event] = {}
+        self._running: Set[int] = set()
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"claim-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} claim workers")
+
+    def notify(self) -> None:
+        """Wake idle workers (a job was just queued)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _idle(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await run_blocking(self.queue.take)
+            except Exception as e:
+                logger.error(f"Could not take a claim job: {str(e)}", exc_info=True)
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if job is None:
+                await self._idle()
+                continue
+
+            job_id, claim_id, claim_data, context = job
+            self._running.add(job_id)
+            try:
+                if context is None:
+                    context = await self.evaluate(claim_data)
+                    await run_blocking(self.queue.save_context, job_id, context)
+                explanation = await self.explain(context)
+                await run_blocking(self.queue.complete, job_id, claim_id, context, explanation)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error processing claim {claim_id}: {str(e)}", exc_info=True)
+                try:
+                    if await run_blocking(self.queue.fail, job_id, str(e)):
+                        self.retried += 1
+                    else:
+                        self.failed += 1
+                except Exception as record_error:
+                    # The lease will run out and the job will be retried anyway
+                    logger.error(f"Could not record failure of claim {claim_id}: {str(record_error)}")
+            finally:
+                self._running.discard(job_id)
+            event = self._finished.pop(claim_id, None)
+            if event is not None:
+                event.set()
+
+    async def wait(self, claim_id: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """The claim's status once it is done or failed, or as it stands
+        after ``timeout`` seconds"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            status = await run_blocking(self.queue.get, claim_id)
+            remaining = deadline - loop.time()
+            if status is None or status["state"] in (DONE, FAILED) or remaining <= 0:
+                # Other waiters on this claim fall back to re-checking
+                self._finished.pop(claim_id, None)
+                return status
+            event = self._finished.setdefault(claim_id, asyncio.Event())
+            try:
+                # Re-check now and then: another process may be running the job
+                await asyncio.wait_for(event.wait(), timeout=min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        """Cancel the workers and requeue the jobs they were running"""
+        running = set(self._running)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if running:
+            await run_blocking(self.queue.release, running)
+            logger.info(f"Requeued {len(running)} interrupted claim jobs")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "running": len(self._running),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
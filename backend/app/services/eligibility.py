@@ -1,9 +1,14 @@
 from typing import Dict, List
 from app.db.session import SessionLocal
 from app.models.eligibility import EligibilityRule
+from services.rule_engine import EligibilityRuleSet
+
+# Compiled once per process and refreshed when eligibility_rules changes
+rule_set = EligibilityRuleSet(SessionLocal, EligibilityRule)
 
 class EligibilityChecker:
     def __init__(self):
+        self.rule_set = rule_set
         self.BASE_RULES = [
             {
                 "name": "minimum_earnings",
@@ -35,11 +40,9 @@ class EligibilityChecker:
                 })
         
         # Check database rules
-        with SessionLocal() as db:
-            db_rules = db.query(EligibilityRule).all()
-            for rule in db_rules:
-                # Here you would evaluate the rule condition
-                # For now, we'll just check if the rule exists
-                pass
+        for rule in self.rule_set.rules():
+            # Here you would evaluate the rule condition
+            # For now, we'll just check if the rule exists
+            pass
         
         return failed_rules 
\ No newline at end of file
@@ -1,9 +1,23 @@
 from typing import Dict, Any, List
+import asyncio
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import numpy as np
+from app.core.concurrency import run_blocking
+from app.core.config import settings
 from app.db.session import SessionLocal
+from app.models.claim import Claim
 from app.models.fraud import FraudPattern, ClaimHistory
+from services.anomaly_detector import EarningsAnomalyDetector
+from services.temporal_counter import TemporalClaimCounter
+
+# Shared across FraudDetector instances; see TemporalClaimCounter
+temporal_counter = TemporalClaimCounter(
+    SessionLocal, ClaimHistory, window_days=settings.TEMPORAL_WINDOW_DAYS
+)
+anomaly_detector = EarningsAnomalyDetector(
+    settings.EARNINGS_SNAPSHOT_PATH, SessionLocal, Claim
+)
 
 class FraudDetector:
     def __init__(self):
@@ -12,6 +26,8 @@ class FraudDetector:
             "employment_too_short": lambda x: x['employment_months'] < 1,
             "blacklisted_employers": lambda x: x['employer'] in ["Fake Corp LLC", "Shell Co"]
         }
+        self.temporal_counter = temporal_counter
+        self.anomaly_detector = anomaly_detector
 
     def apply_hard_rules(self, claim_data: Dict) -> List[str]:
         """Apply hard-coded fraud rules"""
@@ -19,12 +35,7 @@ class FraudDetector:
 
     def check_temporal_patterns(self, ssn_last4: str) -> bool:
         """Check for temporal patterns like frequent filing"""
-        with SessionLocal() as db:
-            past_claims_count = db.query(ClaimHistory).filter(
-                ClaimHistory.ssn_last4 == ssn_last4,
-                ClaimHistory.claim_date > datetime.now() - timedelta(days=365)
-            ).count()
-        return past_claims_count > 3
+        return self.temporal_counter.count(ssn_last4) > settings.TEMPORAL_MAX_CLAIMS
 
     def calculate_score(
         self,
@@ -41,42 +52,80 @@ class FraudDetector:
         if is_anomaly: score = min(1.0, score + 0.2)
         return round(score, 2)
 
-    def analyze_claim(self, claim_data: Dict) -> Dict[str, Any]:
-        """Analyze claim data using a hybrid detection approach"""
-        try:
-            with SessionLocal() as db:
-                # Store claim history
-                db.add(ClaimHistory(
+    def record_claim(self, claim_data: Dict) -> bool:
+        """Store the claim in the history and check it for frequent filing"""
+        return self.record_claims([claim_data])[0]
+
+    def record_claims(self, claims: List[Dict]) -> List[bool]:
+        """Store a batch of claims in one transaction, checking each for
+        frequent filing as if they had been submitted one after another"""
+        ssns = [claim_data['ssn_last4'] for claim_data in claims]
+        with SessionLocal() as db:
+            claim_date = datetime.now()
+            self.temporal_counter.preload(ssns, db)
+            db.add_all([
+                ClaimHistory(
                     ssn_last4=claim_data['ssn_last4'],
-                    claim_date=datetime.now(),
+                    claim_date=claim_date,
                     employer=claim_data['employer']
-                ))
-                db.commit()
+                )
+                for claim_data in claims
+            ])
+            db.commit()
+        redflags = []
+        for ssn in ssns:
+            self.temporal_counter.record(ssn, claim_date)
+            redflags.append(self.check_temporal_patterns(ssn))
+        return redflags
+
+    def _build_result(
+        self,
+        hard_rules: List[str],
+        temporal_redflags: bool,
+        is_anomaly: bool
+    ) -> Dict[str, Any]:
+        # For now, we'll skip pattern matching
+        similar_patterns = []
+        score = self.calculate_score(
+            similar_patterns,
+            hard_rules,
+            temporal_redflags,
+            is_anomaly
+        )
+        return {
+            "score": score,
+            "patterns": [],
+            "hard_rule_violations": hard_rules,
+            "temporal_redflags": temporal_redflags,
+            "is_anomaly": is_anomaly
+        }
 
-                # Apply hard rules
-                hard_rules = self.apply_hard_rules(claim_data)
-                
-                # Check temporal patterns
-                temporal_redflags = self.check_temporal_patterns(claim_data['ssn_last4'])
-                
-                # For now, we'll skip pattern matching and anomaly detection
-                similar_patterns = []
-                is_anomaly = False
+    def analyze_claim(self, claim_data: Dict) -> Dict[str, Any]:
+        """Analyze claim data using a hybrid detection approach"""
+        return self.analyze_claims([claim_data])[0]
 
-                # Calculate final score
-                score = self.calculate_score(
-                    similar_patterns,
-                    hard_rules,
-                    temporal_redflags,
-                    is_anomaly
-                )
+    def analyze_claims(self, claims: List[Dict]) -> List[Dict[str, Any]]:
+        """Analyze a batch of claims with a single history transaction"""
+        try:
+            hard_rules = [self.apply_hard_rules(claim_data) for claim_data in claims]
+            temporal_redflags = self.record_claims(claims)
+            is_anomaly = [self.anomaly_detector.observe(claim_data) for claim_data in claims]
+            return [
+                self._build_result(*result)
+                for result in zip(hard_rules, temporal_redflags, is_anomaly)
+            ]
+        except Exception as e:
+            raise Exception(f"Error analyzing claim: {str(e)}")
 
-                return {
-                    "score": score,
-                    "patterns": [],
-                    "hard_rule_violations": hard_rules,
-                    "temporal_redflags": temporal_redflags,
-                    "is_anomaly": is_anomaly
-                }
+    async def aanalyze_claim(self, claim_data: Dict) -> Dict[str, Any]:
+        """Async analyze_claim: the history write and the anomaly check run
+        concurrently in the blocking pool instead of on the event loop"""
+        try:
+            hard_rules = self.apply_hard_rules(claim_data)
+            temporal_redflags, is_anomaly = await asyncio.gather(
+                run_blocking(self.record_claim, claim_data),
+                run_blocking(self.anomaly_detector.observe, claim_data)
+            )
+            return self._build_result(hard_rules, temporal_redflags, is_anomaly)
         except Exception as e:
-            raise Exception(f"Error analyzing claim: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error analyzing claim: {str(e)}")
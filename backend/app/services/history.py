@@ -0,0 +1,136 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.models.claim import Claim
+from app.models.fraud import ClaimHistory
+
+# Entry types in the merged timeline, ranked to break ties on equal dates
+HISTORY = "history"
+CLAIM = "claim"
+TYPE_RANK = {HISTORY: 0, CLAIM: 1}
+
+Cursor = Tuple[datetime, str, int]
+
+class InvalidCursor(ValueError):
+    """A pagination cursor could not be decoded"""
+
+def history_etag(db: Session, ssn_last4: str, *params: Any) -> str:
+    """ETag for an SSN's timeline.
+
+    Built from each table's row count and highest id for the SSN, plus the
+    number of decided claims (workers fill in status after admission).
+    These are read from the covering indexes, so the check is one cheap
+    query and every process computes the same tag for the same data.
+    """
+    history = db.query(func.count(ClaimHistory.id), func.max(ClaimHistory.id)).filter(
+        ClaimHistory.ssn_last4 == ssn_last4
+    ).one()
+    claims = db.query(func.count(Claim.id), func.max(Claim.id), func.count(Claim.status)).filter(
+        Claim.ssn_last4 == ssn_last4
+    ).one()
+    key = ":".join([ssn_last4] + [str(v) for v in (*history, *claims, *params)])
+    return f'W/"{base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag``: a comma-separated
+    list of tags (or ``*``) compared weakly, i.e. ignoring ``W/``"""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+def encode_cursor(cursor: Cursor) -> str:
+    date, kind, item_id = cursor
+    raw = json.dumps([date.isoformat(), kind, item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        date, kind, item_id = json.loads(raw)
+        if kind not in TYPE_RANK:
+            raise ValueError(kind)
+        return datetime.fromisoformat(date), kind, int(item_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {token}") from e
+
+def _before(date_column, id_column, kind: str, cursor: Optional[Cursor]):
+    """Keyset condition: rows of `kind` strictly after the cursor in
+    (date, type rank, id) descending order. Written as a range on the date
+    plus a tie filter so it stays an index range scan."""
+    if cursor is None:
+        return None
+    date, cursor_kind, cursor_id = cursor
+    rank, cursor_rank = TYPE_RANK[kind], TYPE_RANK[cursor_kind]
+    if rank < cursor_rank:
+        return date_column <= date
+    if rank > cursor_rank:
+        return date_column < date
+    return and_(date_column <= date, or_(date_column < date, id_column < cursor_id))
+
+def _page(db: Session, model, date_column, columns, ssn_last4: str, kind: str,
+          cursor: Optional[Cursor], limit: int) -> List[Any]:
+    query = db.query(model.id, date_column, *columns).filter(
+        model.ssn_last4 == ssn_last4,
+        date_column.isnot(None)
+    )
+    condition = _before(date_column, model.id, kind, cursor)
+    if condition is not None:
+        query = query.filter(condition)
+    return query.order_by(date_column.desc(), model.id.desc()).limit(limit).all()
+
+def fetch_history_page(
+    db: Session,
+    ssn_last4: str,
+    cursor: Optional[Cursor] = None,
+    limit: int = 50
+) -> Dict[str, Any]:
+    """One page of an SSN's claim_history and claims rows, newest first.
+
+    Each table is read with its own keyset query (at most limit + 1 rows
+    from a covering index) and the two are merged, so a page costs the
+    same however many rows the SSN has.
+    """
+    history = _page(
+        db, ClaimHistory, ClaimHistory.claim_date, [ClaimHistory.employer],
+        ssn_last4, HISTORY, cursor, limit + 1
+    )
+    claims = _page(
+        db, Claim, Claim.created_at, [Claim.employer, Claim.status, Claim.fraud_score],
+        ssn_last4, CLAIM, cursor, limit + 1
+    )
+
+    entries = [
+        {"type": HISTORY, "id": row.id, "date": row.claim_date, "employer": row.employer}
+        for row in history
+    ] + [
+        {
+            "type": CLAIM, "id": row.id, "date": row.created_at, "employer": row.employer,
+            "status": row.status, "fraud_score": row.fraud_score
+        }
+        for row in claims
+    ]
+    entries.sort(
+        key=lambda e: (e["date"], TYPE_RANK[e["type"]], e["id"]),
+        reverse=True
+    )
+
+    items = entries[:limit]
+    next_cursor = None
+    if len(entries) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor((last["date"], last["type"], last["id"]))
+    for item in items:
+        item["date"] = item["date"].isoformat()
+    return {"ssn_last4": ssn_last4, "items": items, "next_cursor": next_cursor}
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+class LLMUnavailable(Exception):
+    """The LLM call was shed: the queue was full or its deadline passed"""
+
+class TokenBucket:
+    """Token bucket for the event loop (no locking needed).
+
+    ``reserve`` always takes a token and returns how long to wait before
+    using it, so waiters are served in arrival order; ``refund`` gives it
+    back when a waiter gives up.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        self._refill()
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self) -> None:
+        self._tokens = min(self.capacity, self._tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back new calls for ``seconds`` (e.g. after a 429)"""
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+class RateLimitedLLMClient:
+    """Shared completion client that stays inside the provider quota.
+
+    Calls take a token from a bucket refilled at ``rate_per_minute`` (with
+    ``burst`` headroom) and one of ``max_concurrency`` slots. At most
+    ``max_queue`` calls may wait; beyond that, or once a call's
+    ``deadline`` (seconds, covering queueing and the request) passes, it
+    fails fast with LLMUnavailable so the caller can fall back.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        rate_per_minute: float = 60,
+        burst: int = 10,
+        max_concurrency: int = 8,
+        max_queue: int = 100,
+        deadline: float = 20.0
+    ):
+        self.client = client
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+        self._waits = deque(maxlen=1000)
+        self.requests = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.throttled = 0
+
+    async def _acquire(self) -> None:
+        await self._semaphore.acquire()
+        try:
+            delay = self._bucket.reserve()
+            if delay > 0:
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    self._bucket.refund()
+                    raise
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    @asynccontextmanager
+    async def slot(self, deadline: Optional[float] = None) -> AsyncIterator[float]:
+        """Wait for capacity; yields the seconds left of the deadline"""
+        deadline = self.deadline if deadline is None else deadline
+        self.requests += 1
+        if self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise LLMUnavailable("LLM queue is full")
+
+        self._waiting += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._acquire(), timeout=deadline)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMUnavailable(f"No LLM capacity within {deadline}s")
+        finally:
+            self._waiting -= 1
+        waited = time.monotonic() - start
+        self._waits.append(waited)
+
+        self._in_flight += 1
+        try:
+            yield max(0.0, deadline - waited)
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    def _check_status(self, response: httpx.Response) -> None:
+        if response.status_code == 429:
+            self.throttled += 1
+            retry_after = response.headers.get("Retry-After", "")
+            self._bucket.pause(float(retry_after) if retry_after.replace(".", "", 1).isdigit() else 1.0)
+        response.raise_for_status()
+
+    async def complete(self, payload: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """POST /completions within the deadline"""
+        async with self.slot(deadline) as remaining:
+            try:
+                response = await asyncio.wait_for(
+                    self.client.post("completions", json=payload), timeout=remaining
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMUnavailable("LLM call exceeded its deadline")
+            self._check_status(response)
+            return response.json()
+
+    async def stream(self, payload: Dict[str, Any], deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """Streamed /completions; the deadline covers the wait for the first token"""
+        async with self.slot(deadline) as remaining:
+            request = self.client.build_request("POST", "completions", json={**payload, "stream": True})
+            try:
+                response = await asyncio.wait_for(self.client.send(request, stream=True), timeout=remaining)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMUnavailable("LLM call exceeded its deadline")
+            try:
+                if response.is_error:
+                    await response.aread()
+                self._check_status(response)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event.get("choices"):
+                        text = event["choices"][0].get("text") or ""
+                        if text:
+                            yield text
+            finally:
+                await response.aclose()
+
+    def metrics(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        return {
+            "queue_depth": self._waiting,
+            "in_flight": self._in_flight,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "throttled": self.throttled,
+            "wait_seconds": {
+                "recent": len(waits),
+                "mean": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 4) if waits else 0.0,
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
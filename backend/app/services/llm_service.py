@@ -1,36 +1,72 @@
-import together
+import httpx
 from app.core.config import settings
-from typing import Dict, Any
+from services.explanation_cache import ExplanationCache, decision_signature
+from app.services.llm_client import LLMUnavailable, RateLimitedLLMClient
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def create_async_client() -> httpx.AsyncClient:
+    """Pooled client for the Together API; share one per process"""
+    return httpx.AsyncClient(
+        base_url=settings.TOGETHER_API_BASE,
+        headers={"Authorization": f"Bearer {settings.TOGETHER_API_KEY}"},
+        timeout=settings.LLM_TIMEOUT
+    )
+
+def create_llm_client(client: Optional[httpx.AsyncClient] = None) -> RateLimitedLLMClient:
+    """Rate-limited completion client sized to the provider quota in settings"""
+    return RateLimitedLLMClient(
+        client or create_async_client(),
+        rate_per_minute=settings.LLM_RATE_PER_MINUTE,
+        burst=settings.LLM_BURST,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        max_queue=settings.LLM_MAX_QUEUE,
+        deadline=settings.LLM_DEADLINE
+    )
+
 class DeepSeekLLM:
-    def __init__(self):
+    COMPLETION_PARAMS = {
+        "temperature": 0.7,
+        "max_tokens": 200,
+        "top_p": 0.9,
+        "top_k": 50,
+        "repetition_penalty": 1.1,
+        "stop": ["\n\n", "Human:", "Assistant:"]
+    }
+
+    def __init__(
+        self,
+        client: Optional[RateLimitedLLMClient] = None,
+        cache: Optional[ExplanationCache] = None
+    ):
         self.api_key = settings.TOGETHER_API_KEY
         logger.info(f"Initializing LLM service with API key: {self.api_key[:10]}...")
-        together.api_key = self.api_key
         if not self.api_key or self.api_key == "your_api_key_here":
             logger.warning("Together API key not set. Using default explanations.")
+        self.client = client
+        self.cache = cache
 
-    def generate_explanation(self, context: Dict[str, Any]) -> str:
-        """Generate a human-readable explanation for the claim decision"""
-        try:
-            logger.info("Starting explanation generation")
-            logger.info(f"Context status: {context['status']}")
-            
-            if not self.api_key or self.api_key == "your_api_key_here":
-                logger.warning("No API key available, using default explanation")
-                if context['status'] == "approved":
-                    return "Your claim has been approved based on your employment history and earnings. You meet all eligibility requirements."
-                else:
-                    failed_rules = context['eligibility']['failed_rules']
-                    return f"Your claim has been denied due to the following reasons: {', '.join(failed_rules)}"
-
-            # Create a more structured prompt
-            prompt = f"""You are Joy, a friendly unemployment insurance assistant. 
+    def _get_client(self) -> RateLimitedLLMClient:
+        # Created on first use when not injected, so it binds to the running loop
+        if self.client is None:
+            self.client = create_llm_client()
+        return self.client
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _has_api_key(self) -> bool:
+        return bool(self.api_key) and self.api_key != "your_api_key_here"
+
+    def _build_prompt(self, context: Dict[str, Any]) -> str:
+        # Create a more structured prompt
+        return f"""You are Joy, a friendly unemployment insurance assistant. 
             Based on the following information, provide a clear and concise explanation for the claim decision:
 
             Claim Status: {context['status']}
@@ -51,29 +87,70 @@ class DeepSeekLLM:
             Please provide a clear, friendly explanation (2-3 sentences) for this decision.
             """
 
-            logger.info("Sending request to Together API")
+    def _cache_key(self, context: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Decision signature and template values for the explanation cache"""
+        user_data = context['user_data']
+        signature = decision_signature(
+            context['status'],
+            context['eligibility']['failed_rules'],
+            context['fraud_analysis'].get('score'),
+            context['fraud_analysis'].get('hard_rule_violations', [])
+        )
+        return signature, {
+            "earnings": user_data.get('earnings'),
+            "months": user_data.get('employment_months'),
+            "employer": user_data.get('employer'),
+            "reason": user_data.get('separation_reason')
+        }
+
+    def _cached_explanation(self, context: Dict[str, Any]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        explanation = self.cache.get(*self._cache_key(context))
+        if explanation is not None:
+            logger.info("Using cached explanation for this decision shape")
+        return explanation
+
+    def _parse_response(self, response: Dict[str, Any], context: Dict[str, Any]) -> str:
+        logger.info(f"Received response from API: {response}")
+        if 'choices' in response and response['choices']:
+            explanation = response['choices'][0]['text'].strip()
+            explanation = explanation.replace("Explanation:", "").strip()
+            logger.info(f"Generated explanation: {explanation}")
+            if not explanation:
+                return self._get_default_explanation(context)
+            if self.cache is not None:
+                signature, values = self._cache_key(context)
+                self.cache.put(signature, explanation, values)
+            return explanation
+        logger.error(f"Unexpected API response format: {response}")
+        return self._get_default_explanation(context)
+
+    async def agenerate_explanation(self, context: Dict[str, Any]) -> str:
+        """Generate a human-readable explanation for the claim decision;
+        awaits the completion over the shared rate-limited client"""
+        try:
+            if not self._has_api_key():
+                logger.warning("No API key available, using default explanation")
+                return self._get_default_explanation(context)
+
+            # The SQLite tier is a single indexed read; cheap enough inline
+            cached = self._cached_explanation(context)
+            if cached is not None:
+                return cached
+
+            logger.info("Sending async request to Together API")
             try:
-                response = together.Complete.create(
-                    prompt=prompt,
-                    model="mistralai/Mixtral-8x7B-Instruct-v0.1",
-                    temperature=0.7,
-                    max_tokens=200,
-                    top_p=0.9,
-                    top_k=50,
-                    repetition_penalty=1.1,
-                    stop=["\n\n", "Human:", "Assistant:"]
-                )
-                logger.info(f"Received response from API: {response}")
-
-                if 'choices' in response and response['choices']:
-                    explanation = response['choices'][0]['text'].strip()
-                    explanation = explanation.replace("Explanation:", "").strip()
-                    logger.info(f"Generated explanation: {explanation}")
-                    return explanation if explanation else self._get_default_explanation(context)
-                else:
-                    logger.error(f"Unexpected API response format: {response}")
-                    return self._get_default_explanation(context)
+                response = await self._get_client().complete({
+                    "model": settings.LLM_MODEL,
+                    "prompt": self._build_prompt(context),
+                    **self.COMPLETION_PARAMS
+                })
+                return self._parse_response(response, context)
 
+            except LLMUnavailable as shed:
+                logger.warning(f"LLM call shed: {str(shed)}")
+                return self._get_default_explanation(context)
             except Exception as api_error:
                 logger.error(f"API call error: {str(api_error)}", exc_info=True)
                 return self._get_default_explanation(context)
@@ -82,6 +159,63 @@ class DeepSeekLLM:
             logger.error(f"Error in LLM service: {str(e)}", exc_info=True)
             return self._get_default_explanation(context)
 
+    async def _astream_completion(self, prompt: str) -> AsyncIterator[str]:
+        """Yield completion tokens from the Together server-sent event stream"""
+        async for token in self._get_client().stream({
+            "model": settings.LLM_MODEL,
+            "prompt": prompt,
+            **self.COMPLETION_PARAMS
+        }):
+            yield token
+
+    async def astream_explanation(self, context: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yield the explanation as the model produces it.
+
+        Cached and default explanations come as a single chunk. If the
+        stream fails before the first token the default explanation is
+        sent instead; a failure part-way simply ends the stream.
+        """
+        if not self._has_api_key():
+            yield self._get_default_explanation(context)
+            return
+        cached = self._cached_explanation(context)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        pending = ""
+        try:
+            async for token in self._astream_completion(self._build_prompt(context)):
+                parts.append(token)
+                if pending is not None:
+                    # Hold back the start until the "Explanation:" label can be dropped
+                    pending += token
+                    if "Explanation:" in pending or len(pending) > 40:
+                        token, pending = pending.replace("Explanation:", "").lstrip(), None
+                    else:
+                        continue
+                if token:
+                    yield token
+            if pending:
+                yield pending.replace("Explanation:", "").lstrip()
+        except LLMUnavailable as shed:
+            logger.warning(f"LLM call shed: {str(shed)}")
+            yield self._get_default_explanation(context)
+            return
+        except Exception as api_error:
+            logger.error(f"API call error: {str(api_error)}", exc_info=True)
+            if not parts:
+                yield self._get_default_explanation(context)
+            return
+
+        explanation = "".join(parts).replace("Explanation:", "").strip()
+        if not explanation:
+            yield self._get_default_explanation(context)
+        elif self.cache is not None:
+            signature, values = self._cache_key(context)
+            self.cache.put(signature, explanation, values)
+
     def _get_default_explanation(self, context: Dict[str, Any]) -> str:
         """Generate a default explanation when the API call fails"""
         logger.info("Generating default explanation")
@@ -1,15 +1,39 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.endpoints import auth, claims
 from app.db.base import Base
 from app.db.session import engine
+from app.core.concurrency import blocking_executor
+from app.core.container import ServiceContainer, get_services
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+# create_all() skips indexes on tables that already exist
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    services = ServiceContainer()
+    app.state.services = services
+    # Claims queued before a restart (or left by a crashed worker) resume here
+    services.workers.start()
+    # Warm up in the background so the server answers health checks at once;
+    # /ready turns 200 when it is done
+    warm_up = asyncio.create_task(services.warm_up())
+    yield
+    warm_up.cancel()
+    await services.aclose()
+    blocking_executor.shutdown(wait=False)
 
 app = FastAPI(
     title="Unemployment Claims API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -33,4 +57,15 @@ app.include_router(claims.router, prefix="/api/claims", tags=["claims"])
 
 @app.get("/")
 async def root():
-    return {"message": "Unemployment Claims API"} 
\ No newline at end of file
+    return {"message": "Unemployment Claims API"}
+
+@app.get("/ready")
+async def ready(services: ServiceContainer = Depends(get_services)):
+    status = services.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics(services: ServiceContainer = Depends(get_services)):
+    """LLM queue depth, wait times and shed calls; explanation cache hit
+    rates; claim job counts by state"""
+    return await services.metrics()
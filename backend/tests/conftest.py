@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The backend runs from backend/ and imports itself as "app"; make that work
+# when pytest is started from the repository root as well
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.claim import Claim
+from app.models.job import ClaimJob
+from app.services.claim_jobs import (
+    DONE, FAILED, QUEUED, RUNNING, ClaimJobQueue, ClaimWorkerPool, explanation_context
+)
+
+CLAIM = {
+    "ssn_last4": "1234",
+    "employer": "Acme",
+    "separation_reason": "Laid off",
+    "earnings": 3000.0,
+    "employment_months": 12
+}
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    Base.metadata.create_all(engine, tables=[Claim.__table__, ClaimJob.__table__])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _job(session_factory, claim_id):
+    with session_factory() as db:
+        return db.query(ClaimJob).filter(ClaimJob.claim_id == claim_id).one()
+
+
+def test_take_leases_the_oldest_job(session_factory):
+    queue = ClaimJobQueue(session_factory)
+    first = queue.enqueue(CLAIM)
+    queue.enqueue(CLAIM)
+
+    job_id, claim_id, claim_data, context = queue.take()
+    assert claim_id == first
+    assert claim_data == CLAIM
+    assert context is None
+    job = _job(session_factory, first)
+    assert (job.state, job.attempts) == (RUNNING, 1)
+    assert job.lease_expires_at is not None
+
+    assert queue.take()[1] != first
+    assert queue.take() is None
+
+
+def test_concurrent_takers_never_share_a_job(session_factory):
+    claim_ids = {ClaimJobQueue(session_factory).enqueue(CLAIM) for _ in range(40)}
+    taken = []
+    lock = threading.Lock()
+
+    def drain():
+        # One queue per thread, as separate processes would have
+        queue = ClaimJobQueue(session_factory)
+        while True:
+            job = queue.take()
+            if job is None:
+                return
+            with lock:
+                taken.append(job[1])
+
+    threads = [threading.Thread(target=drain) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(taken) == sorted(claim_ids)
+
+
+def test_expired_lease_is_retaken_until_abandoned(session_factory):
+    queue = ClaimJobQueue(session_factory, lease_seconds=-1, max_attempts=2)
+    claim_id = queue.enqueue(CLAIM)
+
+    # The worker holding the lease died: the job is handed out again
+    assert queue.take()[1] == claim_id
+    assert queue.take()[1] == claim_id
+    assert queue.take() is None
+    job = _job(session_factory, claim_id)
+    assert job.state == FAILED
+    assert job.attempts == 3
+
+
+def test_failed_attempts_are_retried_then_failed(session_factory):
+    queue = ClaimJobQueue(session_factory, max_attempts=2, retry_delay=0)
+    claim_id = queue.enqueue(CLAIM)
+
+    job_id = queue.take()[0]
+    assert queue.fail(job_id, "LLM timeout") is True
+    assert _job(session_factory, claim_id).state == QUEUED
+
+    job_id = queue.take()[0]
+    assert queue.fail(job_id, "LLM timeout") is False
+    status = queue.get(claim_id)
+    assert status["state"] == FAILED
+    assert status["error"] == "LLM timeout"
+    assert queue.take() is None
+
+
+def test_retry_delay_holds_the_job_back(session_factory):
+    queue = ClaimJobQueue(session_factory, retry_delay=60)
+    queue.enqueue(CLAIM)
+    assert queue.fail(queue.take()[0], "boom") is True
+    assert queue.take() is None
+
+
+def test_saved_context_is_handed_to_retries(session_factory):
+    queue = ClaimJobQueue(session_factory, retry_delay=0)
+    claim_id = queue.enqueue(CLAIM)
+    job_id = queue.take()[0]
+    context = explanation_context(CLAIM, {"score": 0.3}, [])
+    queue.save_context(job_id, context)
+    queue.fail(job_id, "LLM timeout")
+
+    assert queue.take() == (job_id, claim_id, CLAIM, context)
+
+
+def test_release_requeues_without_counting_an_attempt(session_factory):
+    queue = ClaimJobQueue(session_factory)
+    claim_id = queue.enqueue(CLAIM)
+    job_id = queue.take()[0]
+    queue.release([job_id])
+    job = _job(session_factory, claim_id)
+    assert (job.state, job.attempts) == (QUEUED, 0)
+    assert queue.take()[0] == job_id
+
+
+def test_worker_pool_evaluates_once_across_retries(session_factory):
+    queue = ClaimJobQueue(session_factory, retry_delay=0)
+    calls = {"evaluate": 0, "explain": 0}
+
+    async def evaluate(claim_data):
+        calls["evaluate"] += 1
+        return explanation_context(claim_data, {"score": 0.1}, [])
+
+    async def explain(context):
+        calls["explain"] += 1
+        if calls["explain"] == 1:
+            raise RuntimeError("LLM unavailable")
+        return "Approved."
+
+    async def run():
+        pool = ClaimWorkerPool(queue, evaluate, explain, workers=2, poll_interval=0.05)
+        pool.start()
+        claim_id = queue.enqueue(CLAIM)
+        pool.notify()
+        status = await pool.wait(claim_id, timeout=10)
+        await pool.stop()
+        return status, pool.metrics()
+
+    status, metrics = asyncio.run(run())
+    assert status["state"] == DONE
+    assert status["explanation"] == "Approved."
+    assert calls == {"evaluate": 1, "explain": 2}
+    assert (metrics["completed"], metrics["retried"]) == (1, 1)
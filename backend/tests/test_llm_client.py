@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.services.llm_client import LLMUnavailable, RateLimitedLLMClient
+from app.services.llm_service import DeepSeekLLM
+
+CONTEXT = {
+    "status": "denied",
+    "user_data": {"employment_months": 2, "earnings": 500.0, "employer": "Acme", "separation_reason": "Quit"},
+    "eligibility": {"failed_rules": ["Minimum employment"]},
+    "fraud_analysis": {"score": 0.1, "hard_rule_violations": []}
+}
+
+
+class _CompletionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.delay)
+        body = json.dumps({"choices": [{"text": "Explanation: stub reply"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CompletionHandler)
+    server.daemon_threads = True
+    server.delay = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, **kwargs) -> RateLimitedLLMClient:
+    http = httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.server_address[1]}/")
+    return RateLimitedLLMClient(http, **kwargs)
+
+
+def test_complete_and_metrics(stub_server):
+    async def run():
+        client = _client(stub_server)
+        try:
+            response = await client.complete({"prompt": "hi"})
+            return response, client.metrics()
+        finally:
+            await client.aclose()
+
+    response, metrics = asyncio.run(run())
+    assert response["choices"][0]["text"] == "Explanation: stub reply"
+    assert metrics["requests"] == 1
+    assert metrics["rejected"] == metrics["timeouts"] == 0
+    assert metrics["queue_depth"] == metrics["in_flight"] == 0
+    assert metrics["wait_seconds"]["recent"] == 1
+
+
+def test_full_queue_is_shed(stub_server):
+    stub_server.delay = 0.3
+
+    async def run():
+        client = _client(stub_server, max_concurrency=1, max_queue=1)
+        try:
+            first = asyncio.ensure_future(client.complete({"prompt": "0"}))
+            await asyncio.sleep(0.05)
+            queued = asyncio.ensure_future(client.complete({"prompt": "1"}))
+            await asyncio.sleep(0.05)
+            # One call in flight and one waiting fill max_concurrency and max_queue
+            results = await asyncio.gather(
+                first, queued, client.complete({"prompt": "2"}), return_exceptions=True
+            )
+            return results, client.metrics()
+        finally:
+            await client.aclose()
+
+    results, metrics = asyncio.run(run())
+    assert [isinstance(r, LLMUnavailable) for r in results] == [False, False, True]
+    assert metrics["requests"] == 3
+    assert metrics["rejected"] == 1
+    assert metrics["wait_seconds"]["recent"] == 2
+    assert metrics["wait_seconds"]["max"] >= 0.2
+
+
+def test_deadline_falls_back_to_default_explanation(stub_server):
+    stub_server.delay = 1.0
+
+    async def run():
+        client = _client(stub_server, deadline=0.2)
+        llm = DeepSeekLLM(client=client)
+        llm.api_key = "test-key"
+        try:
+            started = time.monotonic()
+            explanation = await llm.agenerate_explanation(CONTEXT)
+            return explanation, time.monotonic() - started, client.metrics()
+        finally:
+            await llm.aclose()
+
+    explanation, elapsed, metrics = asyncio.run(run())
+    assert explanation == "Your claim has been denied due to the following reasons: Minimum employment"
+    assert elapsed < 0.8
+    assert metrics["timeouts"] == 1
+    assert metrics["in_flight"] == 0
@@ -0,0 +1,26 @@
+import asyncio
+
+from app.api.endpoints.claims import _ndjson_lines
+
+
+async def _collect(body: bytes, size: int, max_line: int):
+    async def stream():
+        for i in range(0, len(body), size):
+            yield body[i:i + size]
+    return [line async for line in _ndjson_lines(stream(), max_line)]
+
+
+def test_lines_split_across_chunks():
+    body = b'{"a": 1}\n{"b": 2}\n{"c": 3}'
+    for size in (1, 3, 7, len(body)):
+        assert asyncio.run(_collect(body, size, 64)) == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+def test_overlong_line_is_dropped_up_to_next_newline():
+    body = b"ok\n" + b"x" * 100 + b"\nafter\n"
+    for size in (1, 5, len(body)):
+        assert asyncio.run(_collect(body, size, 10)) == [b"ok", None, b"after"]
+
+
+def test_overlong_trailing_line_without_newline():
+    assert asyncio.run(_collect(b"ok\n" + b"y" * 50, 4, 10)) == [b"ok", None]
@@ -1,14 +1,97 @@
 import os
+from typing import Dict
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+def parse_route_timeouts(value: str) -> Dict[str, float]:
+    """Parse "prefix=seconds,prefix=seconds" into a dict"""
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        prefix, _, seconds = item.partition("=")
+        timeouts[prefix.strip()] = float(seconds)
+    return timeouts
+
 class Settings:
     def __init__(self):
         self.DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./unemployment.db")
+        # SQLite tuning: page cache per connection (KiB) and memory-mapped I/O
+        # size (bytes); readers get a pool of DB_READ_POOL_SIZE read-only
+        # connections, and writes are committed together by one writer
+        # thread, up to DB_WRITE_BATCH_SIZE per commit, waiting at most
+        # DB_COMMIT_WINDOW_MS for a group to fill while writes are concurrent
+        self.SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+        self.SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+        self.DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+        self.DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "256"))
+        self.DB_COMMIT_WINDOW_MS = float(os.getenv("DB_COMMIT_WINDOW_MS", "2"))
         self.TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
-        self.EMBEDDING_MODEL = "togethercomputer/m2-bert-80M-8k-retrieval"
+        # "local/hashing-768" selects the offline NumPy backend
+        self.EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "togethercomputer/m2-bert-80M-8k-retrieval")
+        self.TOGETHER_API_BASE = os.getenv("TOGETHER_API_BASE", "https://api.together.xyz/v1")
+        self.EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "10"))
+        self.EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "2"))
         self.LLM_MODEL = "deepseek-ai/DeepSeek-R1"
+        # Completion calls are paced to the provider quota (requests per
+        # minute plus a short burst) with at most LLM_MAX_CONCURRENCY in
+        # flight and LLM_MAX_QUEUE waiting; a call that cannot finish within
+        # LLM_DEADLINE seconds gets the fallback message instead
+        self.LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "60"))
+        self.LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+        self.LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "50"))
+        self.LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "20"))
+        # Explanation templates cached by decision signature: entries kept in
+        # memory, the on-disk store (defaults to explanation_cache.db next to
+        # the database; "" disables it) and how long a template is reused
+        self.EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "1000"))
+        self.EXPLANATION_CACHE_PATH = os.getenv("EXPLANATION_CACHE_PATH")
+        self.EXPLANATION_CACHE_TTL = float(os.getenv("EXPLANATION_CACHE_TTL", str(7 * 24 * 3600)))
+        # Frequent-filing check: flag more than TEMPORAL_MAX_CLAIMS claims
+        # for one SSN within TEMPORAL_WINDOW_DAYS
+        self.TEMPORAL_WINDOW_DAYS = int(os.getenv("TEMPORAL_WINDOW_DAYS", "365"))
+        self.TEMPORAL_MAX_CLAIMS = int(os.getenv("TEMPORAL_MAX_CLAIMS", "3"))
+        # Claim history embeddings older than this are dropped from the
+        # on-disk vector store by "python -m services.embedding_store compact"
+        self.HISTORY_RETENTION_DAYS = int(os.getenv("HISTORY_RETENTION_DAYS", "730"))
+        # Embedding cache: entries kept in memory, the on-disk store (defaults
+        # to embedding_cache.db next to the database; "" disables it) and the
+        # most entries it keeps, least recently used pruned first
+        self.EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+        self.EMBEDDING_CACHE_DISK_SIZE = int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "200000"))
+        self.EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+        # Micro-batching of concurrent embedding calls (0 ms window disables it)
+        self.EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "0"))
+        self.EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+        # Reverse proxy in main.py: the Streamlit server, the upstream
+        # connection pool, and upstream timeouts in seconds, overridable per
+        # path prefix (longest match wins), e.g. "/_stcore/upload_file=300"
+        self.STREAMLIT_URL = os.getenv("STREAMLIT_URL", "http://localhost:8501")
+        self.PROXY_MAX_CONNECTIONS = int(os.getenv("PROXY_MAX_CONNECTIONS", "100"))
+        self.PROXY_TIMEOUT = float(os.getenv("PROXY_TIMEOUT", "30"))
+        self.PROXY_ROUTE_TIMEOUTS = parse_route_timeouts(os.getenv("PROXY_ROUTE_TIMEOUTS", ""))
+        # Streamlit child process: longest wait for it at startup, seconds
+        # between health checks once up, and the cap on restart backoff
+        self.STREAMLIT_STARTUP_TIMEOUT = float(os.getenv("STREAMLIT_STARTUP_TIMEOUT", "60"))
+        self.STREAMLIT_HEALTH_INTERVAL = float(os.getenv("STREAMLIT_HEALTH_INTERVAL", "5"))
+        self.STREAMLIT_RESTART_BACKOFF_MAX = float(os.getenv("STREAMLIT_RESTART_BACKOFF_MAX", "30"))
+        # Multi-worker mode: STREAMLIT_WORKERS > 1 runs that many Streamlit
+        # processes on consecutive ports from STREAMLIT_URL, plus one loader
+        # (services/index_loader.py) that shares the fraud pattern and claim history
+        # matrices with them through memory-mapped files in SHARED_INDEX_DIR
+        # (defaults to shared_index/ next to the database; /dev/shm keeps it
+        # in RAM), checking the database every INDEX_PUBLISH_INTERVAL seconds.
+        # SHARED_INDEXES is set for the workers to attach instead of loading.
+        self.STREAMLIT_WORKERS = int(os.getenv("STREAMLIT_WORKERS", "1"))
+        self.SHARED_INDEX_DIR = os.getenv("SHARED_INDEX_DIR")
+        self.SHARED_INDEXES = os.getenv("SHARED_INDEXES", "").lower() in ("1", "true", "yes")
+        self.INDEX_PUBLISH_INTERVAL = float(os.getenv("INDEX_PUBLISH_INTERVAL", "2"))
+        # The claim history matrix is only republished after a retrain, once
+        # HISTORY_REPUBLISH_ROWS rows (or a quarter of the index) were added,
+        # or HISTORY_REPUBLISH_INTERVAL seconds after the last publish if
+        # rows were added; until then workers index new rows in a local delta
+        self.HISTORY_REPUBLISH_ROWS = int(os.getenv("HISTORY_REPUBLISH_ROWS", "4096"))
+        self.HISTORY_REPUBLISH_INTERVAL = float(os.getenv("HISTORY_REPUBLISH_INTERVAL", "600"))
 
 settings = Settings() 
\ No newline at end of file
@@ -1,23 +1,75 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
+from database.writer import GroupCommitWriter
 import os
 
 # Configure SQLite DB connection
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, '../unemployment.db')}"
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+DATABASE_PATH = os.path.abspath(os.path.join(BASE_DIR, '../unemployment.db'))
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+# Sidecar files (indexes, caches) are kept next to the database file
+DATA_DIR = os.path.dirname(DATABASE_PATH)
+
+def _create_engine(**kwargs):
+    engine = create_engine(
+        DATABASE_URL,
+        # Needed for SQLite; timeout is how long to wait for another process's write lock
+        connect_args={"check_same_thread": False, "timeout": 30},
+        **kwargs
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the writer; NORMAL only syncs at checkpoints
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.close()
+
+    return engine
+
+# General-purpose engine for schema changes and scripts
+engine = _create_engine()
+
+# Pooled engine whose connections refuse writes; readers use ReadSessionLocal
+read_engine = _create_engine(pool_size=settings.DB_READ_POOL_SIZE, max_overflow=0)
+
+@event.listens_for(read_engine, "connect")
+def _read_only(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA query_only=ON")
+
+# The writer thread's engine. Transactions start with BEGIN IMMEDIATE so the
+# write lock is taken up front: a writer in another process then waits out
+# the busy timeout instead of failing to upgrade a read lock.
+write_engine = _create_engine(pool_size=1, max_overflow=0)
+
+@event.listens_for(write_engine, "connect")
+def _manual_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(write_engine, "begin")
+def _begin_immediate(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+WriteSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=write_engine)
 Base = declarative_base()
 
+# All application writes go through this thread and are committed in groups
+writer = GroupCommitWriter(
+    WriteSessionLocal,
+    max_batch_size=settings.DB_WRITE_BATCH_SIZE,
+    max_wait_ms=settings.DB_COMMIT_WINDOW_MS
+)
+
 # Import all models here to ensure they are registered with Base
 from database.models import Applicant, FraudPattern, EligibilityRule, ClaimHistory
 
 # Create all tables
 def init_db():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, func, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from database import Base
+from database.types import Embedding
 
 class Applicant(Base):
     __tablename__ = "applicants"
@@ -9,7 +10,7 @@ class Applicant(Base):
     ssn_last4 = Column(String(4), index=True)
     employer = Column(String(100))
     separation_reason = Column(String)
-    separation_embedding = Column(JSON)
+    separation_embedding = Column(Embedding())
     earnings = Column(Float)
     employment_months = Column(Integer)
     status = Column(String(20))
@@ -22,7 +23,7 @@ class FraudPattern(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String(255), index=True)
-    embedding = Column(JSON)
+    embedding = Column(Embedding(store_norm=True))
     severity = Column(Integer)
 
 class EligibilityRule(Base):
@@ -35,8 +36,12 @@ class EligibilityRule(Base):
 
 class ClaimHistory(Base):
     __tablename__ = "claim_history"
+    __table_args__ = (
+        # Serves the per-SSN sliding-window lookups in the fraud detector
+        Index("ix_claim_history_ssn_date", "ssn_last4", "claim_date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     ssn_last4 = Column(String(4), index=True)
     claim_date = Column(DateTime)
     employer = Column(String(100))
-    embedding = Column(String) 
\ No newline at end of file
+    embedding = Column(Embedding(store_norm=True)) 
\ No newline at end of file
@@ -0,0 +1,67 @@
+import json
+from typing import Any, Optional
+
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+# Embeddings are stored as raw little-endian float32 regardless of host byte order
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+class StoredEmbedding(np.ndarray):
+    """float32 vector decoded from an Embedding column, with its stored L2 norm"""
+    norm: Optional[float] = None
+
+
+def encode_embedding(value: Any, store_norm: bool = False) -> Optional[bytes]:
+    """Encode a list/array (or legacy JSON text) as a float32 BLOB"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    vector = np.asarray(value, dtype=EMBEDDING_DTYPE).ravel()
+    if vector.size == 0:
+        return None
+    if store_norm:
+        norm = np.asarray([np.linalg.norm(vector)], dtype=EMBEDDING_DTYPE)
+        return norm.tobytes() + vector.tobytes()
+    return vector.tobytes()
+
+
+def decode_embedding(value: Any, store_norm: bool = False) -> Optional[np.ndarray]:
+    """Decode a float32 BLOB without copying; legacy JSON text is still accepted"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        vector = np.asarray(json.loads(value), dtype=EMBEDDING_DTYPE)
+        norm = float(np.linalg.norm(vector))
+    else:
+        data = np.frombuffer(value, dtype=EMBEDDING_DTYPE)
+        if not store_norm:
+            return data
+        vector, norm = data[1:], float(data[0])
+
+    vector = vector.view(StoredEmbedding)
+    vector.norm = norm
+    return vector
+
+
+class Embedding(TypeDecorator):
+    """Embedding vector column stored as a little-endian float32 BLOB.
+
+    With ``store_norm=True`` the vector's L2 norm is kept as a leading float32
+    so similarity code can skip recomputing it. Values read back are read-only
+    NumPy arrays backed directly by the row's bytes.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, store_norm: bool = False, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store_norm = store_norm
+
+    def process_bind_param(self, value, dialect):
+        return encode_embedding(value, self.store_norm)
+
+    def process_result_value(self, value, dialect):
+        return decode_embedding(value, self.store_norm)
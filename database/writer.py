@@ -0,0 +1,108 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+# A unit of work: called with the writer's Session, returns the caller's result
+WriteFn = Callable[[Any], Any]
+
+
+class GroupCommitWriter:
+    """Runs every database write on one thread and commits them in groups.
+
+    Callers submit a function that takes a Session and get a Future. The
+    writer thread runs whatever is waiting (up to ``max_batch_size``) in a
+    single transaction and commits once for the group. While writes arrive
+    concurrently it also lingers up to ``max_wait_ms`` for a group to fill;
+    a lone write is committed straight away. If one function raises, the
+    group is rolled back, its caller gets the exception and the others are
+    run again without it, so functions should only do session work.
+    Futures resolve after the commit: a result means the write is in the
+    database. Return plain values (ids, counts) rather than ORM objects
+    that need the session.
+    """
+
+    def __init__(self, session_factory, max_batch_size: int = 256, max_wait_ms: float = 2.0):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[WriteFn, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.groups_committed = 0
+        self.writes_committed = 0
+        self.writes_failed = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn: WriteFn) -> Future:
+        """Queue a write; the Future resolves to fn's result once committed"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def run(self, fn: WriteFn, timeout: Optional[float] = None) -> Any:
+        """Blocking interface"""
+        return self.submit(fn).result(timeout)
+
+    async def arun(self, fn: WriteFn) -> Any:
+        """asyncio interface; does not block the event loop"""
+        return await asyncio.wrap_future(self.submit(fn))
+
+    def _run(self) -> None:
+        linger = 0.0
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + linger
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            # Writes are arriving concurrently: worth waiting for the next group to fill
+            linger = self.max_wait if len(batch) > 1 else 0.0
+            self._commit([(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()])
+
+    def _commit(self, batch: List[Tuple[WriteFn, Future]]) -> None:
+        while batch:
+            results = []
+            failed = None
+            try:
+                with self.session_factory() as db:
+                    for i, (fn, _) in enumerate(batch):
+                        try:
+                            results.append(fn(db))
+                            # Constraint errors surface here, charged to this write
+                            db.flush()
+                        except Exception as e:
+                            failed = i, e
+                            break
+                    if failed is None:
+                        db.commit()
+            except Exception as e:
+                # The commit itself failed: nothing in the group was written
+                for _, future in batch:
+                    future.set_exception(e)
+                self.writes_failed += len(batch)
+                return
+
+            if failed is None:
+                self.groups_committed += 1
+                self.writes_committed += len(batch)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+                return
+            # Rolled back on leaving the session; retry the group without the failed write
+            i, error = failed
+            batch[i][1].set_exception(error)
+            self.writes_failed += 1
+            batch = batch[:i] + batch[i + 1:]
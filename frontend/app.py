@@ -1,8 +1,6 @@
 import streamlit as st
-import together
 from datetime import datetime
 import json
-import time
 import re
 import sys
 import os
@@ -13,16 +11,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.fraud_detector import FraudDetector
 from services.eligibility import EligibilityChecker
-from services.llm_service import DeepSeekLLM
+from services.llm_service import DeepSeekLLM, llm_client
+from services.llm_client import LLMUnavailable
+from services.explanation_cache import decision_signature
 from database import SessionLocal
 from database.models import Applicant, ClaimHistory
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Together client
-together.api_key = os.getenv("TOGETHER_API_KEY")
-
 def get_greeting():
     hour = datetime.now().hour
     if 5 <= hour < 12: return "🌞 Good morning!"
@@ -30,35 +27,32 @@ def get_greeting():
     else: return "🌙 Good evening!"
 
 def generate_response(messages):
-    """Handle free tier rate limits with retries"""
-    max_retries = 3
+    """Chat reply through the shared rate-limited client; sheds load instead
+    of sleeping in the script thread when the quota is used up"""
     # Convert messages to a prompt string
     prompt = ""
     for m in messages:
         prompt += f"{m['role']}: {m['content']}\n"
-    for attempt in range(max_retries):
-        try:
-            response = together.Complete.create(
-                prompt=prompt,
-                model="meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
-                temperature=0.5,
-                max_tokens=150,
-                stop=["\n\n"] 
-            )
-            if 'choices' in response and response['choices']:
-                return response['choices'][0]['text'].strip()
-            else:
-                st.error(f"LLM response missing 'choices' key: {response}")
-                return "I apologize, but I'm having trouble generating a response right now. Please try again later."
-        except Exception as e:
-            if "rate limit" in str(e).lower():
-                wait_time = (2 ** attempt) + 0.5
-                st.warning(f"Processing... (attempt {attempt+1}/3)")
-                time.sleep(wait_time)
-            else:
-                st.error(f"Error: {str(e)}")
-                return None
-    return "I'm currently overwhelmed with requests. Please try again in a minute."
+    try:
+        response = llm_client.complete({
+            "prompt": prompt,
+            "model": "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
+            "temperature": 0.5,
+            "max_tokens": 150,
+            "stop": ["\n\n"]
+        })
+        if 'choices' in response and response['choices']:
+            return response['choices'][0]['text'].strip()
+        else:
+            st.error(f"LLM response missing 'choices' key: {response}")
+            return "I apologize, but I'm having trouble generating a response right now. Please try again later."
+    except LLMUnavailable:
+        return "I'm currently overwhelmed with requests. Please try again in a minute."
+    except Exception as e:
+        if "429" in str(e) or "rate limit" in str(e).lower():
+            return "I'm currently overwhelmed with requests. Please try again in a minute."
+        st.error(f"Error: {str(e)}")
+        return None
 
 def analyze_claim(claim_data):
     try:
@@ -114,22 +108,47 @@ def analyze_claim(claim_data):
         - Format as: "Explanation: [your text]"
 """
         
-        explanation = llm.generate_explanation(
-            base_prompt.format(status=status, context=json.dumps(explanation_context))
+        tokens = llm.stream_explanation(
+            base_prompt.format(status=status, context=json.dumps(explanation_context)),
+            signature=decision_signature(
+                status,
+                [r["rule"] for r in failed_rules],
+                fraud_result["score"],
+                fraud_result["hard_rule_violations"]
+            ),
+            values=explanation_context["user_data"]
         )
-        explanation = clean_response(explanation)  # Add this line
-                
-        # Format the response - only show status and explanation
-        formatted_response = f"""
+        # The decision is ready now; the explanation streams in as it is generated
+        return status, strip_explanation_label(tokens)
+    except Exception as e:
+        st.error(f"Error processing claim: {str(e)}")
+        return None
+
+
+def strip_explanation_label(tokens, label="Explanation:", lookahead=40):
+    """Drop the leading "Explanation:" label from a token stream"""
+    tokens = iter(tokens)
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        if label in buffer:
+            buffer = buffer.split(label, 1)[1].lstrip()
+            break
+        if len(buffer) > lookahead:
+            break
+    if buffer:
+        yield buffer
+    yield from tokens
+
+
+def format_decision(status, explanation):
+    # Format the response - only show status and explanation
+    return f"""
         **Status**: {status.upper()}
 
         **Explanation**:  
         {explanation.split('Explanation:')[-1].strip()}
         """
-        return formatted_response
-    except Exception as e:
-        st.error(f"Error processing claim: {str(e)}")
-        return None
 
 
 def clean_response(text):
@@ -237,8 +256,15 @@ def main():
                     # Process complete claim
                     with st.spinner("Reviewing your claim..."):
                         decision = analyze_claim(st.session_state.claim_data)
-                        st.session_state.messages.append({"role": "assistant", "content": decision})
-                        st.chat_message("assistant").write(decision)
+                    if decision:
+                        status, tokens = decision
+                        with st.chat_message("assistant"):
+                            st.markdown(f"**Status**: {status.upper()}\n\n**Explanation**:")
+                            explanation = clean_response(st.write_stream(tokens))
+                        st.session_state.messages.append({
+                            "role": "assistant",
+                            "content": format_decision(status, explanation)
+                        })
                     
                     response = "To file another claim, just say: 'start claim'"
                     reset_claim()
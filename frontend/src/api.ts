@@ -9,4 +9,15 @@ const api = axios.create({
   },
 });
 
+// Claims are accepted with 202 and a claim id, then decided by background
+// workers; long-poll the claim until it is done
+export const submitClaim = async (claim: object) => {
+  const { data: accepted } = await api.post('/claims/submit', claim);
+  for (;;) {
+    const { data } = await api.get(`/claims/${accepted.claim_id}`, { params: { wait: 25 } });
+    if (data.state === 'done') return data;
+    if (data.state === 'failed') throw new Error(data.error || 'Claim processing failed');
+  }
+};
+
 export default api; 
\ No newline at end of file
@@ -13,7 +13,7 @@ import {
   CircularProgress,
 } from '@mui/material';
 import SendIcon from '@mui/icons-material/Send';
-import api from '../api';
+import { submitClaim as submitClaimRequest } from '../api';
 
 interface Message {
   type: 'user' | 'bot';
@@ -159,13 +159,11 @@ const Chat: React.FC = () => {
   const submitClaim = async () => {
     try {
       addMessage("Processing your claim...", 'bot');
-      const response = await api.post('/claims/submit', {
+      const { status, explanation, fraud_score } = await submitClaimRequest({
         ...claimData,
         earnings: parseFloat(claimData.earnings || '0'),
         employment_months: parseInt(claimData.employment_months || '0')
       });
-
-      const { status, explanation, fraud_score } = response.data;
       addMessage(`Claim Status: ${status.toUpperCase()}\n\n${explanation}\n\nFraud Score: ${fraud_score}`, 'bot');
       
       // Reset for new claim
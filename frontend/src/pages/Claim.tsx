@@ -10,7 +10,7 @@ import {
   Alert,
 } from '@mui/material';
 import { useMutation } from 'react-query';
-import axios from 'axios';
+import { submitClaim as submitClaimRequest } from '../api';
 
 interface ClaimForm {
   ssn_last4: string;
@@ -33,12 +33,11 @@ const Claim = () => {
 
   const submitClaim = async (formData: ClaimForm) => {
     try {
-      const response = await axios.post('http://localhost:8000/api/claims/submit', {
+      return await submitClaimRequest({
         ...formData,
         earnings: parseFloat(formData.earnings),
         employment_months: parseInt(formData.employment_months)
       });
-      return response.data;
     } catch (error) {
       console.error('Error submitting claim:', error);
       throw error;
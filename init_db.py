@@ -1,10 +1,12 @@
 from database import Base, engine, init_db
 from database.models import FraudPattern, EligibilityRule, Applicant, ClaimHistory
 from database import SessionLocal
+from services.embedding_store import EmbeddingStore, rebuild_from_table
+from services.index_loader import HISTORY_INDEX_PATH, HISTORY_VECTORS_PATH
 import numpy as np
+import os
 from datetime import datetime, timedelta
 import random
-import json
 
 def populate_db():
     # Drop all existing tables
@@ -170,7 +172,7 @@ def populate_db():
                         ssn_last4=ssn,
                         employer=f"Previous Employer {j}",
                         claim_date=datetime.now() - timedelta(days=random.randint(30, 300)),
-                        embedding=json.dumps([random.uniform(0.6, 0.8) for _ in range(768)])
+                        embedding=[random.uniform(0.6, 0.8) for _ in range(768)]
                     ))
         
         # Special test cases
@@ -215,10 +217,16 @@ def populate_db():
                         ssn_last4="3574",
                         employer=f"Temp Employer {j}",
                         claim_date=datetime.now() - timedelta(days=30*j),
-                        embedding=json.dumps([random.uniform(0.6, 0.8) for _ in range(768)])
+                        embedding=[random.uniform(0.6, 0.8) for _ in range(768)]
                     ))
         
         db.commit()
+        # Old rows in the embedding store would collide with the new ids
+        rebuild_from_table(EmbeddingStore(HISTORY_VECTORS_PATH), SessionLocal, ClaimHistory)
+        # Likewise the history index checkpoint; it is rebuilt on next load
+        for path in (HISTORY_INDEX_PATH, f"{HISTORY_INDEX_PATH}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
         print("Database initialized with enhanced sample data!")
 
 if __name__ == "__main__":
@@ -1,74 +1,242 @@
-import os
 import sys
 from pathlib import Path
-import requests
-from fastapi import FastAPI, Request, WebSocket
-from fastapi.responses import HTMLResponse, StreamingResponse
-import streamlit.web.bootstrap as bootstrap
-import threading
-import time
-import subprocess
+from typing import AsyncIterator, Dict, List, Tuple
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
 import asyncio
+from urllib.parse import urlparse
+import httpx
 import websockets
 
 # Add the project root to Python path
 project_root = Path(__file__).parent
 sys.path.append(str(project_root))
 
-app = FastAPI()
+from config import settings
+from services.index_loader import SHARED_INDEX_DIR
+from services.shared_matrix import SharedArrayStore
+from supervisor import ProcessSupervisor
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Start Streamlit in a separate process
-    streamlit_process = subprocess.Popen([
+# Connection-level headers that must not be forwarded by a proxy
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host"
+}
+# Set by uvicorn on every response
+SERVER_HEADERS = {"date", "server"}
+
+# Pins a browser to one Streamlit worker, which holds its session state
+WORKER_COOKIE = "streamlit_worker"
+
+def _streamlit_command(port: int) -> List[str]:
+    return [
         "streamlit", "run",
         str(project_root / "frontend" / "app.py"),
-        "--server.port=8501",
+        f"--server.port={port}",
         "--server.address=0.0.0.0",
         "--server.headless=true"
-    ])
-    # Wait for Streamlit to start
-    time.sleep(5)
+    ]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    streamlit_url = urlparse(settings.STREAMLIT_URL)
+    workers = max(1, settings.STREAMLIT_WORKERS)
+    loader = None
+    env = None
+    if workers > 1:
+        # One loader process owns the index matrices; the workers map what it
+        # publishes instead of each loading a copy
+        pattern_store = SharedArrayStore(SHARED_INDEX_DIR, "patterns")
+        history_store = SharedArrayStore(SHARED_INDEX_DIR, "history")
+        loader = ProcessSupervisor(
+            [sys.executable, "-m", "services.index_loader"],
+            health_check=lambda: pattern_store.generation() > 0 and history_store.generation() > 0,
+            check_interval=settings.STREAMLIT_HEALTH_INTERVAL,
+            restart_backoff_max=settings.STREAMLIT_RESTART_BACKOFF_MAX,
+            env={"PYTHONPATH": str(project_root)},
+            name="Index loader"
+        )
+        loader.start()
+        if not await asyncio.to_thread(loader.wait_ready, settings.STREAMLIT_STARTUP_TIMEOUT):
+            print(f"Indexes not published after {settings.STREAMLIT_STARTUP_TIMEOUT}s; starting workers anyway")
+        env = {"SHARED_INDEXES": "1"}
+    app.state.loader = loader
+
+    # Start Streamlit in separate processes on consecutive ports, restarted if they die
+    base_port = streamlit_url.port or 8501
+    app.state.worker_urls = [
+        f"{streamlit_url.scheme}://{streamlit_url.hostname}:{base_port + i}" for i in range(workers)
+    ]
+    app.state.supervisors = [
+        ProcessSupervisor(
+            _streamlit_command(base_port + i),
+            url + "/_stcore/health",
+            check_interval=settings.STREAMLIT_HEALTH_INTERVAL,
+            restart_backoff_max=settings.STREAMLIT_RESTART_BACKOFF_MAX,
+            env=env,
+            name=f"Streamlit worker {i}" if workers > 1 else "Streamlit"
+        )
+        for i, url in enumerate(app.state.worker_urls)
+    ]
+    app.state.next_worker = 0
+    for supervisor in app.state.supervisors:
+        supervisor.start()
+    # One keep-alive pool for every proxied request
+    app.state.http_client = httpx.AsyncClient(
+        timeout=settings.PROXY_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=settings.PROXY_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.PROXY_MAX_CONNECTIONS
+        )
+    )
+    # Start serving as soon as Streamlit answers its health check
+    if not await asyncio.to_thread(app.state.supervisors[0].wait_ready, settings.STREAMLIT_STARTUP_TIMEOUT):
+        print(f"Streamlit not ready after {settings.STREAMLIT_STARTUP_TIMEOUT}s; serving anyway")
     yield
     # Cleanup
-    streamlit_process.terminate()
+    await app.state.http_client.aclose()
+    await asyncio.gather(*(asyncio.to_thread(s.stop) for s in app.state.supervisors))
+    if loader is not None:
+        await asyncio.to_thread(loader.stop)
 
 app = FastAPI(lifespan=lifespan)
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    # Proxy the request to Streamlit
-    response = requests.get("http://localhost:8501")
-    return response.text
+def _route_timeout(path: str) -> float:
+    """Upstream timeout for a path: the longest matching PROXY_ROUTE_TIMEOUTS prefix"""
+    path = "/" + path.lstrip("/")
+    matches = [prefix for prefix in settings.PROXY_ROUTE_TIMEOUTS if path.startswith(prefix)]
+    if not matches:
+        return settings.PROXY_TIMEOUT
+    return settings.PROXY_ROUTE_TIMEOUTS[max(matches, key=len)]
+
+def _pick_worker(app: FastAPI, cookies: Dict[str, str]) -> int:
+    """The worker a client is pinned to, or the next ready one round-robin"""
+    supervisors = app.state.supervisors
+    pinned = cookies.get(WORKER_COOKIE, "")
+    if pinned.isdigit() and int(pinned) < len(supervisors) and supervisors[int(pinned)].ready:
+        return int(pinned)
+    ready = [i for i, supervisor in enumerate(supervisors) if supervisor.ready]
+    if not ready:
+        # Nothing is up yet; try the first one and report if it fails
+        return 0
+    app.state.next_worker += 1
+    return ready[app.state.next_worker % len(ready)]
+
+def _forward_headers(headers: List[Tuple[bytes, bytes]], drop=HOP_BY_HOP_HEADERS) -> List[Tuple[bytes, bytes]]:
+    return [(k, v) for k, v in headers if k.decode("latin-1").lower() not in drop]
 
 @app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+async def health_check(request: Request):
+    """200 while a Streamlit worker is up; 503 while none is (starting,
+    restarting or failing checks)"""
+    workers = [supervisor.status() for supervisor in request.app.state.supervisors]
+    healthy = any(worker["state"] == "ready" for worker in workers)
+    body = {
+        "status": "healthy" if healthy else "unavailable",
+        "streamlit": workers[0] if len(workers) == 1 else workers
+    }
+    # Workers keep serving the last published indexes while the loader restarts
+    if request.app.state.loader is not None:
+        body["index_loader"] = request.app.state.loader.status()
+    return JSONResponse(body, status_code=200 if healthy else 503)
 
-@app.websocket("/_stcore/stream")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
+@app.websocket("/{path:path}")
+async def proxy_websocket(websocket: WebSocket, path: str):
+    """Relay a WebSocket (Streamlit's /_stcore/stream) in both directions"""
+    worker = _pick_worker(websocket.app, websocket.cookies)
+    url = websocket.app.state.worker_urls[worker].replace("http", "ws", 1) + "/" + path
+    if websocket.url.query:
+        url += "?" + websocket.url.query
+    # Streamlit checks its XSRF cookie against a token sent as a subprotocol
+    cookie = websocket.headers.get("cookie")
     try:
-        async with websockets.connect("ws://localhost:8501/_stcore/stream") as streamlit_ws:
-            while True:
-                try:
-                    # Forward messages from Streamlit to client
-                    streamlit_message = await streamlit_ws.recv()
-                    await websocket.send_text(streamlit_message)
-                except websockets.exceptions.ConnectionClosed:
-                    break
+        streamlit_ws = await websockets.connect(
+            url,
+            subprotocols=websocket.scope.get("subprotocols") or None,
+            extra_headers=[("Cookie", cookie)] if cookie else None,
+            open_timeout=_route_timeout(path),
+            max_size=None
+        )
     except Exception as e:
         print(f"WebSocket error: {str(e)}")
+        await websocket.close(code=1011)
+        return
+    await websocket.accept(subprotocol=streamlit_ws.subprotocol)
+
+    async def client_to_streamlit():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                await streamlit_ws.send(message["bytes"])
+            elif message.get("text") is not None:
+                await streamlit_ws.send(message["text"])
+
+    async def streamlit_to_client():
+        # Streamlit sends binary protobuf frames
+        async for message in streamlit_ws:
+            if isinstance(message, bytes):
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(message)
+
+    relays = [asyncio.create_task(client_to_streamlit()), asyncio.create_task(streamlit_to_client())]
+    try:
+        done, pending = await asyncio.wait(relays, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, websockets.exceptions.ConnectionClosed):
+                print(f"WebSocket error: {str(error)}")
     finally:
-        await websocket.close()
+        for task in relays:
+            task.cancel()
+        await asyncio.gather(*relays, return_exceptions=True)
+        await streamlit_ws.close()
+        try:
+            await websocket.close(code=streamlit_ws.close_code or 1000)
+        except (RuntimeError, WebSocketDisconnect):
+            # The client already went away
+            pass
 
-@app.get("/{path:path}")
+async def _relay(upstream: httpx.Response) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in upstream.aiter_raw():
+            yield chunk
+    finally:
+        await upstream.aclose()
+
+@app.api_route("/{path:path}", methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
 async def proxy_streamlit(path: str, request: Request):
-    # Forward all other requests to Streamlit
-    streamlit_url = f"http://localhost:8501/{path}"
-    response = requests.get(streamlit_url, params=request.query_params)
-    return StreamingResponse(
-        response.iter_content(chunk_size=1024),
-        media_type=response.headers.get("content-type", "text/html")
-    ) 
\ No newline at end of file
+    """Forward everything else to Streamlit, streaming both bodies through"""
+    client: httpx.AsyncClient = request.app.state.http_client
+    worker = _pick_worker(request.app, request.cookies)
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    upstream_request = client.build_request(
+        request.method,
+        request.app.state.worker_urls[worker] + "/" + path,
+        params=request.url.query,
+        headers=_forward_headers(request.headers.raw),
+        content=request.stream() if has_body else None,
+        timeout=_route_timeout(path)
+    )
+    try:
+        upstream = await client.send(upstream_request, stream=True)
+    except httpx.TimeoutException:
+        return Response("Streamlit did not respond in time", status_code=504)
+    except httpx.TransportError as e:
+        if not request.app.state.supervisors[worker].ready:
+            # Being (re)started by the supervisor; worth retrying shortly
+            return Response("Streamlit is starting", status_code=503, headers={"Retry-After": "2"})
+        print(f"Proxy error: {str(e)}")
+        return Response("Streamlit is unavailable", status_code=502)
+
+    response = StreamingResponse(_relay(upstream), status_code=upstream.status_code)
+    # Raw headers keep repeated ones (Set-Cookie) and the upstream encoding
+    response.raw_headers = _forward_headers(upstream.headers.raw, HOP_BY_HOP_HEADERS | SERVER_HEADERS)
+    if len(request.app.state.supervisors) > 1 and request.cookies.get(WORKER_COOKIE) != str(worker):
+        response.raw_headers.append(
+            (b"set-cookie", f"{WORKER_COOKIE}={worker}; Path=/; HttpOnly; SameSite=Lax".encode("latin-1"))
+        )
+    return response
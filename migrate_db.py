@@ -0,0 +1,50 @@
+from sqlalchemy import text
+from database import Base, engine, DATABASE_PATH
+from database.types import encode_embedding
+import os
+
+# (table, column, store_norm) for every embedding column, matching database/models.py
+EMBEDDING_COLUMNS = [
+    ("applicants", "separation_embedding", False),
+    ("fraud_patterns", "embedding", True),
+    ("claim_history", "embedding", True),
+]
+
+BATCH_SIZE = 500
+
+def migrate_embeddings():
+    """Rewrite JSON-encoded embeddings as float32 BLOBs in place"""
+    for table, column, store_norm in EMBEDDING_COLUMNS:
+        converted = 0
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                f"SELECT id, {column} FROM {table} WHERE typeof({column}) = 'text'"
+            )).fetchall()
+            for start in range(0, len(rows), BATCH_SIZE):
+                batch = rows[start:start + BATCH_SIZE]
+                conn.execute(
+                    text(f"UPDATE {table} SET {column} = :value WHERE id = :id"),
+                    [{"id": row[0], "value": encode_embedding(row[1], store_norm)} for row in batch]
+                )
+                converted += len(batch)
+        print(f"{table}.{column}: converted {converted} rows")
+
+def create_indexes():
+    """Add indexes declared on the models that an older database lacks"""
+    # create_all() skips indexes on tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def vacuum():
+    """Reclaim the space freed by the smaller encoding"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+if __name__ == "__main__":
+    size_before = os.path.getsize(DATABASE_PATH)
+    migrate_embeddings()
+    create_indexes()
+    vacuum()
+    size_after = os.path.getsize(DATABASE_PATH)
+    print(f"Database size: {size_before} -> {size_after} bytes")
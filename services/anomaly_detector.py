@@ -0,0 +1,383 @@
+import atexit
+import json
+import math
+import os
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshots are still atomic, just not merge-locked
+    fcntl = None
+
+SNAPSHOT_VERSION = 1
+
+
+class RunningStats:
+    """Welford running mean/variance; mergeable with Chan's parallel formula"""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningStats") -> None:
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, float]) -> "RunningStats":
+        return cls(int(data["count"]), float(data["mean"]), float(data["m2"]))
+
+
+class QuantileSketch:
+    """DDSketch-style quantile sketch for non-negative values.
+
+    Values fall into logarithmic buckets of width ``gamma = (1 + a) / (1 - a)``,
+    so any quantile is returned within relative error ``a``. Sketches with
+    the same accuracy merge exactly by adding bucket counts. When there are
+    more than ``max_buckets`` buckets the lowest ones are collapsed, which
+    only costs accuracy at the bottom of the distribution.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        keys = sorted(self.buckets)
+        excess = keys[:len(keys) - self.max_buckets + 1]
+        self.buckets[excess[-1]] += sum(self.buckets.pop(key) for key in excess[:-1])
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "buckets": {str(key): count for key, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], max_buckets: int = 2048) -> "QuantileSketch":
+        sketch = cls(float(data["relative_accuracy"]), max_buckets)
+        sketch.zero_count = int(data["zero_count"])
+        sketch.buckets = {int(key): int(count) for key, count in data["buckets"].items()}
+        sketch.count = sketch.zero_count + sum(sketch.buckets.values())
+        return sketch
+
+
+class EarningsProfile:
+    """Running moments plus a quantile sketch for one population"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value: float) -> None:
+        self.stats.add(value)
+        self.sketch.add(value)
+
+    def merge(self, other: "EarningsProfile") -> None:
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"stats": self.stats.to_dict(), "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EarningsProfile":
+        profile = cls()
+        profile.stats = RunningStats.from_dict(data["stats"])
+        profile.sketch = QuantileSketch.from_dict(data["sketch"])
+        return profile
+
+
+class EarningsModel:
+    """Global and per-employer earnings profiles"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.overall = EarningsProfile(relative_accuracy)
+        self.employers: Dict[str, EarningsProfile] = {}
+
+    def add(self, employer: str, value: float) -> None:
+        self.overall.add(value)
+        profile = self.employers.get(employer)
+        if profile is None:
+            profile = self.employers[employer] = EarningsProfile(self.relative_accuracy)
+        profile.add(value)
+
+    def merge(self, other: "EarningsModel") -> None:
+        self.overall.merge(other.overall)
+        for employer, profile in other.employers.items():
+            if employer in self.employers:
+                self.employers[employer].merge(profile)
+            else:
+                self.employers[employer] = EarningsProfile.from_dict(profile.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "overall": self.overall.to_dict(),
+            "employers": {name: profile.to_dict() for name, profile in self.employers.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EarningsModel":
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported earnings snapshot version {data.get('version')}")
+        model = cls(float(data["overall"]["sketch"]["relative_accuracy"]))
+        model.overall = EarningsProfile.from_dict(data["overall"])
+        model.employers = {
+            name: EarningsProfile.from_dict(profile) for name, profile in data["employers"].items()
+        }
+        return model
+
+
+class EarningsAnomalyDetector:
+    """Streaming outlier check on a claim's earnings per month.
+
+    Each claim is scored against its employer's profile once that employer
+    has ``min_samples`` claims, otherwise against the global one, and then
+    added to both in O(1). A claim is an anomaly when its z-score exceeds
+    ``z_threshold`` and it also falls outside the profile's
+    [``lower_quantile``, ``upper_quantile``] range, which keeps heavy-tailed
+    employers from flagging every high earner.
+
+    State is snapshotted to ``path`` every ``save_every`` claims and at exit.
+    Saving merges this process's unsaved updates into whatever is on disk
+    under a file lock and reloads the result, so several workers sharing a
+    snapshot each contribute their own claims and see the others'. Without
+    a snapshot the model is seeded with one pass over ``model`` (any table
+    with employer, earnings and employment_months columns).
+    """
+
+    # Claims report total earnings over the last 6 months
+    EARNINGS_MONTHS = 6
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        session_factory=None,
+        model=None,
+        z_threshold: float = 3.0,
+        lower_quantile: float = 0.01,
+        upper_quantile: float = 0.99,
+        min_samples: int = 30,
+        save_every: int = 256
+    ):
+        self.path = path
+        self.session_factory = session_factory
+        self.model = model
+        self.z_threshold = z_threshold
+        self.lower_quantile = lower_quantile
+        self.upper_quantile = upper_quantile
+        self.min_samples = min_samples
+        self.save_every = save_every
+
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._state = EarningsModel()
+        self._unsaved = EarningsModel()
+        self._unsaved_count = 0
+        self._seed_state: Optional[EarningsModel] = None
+        # Whether _state started from a snapshot or a seed pass
+        self._has_base = False
+
+        if path:
+            atexit.register(self.save)
+
+    @classmethod
+    def earnings_per_month(cls, claim: Dict) -> Optional[float]:
+        try:
+            earnings = float(claim["earnings"])
+            months = int(claim["employment_months"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        return earnings / min(max(months, 1), cls.EARNINGS_MONTHS)
+
+    @staticmethod
+    def _employer_key(claim: Dict) -> str:
+        return str(claim.get("employer") or "").strip().lower()
+
+    def load(self) -> None:
+        """Restore the snapshot (once), seeding it from the database if missing"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.path and os.path.exists(self.path):
+                self._state = self._read(self.path)
+                self._has_base = True
+            elif self.session_factory is not None and self.model is not None:
+                self._seed()
+                self._has_base = True
+            self._loaded = True
+
+    @staticmethod
+    def _read(path: str) -> EarningsModel:
+        with open(path) as f:
+            return EarningsModel.from_dict(json.load(f))
+
+    def _seed(self) -> None:
+        # Kept apart from _unsaved: if another worker saves a snapshot
+        # first, this copy of the same rows must not be merged into it
+        self._seed_state = EarningsModel()
+        with self.session_factory() as db:
+            rows = db.query(
+                self.model.employer, self.model.earnings, self.model.employment_months
+            ).yield_per(10000)
+            for employer, earnings, months in rows:
+                claim = {"employer": employer, "earnings": earnings, "employment_months": months}
+                value = self.earnings_per_month(claim)
+                if value is not None:
+                    self._state.add(self._employer_key(claim), value)
+                    self._seed_state.add(self._employer_key(claim), value)
+
+    def _add_locked(self, employer: str, value: float) -> None:
+        self._state.add(employer, value)
+        self._unsaved.add(employer, value)
+        self._unsaved_count += 1
+
+    def _reference(self, employer: str) -> Optional[EarningsProfile]:
+        profile = self._state.employers.get(employer)
+        if profile is not None and profile.stats.count >= self.min_samples:
+            return profile
+        if self._state.overall.stats.count >= self.min_samples:
+            return self._state.overall
+        return None
+
+    def check(self, claim: Dict) -> bool:
+        """True if the claim's earnings per month are an outlier"""
+        self.load()
+        value = self.earnings_per_month(claim)
+        if value is None:
+            return False
+        with self._lock:
+            profile = self._reference(self._employer_key(claim))
+            if profile is None:
+                return False
+            std = profile.stats.std
+            z = abs(value - profile.stats.mean) / std if std > 0 else 0.0
+            low = profile.sketch.quantile(self.lower_quantile)
+            high = profile.sketch.quantile(self.upper_quantile)
+        return z > self.z_threshold and not (low <= value <= high)
+
+    def update(self, claim: Dict) -> None:
+        """Add a claim to the running statistics"""
+        self.load()
+        value = self.earnings_per_month(claim)
+        if value is None:
+            return
+        with self._lock:
+            self._add_locked(self._employer_key(claim), value)
+            if self.path and self._unsaved_count >= self.save_every:
+                self.save()
+
+    def observe(self, claim: Dict) -> bool:
+        """Score a claim against what came before it, then learn from it"""
+        is_anomaly = self.check(claim)
+        self.update(claim)
+        return is_anomaly
+
+    def merge(self, other: "EarningsAnomalyDetector") -> None:
+        """Fold another detector's updates (e.g. another worker's) into this
+        one. Only its unsaved claims are taken: the snapshot or seed it
+        started from is the one this detector loaded too. Its seed is only
+        used if this detector has no base of its own."""
+        other.load()
+        self.load()
+        with self._lock, other._lock:
+            if other._seed_state is not None and not self._has_base:
+                self._seed_state = EarningsModel.from_dict(other._seed_state.to_dict())
+                self._state.merge(other._seed_state)
+                self._has_base = True
+            self._state.merge(other._unsaved)
+            self._unsaved.merge(other._unsaved)
+            self._unsaved_count += other._unsaved_count
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._state.to_dict()
+
+    def save(self) -> None:
+        """Merge unsaved updates into the snapshot on disk and reload it"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._loaded or not (self._unsaved_count or self._seed_state):
+                return
+            with open(f"{self.path}.lock", "w") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                if os.path.exists(self.path):
+                    state = self._read(self.path)
+                    state.merge(self._unsaved)
+                else:
+                    state = self._seed_state or EarningsModel()
+                    state.merge(self._unsaved)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(state.to_dict(), f)
+                os.replace(tmp_path, self.path)
+            self._state = EarningsModel.from_dict(state.to_dict())
+            self._unsaved = EarningsModel()
+            self._unsaved_count = 0
+            self._seed_state = None
+            self._has_base = True
@@ -1,21 +1,32 @@
-from database import SessionLocal
+from database import ReadSessionLocal
 from database.models import EligibilityRule
+from services.rule_engine import EligibilityRuleSet, RuleError
 from typing import List, Dict
 
+# Compiled once per process and refreshed when eligibility_rules changes
+rule_set = EligibilityRuleSet(ReadSessionLocal, EligibilityRule)
+
 class EligibilityChecker:
+    def __init__(self):
+        self.rule_set = rule_set
+
     def evaluate(self, applicant_data: Dict) -> List[Dict]:
         failed_rules = []
-        
-        with SessionLocal() as db:
-            rules = db.query(EligibilityRule).all()
-            for rule in rules:
-                try:
-                    if not eval(rule.condition, {}, applicant_data):
-                        failed_rules.append({
-                            "rule": rule.rule_name,
-                            "message": rule.message
-                        })
-                except:
-                    continue
-                    
-        return failed_rules 
\ No newline at end of file
+
+        for rule in self.rule_set.rules():
+            try:
+                if not rule.evaluate(applicant_data):
+                    failed_rules.append({
+                        "rule": rule.name,
+                        "message": rule.message
+                    })
+            except RuleError as e:
+                # A broken rule fails the claim rather than silently passing it
+                print(f"Eligibility rule '{rule.name}' error: {str(e)}")
+                failed_rules.append({
+                    "rule": rule.name,
+                    "message": rule.message,
+                    "error": str(e)
+                })
+
+        return failed_rules
@@ -0,0 +1,117 @@
+import re
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+
+from services.http_transport import ResilientTransport
+
+# EMBEDDING_MODEL values with this prefix select an in-process backend
+LOCAL_PREFIX = "local/"
+
+
+class EmbeddingBackend(ABC):
+    """Turns a batch of texts into vectors.
+
+    ``cacheable`` tells TogetherEmbedding whether results are worth caching
+    and micro-batching; cheap local backends opt out of both.
+    """
+    name: str = ""
+    cacheable: bool = True
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """One vector per text, in order"""
+
+
+class TogetherBackend(EmbeddingBackend):
+    """Remote embeddings from the Together /embeddings endpoint"""
+
+    def __init__(self, model: str, transport: ResilientTransport):
+        self.name = model
+        self.transport = transport
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        payload = self.transport.post_json("embeddings", {
+            "model": self.name,
+            "input": texts
+        })
+        data = sorted(payload["data"], key=lambda item: item.get("index", 0))
+        if len(data) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(data)}")
+        return [item["embedding"] for item in data]
+
+
+class HashingBackend(EmbeddingBackend):
+    """Deterministic local embeddings in pure NumPy.
+
+    Character n-grams are hashed (CRC32, with a hash-derived sign) into
+    ``n_features`` buckets, log-scaled, and mapped to ``dim`` dimensions by a
+    fixed Gaussian random projection generated from ``seed``. The same text
+    always gives the same vector, on any machine, with no network access.
+    """
+    cacheable = False
+
+    _projections = {}
+    _projection_lock = threading.Lock()
+
+    def __init__(
+        self,
+        name: str = "local/hashing-768",
+        dim: int = 768,
+        n_features: int = 4096,
+        ngram_range=(3, 5),
+        seed: int = 0
+    ):
+        self.name = name
+        self.dim = dim
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.seed = seed
+
+    @property
+    def projection(self) -> np.ndarray:
+        key = (self.n_features, self.dim, self.seed)
+        matrix = self._projections.get(key)
+        if matrix is None:
+            with self._projection_lock:
+                matrix = self._projections.get(key)
+                if matrix is None:
+                    rng = np.random.default_rng(self.seed)
+                    matrix = (rng.standard_normal((self.n_features, self.dim)) / np.sqrt(self.dim)).astype(np.float32)
+                    self._projections[key] = matrix
+        return matrix
+
+    def _ngrams(self, text: str) -> List[str]:
+        text = " " + re.sub(r"\s+", " ", text.lower()).strip() + " "
+        low, high = self.ngram_range
+        return [text[i:i + n] for n in range(low, high + 1) for i in range(len(text) - n + 1)]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        features = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(gram.encode("utf-8")) for gram in self._ngrams(text)),
+                dtype=np.uint32
+            )
+            if not hashes.size:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(features[row], hashes % self.n_features, signs)
+
+        features = np.sign(features) * np.log1p(np.abs(features))
+        vectors = features @ self.projection
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        return vectors.tolist()
+
+
+def create_backend(model: str, transport: Optional[ResilientTransport] = None) -> EmbeddingBackend:
+    """Pick a backend from an EMBEDDING_MODEL setting"""
+    if model.startswith(LOCAL_PREFIX):
+        return HashingBackend(name=model)
+    if transport is None:
+        raise ValueError(f"A transport is required for remote model {model}")
+    return TogetherBackend(model, transport)
@@ -0,0 +1,164 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from database.types import EMBEDDING_DTYPE
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache: an in-process LRU backed by a SQLite file.
+
+    Entries are keyed by a SHA-256 of the model name and input text, so a
+    changed model never serves stale vectors. The disk tier survives restarts
+    and is shared by every process pointing at the same file; pass
+    ``path=None`` for a memory-only cache. It keeps at most
+    ``max_disk_entries`` rows: every ``prune_every`` inserts the least
+    recently used ones (by the last time they were read from or written to
+    disk) are deleted. The memory LRU and the SQLite file have separate
+    locks, so disk I/O never holds up memory hits.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        max_entries: int = 10000,
+        max_disk_entries: int = 200000,
+        prune_every: int = 1000
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.prune_every = prune_every
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._conn = None
+        self._inserted = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed_at INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(embeddings)")]
+            if "accessed_at" not in columns:
+                # Files written before pruning existed
+                conn.execute("ALTER TABLE embeddings ADD COLUMN accessed_at INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_accessed_at ON embeddings (accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for texts, None where there is no entry"""
+        keys = [self.key(model, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(keys) - len(missing)
+
+        if missing and self.path is not None:
+            unique = list(set(missing))
+            placeholders = ",".join("?" * len(unique))
+            with self._disk_lock:
+                conn = self._connection()
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    unique
+                ).fetchall()
+                if rows:
+                    conn.executemany(
+                        "UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+                        [(int(time.time()), key) for key, _ in rows]
+                    )
+                    conn.commit()
+            with self._lock:
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+                    self._remember(key, vector)
+                    found[key] = vector
+
+        with self._lock:
+            self.disk_hits += sum(1 for key in missing if key in found)
+            self.misses += sum(1 for key in missing if key not in found)
+        return [found[key].tolist() if key in found else None for key in keys]
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        now = int(time.time())
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(model, text)
+                vector = np.asarray(vector, dtype=EMBEDDING_DTYPE)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes(), now))
+        if not rows or self.path is None:
+            return
+        with self._disk_lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)", rows
+            )
+            conn.commit()
+            self._inserted += len(rows)
+            if self._inserted >= self.prune_every:
+                self._inserted = 0
+                self._prune_locked(conn)
+
+    def _prune_locked(self, conn: sqlite3.Connection) -> None:
+        """Delete the least recently used rows beyond max_disk_entries"""
+        excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            )
+            conn.commit()
+
+    def put(self, model: str, text: str, vector: Sequence[float]) -> None:
+        self.put_many(model, [text], [vector])
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
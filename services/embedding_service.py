@@ -1,32 +1,127 @@
-import requests
 from config import settings
-from typing import List, Dict
+from database import DATA_DIR
+from services.embedding_cache import EmbeddingCache
+from services.embedding_batcher import EmbeddingBatcher
+from services.http_transport import CircuitBreaker, ResilientTransport
+from services.embedding_backends import EmbeddingBackend, create_backend
+from typing import List, Dict, Optional
+import asyncio
 import json
+import os
+import threading
+
+# Shared by every TogetherEmbedding in the process
+embedding_cache = EmbeddingCache(
+    os.path.join(DATA_DIR, "embedding_cache.db")
+    if settings.EMBEDDING_CACHE_PATH is None else (settings.EMBEDDING_CACHE_PATH or None),
+    max_entries=settings.EMBEDDING_CACHE_SIZE,
+    max_disk_entries=settings.EMBEDDING_CACHE_DISK_SIZE
+)
+
+# One keep-alive connection pool and circuit breaker for all embedding calls
+embedding_transport = ResilientTransport(
+    settings.TOGETHER_API_BASE,
+    headers={"Authorization": f"Bearer {settings.TOGETHER_API_KEY}"},
+    timeout=settings.EMBEDDING_TIMEOUT,
+    max_retries=settings.EMBEDDING_MAX_RETRIES,
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+)
+
+# Chosen by EMBEDDING_MODEL: a Together model name, or "local/..." for the
+# in-process hashing backend
+embedding_backend = create_backend(settings.EMBEDDING_MODEL, embedding_transport)
+
+class DegradedEmbedding(list):
+    """Empty embedding returned when the provider is unavailable.
+
+    FraudDetector checks for it with is_degraded() and skips the
+    similarity stages instead of scoring against a meaningless vector.
+    """
+    def __init__(self, reason: str):
+        super().__init__()
+        self.reason = reason
+
+def is_degraded(embedding) -> bool:
+    return isinstance(embedding, DegradedEmbedding)
+
+_batcher: Optional[EmbeddingBatcher] = None
+_batcher_lock = threading.Lock()
+
+def get_batcher() -> EmbeddingBatcher:
+    """Process-wide batcher so requests coalesce across TogetherEmbedding instances"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = EmbeddingBatcher(
+                TogetherEmbedding(micro_batch=False).get_embeddings,
+                max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_WINDOW_MS
+            )
+        return _batcher
 
 class TogetherEmbedding:
+    def __init__(
+        self,
+        cache: EmbeddingCache = embedding_cache,
+        micro_batch: Optional[bool] = None,
+        backend: EmbeddingBackend = embedding_backend
+    ):
+        self.backend = backend
+        # Local backends are cheaper to run than to cache or queue
+        self.cache = cache if backend.cacheable else None
+        if micro_batch is None:
+            micro_batch = settings.EMBEDDING_BATCH_WINDOW_MS > 0
+        self.micro_batch = micro_batch and backend.cacheable
+
     def get_embedding(self, text: str) -> List[float]:
+        if self.micro_batch:
+            # The batch flush probes the cache once for every text it holds
+            return get_batcher().embed(text)
+        return self.get_embeddings([text])[0]
+
+    async def aget_embedding(self, text: str) -> List[float]:
+        """asyncio variant of get_embedding"""
+        if self.micro_batch:
+            return await get_batcher().aembed(text)
+        return await asyncio.to_thread(self.get_embedding, text)
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts, requesting only cache misses in a single API call"""
+        if not texts:
+            return []
+        model = self.backend.name
+        results = self.cache.get_many(model, texts) if self.cache else [None] * len(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, results) if vector is None))
+        if not missing:
+            return results
+
         try:
-            response = requests.post(
-                "https://api.together.xyz/v1/embeddings",
-                headers={"Authorization": f"Bearer {settings.TOGETHER_API_KEY}"},
-                json={
-                    "model": settings.EMBEDDING_MODEL,
-                    "input": text
-                },
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()["data"][0]["embedding"]
+            fetched = dict(zip(missing, self.backend.embed(missing)))
         except Exception as e:
             print(f"Embedding error: {str(e)}")
-            return [0.0] * 384  # Return zero vector on failure
+            # Degraded results are never cached
+            degraded = DegradedEmbedding(str(e))
+            return [vector if vector is not None else degraded for vector in results]
 
-    def get_contextual_embedding(self, claim_data: Dict) -> List[float]:
-        """Generate embedding from MULTIPLE claim aspects"""
-        context = f"""
+        if self.cache:
+            self.cache.put_many(model, list(fetched), list(fetched.values()))
+        return [vector if vector is not None else fetched[text] for text, vector in zip(texts, results)]
+
+    def _context_text(self, claim_data: Dict) -> str:
+        return f"""
 Employer: {claim_data.get('employer', '')}
 Reason: {claim_data.get('separation_reason', '')}
 Earnings: {claim_data.get('earnings', '')}
 Employment Duration: {claim_data.get('employment_months', '')} months
 """
-        return self.get_embedding(context) 
\ No newline at end of file
+
+    def get_contextual_embedding(self, claim_data: Dict) -> List[float]:
+        """Generate embedding from MULTIPLE claim aspects"""
+        return self.get_embedding(self._context_text(claim_data))
+
+    async def aget_contextual_embedding(self, claim_data: Dict) -> List[float]:
+        return await self.aget_embedding(self._context_text(claim_data))
+
+    def get_contextual_embeddings(self, claims: List[Dict]) -> List[List[float]]:
+        """Contextual embeddings for many claims in one request"""
+        return self.get_embeddings([self._context_text(claim) for claim in claims]) 
\ No newline at end of file
@@ -0,0 +1,385 @@
+"""Append-only on-disk float32 matrix of ClaimHistory embeddings.
+
+Usage: python -m services.embedding_store compact [days]
+       python -m services.embedding_store rebuild
+("compact" drops rows older than HISTORY_RETENTION_DAYS, or ``days``;
+"rebuild" recreates the store from the claim_history table)
+"""
+import atexit
+import fcntl
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.pattern_index import as_vector
+
+VECTOR_DTYPE = np.dtype("<f4")
+# Row i of the vector file belongs to record i of the sidecar
+RECORD_DTYPE = np.dtype([("id", "<i8"), ("time", "<i8")])
+
+
+class EmbeddingStore:
+    """Embeddings kept as a raw float32 matrix file plus an (id, time) sidecar.
+
+    Rows are only ever appended, so NumPy can memory-map the files and scan
+    them chunk by chunk (iter_chunks, search) without reading the whole
+    matrix into RAM or going through SQLite. Appends from any number of
+    processes are serialized with a lock file; a row counts once both its
+    vector and its sidecar record are complete, and a torn tail left by a
+    crash is cut off before the next append. Files are fsynced every
+    ``sync_every`` rows or ``sync_interval`` seconds, whichever comes
+    first, rather than per row.
+
+    compact() and rebuild() write a new generation of both files and switch
+    to it by replacing meta.json, so the pair always changes together.
+    """
+
+    def __init__(self, path: str, sync_every: int = 256, sync_interval: float = 1.0):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+
+        self._lock = threading.Lock()
+        self._generation = None
+        self._vector_fd = None
+        self._record_fd = None
+        self._unsynced = 0
+        self._sync_timer: Optional[threading.Timer] = None
+
+        atexit.register(self.sync)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _files(self, generation: int) -> Tuple[str, str]:
+        return self._file(f"vectors.{generation}.f32"), self._file(f"ids.{generation}.bin")
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(self._file("meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._file("meta.json"))
+        _fsync_dir(self.path)
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the store's lock file (shared by every process)"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file("lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # Writing
+
+    def append(self, ids: Sequence[int], embeddings: Sequence[Any], when: datetime) -> int:
+        """Append embeddings for the given ClaimHistory ids; returns rows written"""
+        vectors, records = [], []
+        for item_id, embedding in zip(ids, embeddings):
+            vector = as_vector(embedding)
+            if vector is not None:
+                vectors.append(vector)
+                records.append((item_id, int(when.timestamp())))
+        if not vectors:
+            return 0
+
+        with self._lock, self._exclusive():
+            meta = self._read_meta()
+            if meta is None or not meta["dim"]:
+                meta = {"dim": int(vectors[0].size), "generation": meta["generation"] if meta else 1}
+                self._write_meta(meta)
+            dim = meta["dim"]
+            keep = [i for i, vector in enumerate(vectors) if vector.size == dim]
+            if not keep:
+                return 0
+            self._open_locked(meta["generation"])
+            self._truncate_torn_locked(dim)
+
+            # Vectors first: a record is what makes its row visible
+            _write_all(self._vector_fd, np.vstack([vectors[i] for i in keep]).astype(VECTOR_DTYPE).tobytes())
+            _write_all(self._record_fd, np.array([records[i] for i in keep], dtype=RECORD_DTYPE).tobytes())
+
+            self._unsynced += len(keep)
+            if self._unsynced >= self.sync_every:
+                self._sync_locked()
+            elif self._sync_timer is None:
+                self._sync_timer = threading.Timer(self.sync_interval, self.sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+            return len(keep)
+
+    def _open_locked(self, generation: int) -> None:
+        """(Re)open the append handles if compaction moved to a new generation"""
+        if generation == self._generation:
+            return
+        self._close_locked()
+        vector_path, record_path = self._files(generation)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+        self._vector_fd = os.open(vector_path, flags, 0o644)
+        self._record_fd = os.open(record_path, flags, 0o644)
+        self._generation = generation
+
+    def _truncate_torn_locked(self, dim: int) -> None:
+        """Cut both files back to the last complete row (after a crash mid-append)"""
+        row_bytes = dim * VECTOR_DTYPE.itemsize
+        vector_size = os.fstat(self._vector_fd).st_size
+        record_size = os.fstat(self._record_fd).st_size
+        rows = min(vector_size // row_bytes, record_size // RECORD_DTYPE.itemsize)
+        if vector_size != rows * row_bytes:
+            os.ftruncate(self._vector_fd, rows * row_bytes)
+        if record_size != rows * RECORD_DTYPE.itemsize:
+            os.ftruncate(self._record_fd, rows * RECORD_DTYPE.itemsize)
+
+    def _sync_locked(self) -> None:
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._unsynced and self._vector_fd is not None:
+            os.fsync(self._vector_fd)
+            os.fsync(self._record_fd)
+        self._unsynced = 0
+
+    def sync(self) -> None:
+        """Flush appended rows to disk now"""
+        with self._lock:
+            self._sync_locked()
+
+    def _close_locked(self) -> None:
+        self._sync_locked()
+        for fd in (self._vector_fd, self._record_fd):
+            if fd is not None:
+                os.close(fd)
+        self._vector_fd = self._record_fd = None
+        self._generation = None
+
+    def compact(self, cutoff: datetime) -> Tuple[int, int]:
+        """Drop rows appended before ``cutoff``; returns (kept, dropped)"""
+        cutoff_time = int(cutoff.timestamp())
+        counts = [0, 0]
+
+        def kept_rows(dim: List[int]):
+            for ids, times, vectors in self._chunks_locked():
+                keep = times >= cutoff_time
+                counts[0] += int(keep.sum())
+                counts[1] += int((~keep).sum())
+                yield ids[keep], times[keep], vectors[keep]
+
+        self._rewrite(kept_rows)
+        return counts[0], counts[1]
+
+    def rebuild(self, rows: Iterable[Tuple[int, Any, datetime]], chunk_rows: int = 4096) -> int:
+        """Replace the store with (id, embedding, time) rows; returns rows written"""
+        counts = [0]
+
+        def chunks(dim: List[int]):
+            batch = []
+            for item_id, embedding, when in rows:
+                vector = as_vector(embedding)
+                if vector is None:
+                    continue
+                if not dim:
+                    dim.append(vector.size)
+                if vector.size != dim[0]:
+                    continue
+                batch.append((item_id, int(when.timestamp()) if when else 0, vector))
+                if len(batch) == chunk_rows:
+                    yield _batch_arrays(batch)
+                    counts[0] += len(batch)
+                    batch = []
+            if batch:
+                yield _batch_arrays(batch)
+                counts[0] += len(batch)
+
+        self._rewrite(chunks)
+        return counts[0]
+
+    def _rewrite(self, make_chunks) -> None:
+        """Write a new generation from the (ids, times, vectors) chunks of
+        ``make_chunks(dim)`` and switch to it; ``dim`` is a one-item list
+        the generator fills in if the store has no dimension yet"""
+        with self._lock, self._exclusive():
+            meta = self._read_meta() or {"dim": 0, "generation": 0}
+            generation = meta["generation"] + 1
+            vector_path, record_path = self._files(generation)
+            dim = [meta["dim"]] if meta["dim"] else []
+            chunks = make_chunks(dim)
+            with open(vector_path, "wb") as vector_file, open(record_path, "wb") as record_file:
+                for ids, times, vectors in chunks:
+                    records = np.zeros(len(ids), dtype=RECORD_DTYPE)
+                    records["id"] = ids
+                    records["time"] = times
+                    vector_file.write(np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE).tobytes())
+                    record_file.write(records.tobytes())
+                for f in (vector_file, record_file):
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            old = meta["generation"]
+            self._close_locked()
+            self._write_meta({"dim": dim[0] if dim else meta["dim"], "generation": generation})
+            if old:
+                for old_path in self._files(old):
+                    if os.path.exists(old_path):
+                        os.remove(old_path)
+
+    # Reading
+
+    def _chunks_locked(self, chunk_rows: int = 65536):
+        attached = self._attach()
+        if attached is None:
+            return
+        records, vectors = attached
+        for start in range(0, len(records), chunk_rows):
+            chunk = records[start:start + chunk_rows]
+            yield np.array(chunk["id"]), np.array(chunk["time"]), vectors[start:start + chunk_rows]
+
+    def _attach(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Memory-map the complete rows of the current generation"""
+        for _ in range(3):
+            meta = self._read_meta()
+            if meta is None or not meta["dim"]:
+                return None
+            dim = meta["dim"]
+            vector_path, record_path = self._files(meta["generation"])
+            try:
+                rows = min(
+                    os.path.getsize(vector_path) // (dim * VECTOR_DTYPE.itemsize),
+                    os.path.getsize(record_path) // RECORD_DTYPE.itemsize
+                )
+                if rows == 0:
+                    return np.zeros(0, dtype=RECORD_DTYPE), np.zeros((0, dim), dtype=VECTOR_DTYPE)
+                return (
+                    np.memmap(record_path, dtype=RECORD_DTYPE, mode="r", shape=(rows,)),
+                    np.memmap(vector_path, dtype=VECTOR_DTYPE, mode="r", shape=(rows, dim))
+                )
+            except FileNotFoundError:
+                # Compacted while we were looking; read the new generation
+                continue
+        return None
+
+    def __len__(self) -> int:
+        attached = self._attach()
+        return len(attached[0]) if attached is not None else 0
+
+    def count_after(self, after_id: int) -> int:
+        """Rows with an id above ``after_id``"""
+        attached = self._attach()
+        if attached is None:
+            return 0
+        return int((attached[0]["id"] > after_id).sum())
+
+    def iter_chunks(self, after_id: int = 0, chunk_rows: int = 65536) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (ids, vectors) for rows with an id above ``after_id``, at most
+        ``chunk_rows`` at a time, straight from the mapped files"""
+        attached = self._attach()
+        if attached is None:
+            return
+        records, vectors = attached
+        for start in range(0, len(records), chunk_rows):
+            ids = np.array(records["id"][start:start + chunk_rows])
+            chunk = vectors[start:start + chunk_rows]
+            if after_id:
+                keep = ids > after_id
+                if not keep.all():
+                    ids, chunk = ids[keep], chunk[keep]
+            if len(ids):
+                yield ids, chunk
+
+    def search(
+        self,
+        embedding: Any,
+        top_k: int = 5,
+        threshold: float = 0.0,
+        chunk_rows: int = 65536
+    ) -> List[Tuple[int, float]]:
+        """Exact cosine search over every row: (id, similarity) pairs, best first"""
+        query = as_vector(embedding)
+        if query is None or not np.linalg.norm(query):
+            return []
+        query = query / np.linalg.norm(query)
+        best_ids = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for ids, vectors in self.iter_chunks(chunk_rows=chunk_rows):
+            if vectors.shape[1] != query.size:
+                return []
+            norms = np.linalg.norm(vectors, axis=1)
+            scores = (vectors @ query) / np.where(norms == 0, np.inf, norms)
+            keep = scores >= threshold
+            best_ids = np.concatenate([best_ids, ids[keep]])
+            best_scores = np.concatenate([best_scores, scores[keep]])
+            if len(best_ids) > top_k:
+                top = np.argpartition(best_scores, -top_k)[-top_k:]
+                best_ids, best_scores = best_ids[top], best_scores[top]
+        order = np.argsort(-best_scores)
+        return [(int(best_ids[i]), float(best_scores[i])) for i in order]
+
+
+def rebuild_from_table(store: EmbeddingStore, session_factory, model) -> int:
+    """Recreate ``store`` from the embeddings in ``model``'s table"""
+    with session_factory() as db:
+        rows = db.query(model.id, model.embedding, model.claim_date).filter(
+            model.embedding.isnot(None)
+        ).order_by(model.id).yield_per(1000)
+        return store.rebuild((row.id, row.embedding, row.claim_date) for row in rows)
+
+
+def _batch_arrays(batch):
+    return (
+        np.array([item_id for item_id, _, _ in batch], dtype=np.int64),
+        np.array([when for _, when, _ in batch], dtype=np.int64),
+        np.vstack([vector for _, _, vector in batch])
+    )
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """os.write may write less than asked (signals, nearly full disks)"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+if __name__ == "__main__":
+    from datetime import timedelta
+
+    from config import settings
+    from database import ReadSessionLocal
+    from database.models import ClaimHistory
+    from services.index_loader import HISTORY_VECTORS_PATH
+
+    store = EmbeddingStore(HISTORY_VECTORS_PATH)
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "compact" and len(sys.argv) <= 3:
+        days = int(sys.argv[2]) if len(sys.argv) == 3 else settings.HISTORY_RETENTION_DAYS
+        kept, dropped = store.compact(datetime.now() - timedelta(days=days))
+        print(f"Kept {kept} rows, dropped {dropped} older than {days} days")
+    elif command == "rebuild" and len(sys.argv) == 2:
+        written = rebuild_from_table(store, ReadSessionLocal, ClaimHistory)
+        print(f"Rebuilt store with {written} rows")
+    else:
+        print("Usage: python -m services.embedding_store compact [days] | rebuild")
+        sys.exit(1)
@@ -0,0 +1,174 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from string import Template
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Fraud scores are bucketed to tenths in decision signatures
+SCORE_BUCKETS = 10
+
+
+def decision_signature(
+    status: str,
+    failed_rules: Iterable[str],
+    fraud_score: Optional[float],
+    hard_rule_violations: Iterable[str]
+) -> str:
+    """Canonical key for the shape of a decision, independent of the claimant"""
+    bucket = int(round((fraud_score or 0.0) * 100)) * SCORE_BUCKETS // 100
+    return "|".join([
+        status,
+        "failed=" + ",".join(sorted(failed_rules)),
+        f"score={bucket}",
+        "hard=" + ",".join(sorted(hard_rule_violations)),
+    ])
+
+
+def _number_pattern(value: float) -> Optional[re.Pattern]:
+    renderings = {f"{value:,.2f}", f"{value:.2f}", f"{value:,.1f}", f"{value:.1f}"}
+    if float(value).is_integer():
+        renderings |= {f"{value:,.0f}", f"{value:.0f}"}
+    alternatives = "|".join(re.escape(r) for r in sorted(renderings, key=len, reverse=True))
+    return re.compile(rf"(?<![\d.,])(?:{alternatives})(?![\d]|[.,]\d)")
+
+
+def _placeholders(values: Dict[str, Any]) -> List[Tuple[str, re.Pattern]]:
+    patterns = []
+    if values.get("earnings") is not None:
+        patterns.append(("earnings", _number_pattern(float(values["earnings"]))))
+    if values.get("months") is not None:
+        patterns.append(("months", re.compile(rf"\b{int(values['months'])}\b(?=\s*months?\b)")))
+    if values.get("employer"):
+        patterns.append(("employer", re.compile(re.escape(str(values["employer"])), re.IGNORECASE)))
+    return patterns
+
+
+def make_template(text: str, values: Dict[str, Any]) -> Optional[str]:
+    """Turn an explanation into a string.Template with the claim's numbers
+    and employer as placeholders, or None if it says something else
+    claim-specific (the separation reason) that a template cannot carry"""
+    reason = str(values.get("reason") or "").strip()
+    if len(reason) >= 3 and reason.lower() in text.lower():
+        return None
+    template = text.replace("$", "$$")
+    for name, pattern in _placeholders(values):
+        template = pattern.sub("${%s}" % name, template)
+    return template
+
+
+def fill_template(template: str, values: Dict[str, Any]) -> str:
+    filled = {}
+    if values.get("earnings") is not None:
+        filled["earnings"] = f"{float(values['earnings']):,.2f}"
+    if values.get("months") is not None:
+        filled["months"] = str(int(values["months"]))
+    if values.get("employer"):
+        filled["employer"] = str(values["employer"])
+    return Template(template).safe_substitute(filled)
+
+
+class ExplanationCache:
+    """Explanation templates by decision signature: an in-process LRU backed
+    by a SQLite file.
+
+    The LLM is only asked once per decision shape (status, failed rules,
+    fraud score bucket, hard-rule violations) every ``ttl`` seconds; later
+    claims with the same shape get the stored template filled with their
+    own figures. ``ttl <= 0`` keeps entries forever; ``path=None`` keeps
+    them in memory only.
+    """
+
+    def __init__(self, path: Optional[str], max_entries: int = 1000, ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS explanations ("
+                "signature TEXT PRIMARY KEY, template TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _remember(self, signature: str, template: str, created_at: float) -> None:
+        self._memory[signature] = (template, created_at)
+        self._memory.move_to_end(signature)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, signature: str, values: Dict[str, Any]) -> Optional[str]:
+        """The cached explanation for this decision shape, filled with values"""
+        with self._lock:
+            entry = self._memory.get(signature)
+            if entry is not None and self._expired(entry[1]):
+                del self._memory[signature]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(signature)
+                self.memory_hits += 1
+            else:
+                conn = self._connection()
+                row = None
+                if conn is not None:
+                    row = conn.execute(
+                        "SELECT template, created_at FROM explanations WHERE signature = ?",
+                        (signature,)
+                    ).fetchone()
+                if row is None or self._expired(row[1]):
+                    self.misses += 1
+                    return None
+                entry = (row[0], row[1])
+                self._remember(signature, *entry)
+                self.disk_hits += 1
+        return fill_template(entry[0], values)
+
+    def put(self, signature: str, text: str, values: Dict[str, Any]) -> bool:
+        """Store an LLM explanation as this shape's template; False if it is
+        too claim-specific to reuse"""
+        template = make_template(text, values)
+        if template is None:
+            self.uncacheable += 1
+            return False
+        created_at = time.time()
+        with self._lock:
+            self._remember(signature, template, created_at)
+            conn = self._connection()
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO explanations (signature, template, created_at) VALUES (?, ?, ?)",
+                    (signature, template, created_at)
+                )
+                if self.ttl > 0:
+                    conn.execute("DELETE FROM explanations WHERE created_at < ?", (created_at - self.ttl,))
+                conn.commit()
+        return True
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.memory_hits + self.disk_hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "memory_entries": len(self._memory),
+        }
@@ -1,18 +1,63 @@
-from services.embedding_service import TogetherEmbedding
-from database import SessionLocal
-from database.models import FraudPattern, ClaimHistory
-from typing import Dict, Any, List
-import json
-from datetime import datetime, timedelta
+from services.embedding_service import TogetherEmbedding, is_degraded
+from services.pattern_index import FraudPatternIndex, SharedFraudPatternIndex, PatternMatch
+from services.history_index import ClaimHistoryIndex, SharedClaimHistoryIndex, HistoryMatch
+from services.shared_matrix import SharedArrayStore
+from services.embedding_store import EmbeddingStore
+from services.index_loader import SHARED_INDEX_DIR, HISTORY_INDEX_PATH, HISTORY_VECTORS_PATH
+from services.temporal_counter import TemporalClaimCounter
+from services.anomaly_detector import EarningsAnomalyDetector
+from config import settings
+from database import ReadSessionLocal, DATA_DIR, writer
+from database.models import Applicant, FraudPattern, ClaimHistory
+from typing import Dict, Any, List, Optional
+import os
+from datetime import datetime
 import numpy as np
-# Import for anomaly detector will be added once the file is created
-# from services.anomaly_detector import EarningsAnomalyDetector
+
+# Every ClaimHistory embedding is also appended here for scans outside SQLite
+history_store = EmbeddingStore(HISTORY_VECTORS_PATH)
+
+# Shared across FraudDetector instances so patterns are loaded once per process;
+# in multi-worker mode every process maps the loader's copy instead
+if settings.SHARED_INDEXES:
+    pattern_index = SharedFraudPatternIndex(SharedArrayStore(SHARED_INDEX_DIR, "patterns"))
+    history_index = SharedClaimHistoryIndex(
+        ReadSessionLocal,
+        ClaimHistory,
+        SharedArrayStore(SHARED_INDEX_DIR, "history"),
+        store=history_store,
+        refresh_interval=settings.INDEX_PUBLISH_INTERVAL
+    )
+else:
+    pattern_index = FraudPatternIndex(ReadSessionLocal, FraudPattern)
+    history_index = ClaimHistoryIndex(ReadSessionLocal, ClaimHistory, HISTORY_INDEX_PATH, store=history_store)
+# Other workers insert claims too in multi-worker mode, so the counter
+# catches up with the table instead of trusting its own record() calls
+temporal_counter = TemporalClaimCounter(
+    ReadSessionLocal,
+    ClaimHistory,
+    window_days=settings.TEMPORAL_WINDOW_DAYS,
+    refresh_interval=settings.INDEX_PUBLISH_INTERVAL if settings.SHARED_INDEXES else None
+)
+anomaly_detector = EarningsAnomalyDetector(
+    os.path.join(DATA_DIR, "unemployment.earnings_sketch.json"),
+    ReadSessionLocal,
+    Applicant
+)
 
 class FraudDetector:
+    SIMILARITY_THRESHOLD = 0.8
+    PATTERN_TOP_K = None  # None keeps every pattern above the threshold
+    DUPLICATE_THRESHOLD = 0.97
+    DUPLICATE_TOP_K = 5
+
     def __init__(self):
         self.embedding_model = TogetherEmbedding()
-        # Initialize anomaly detector here once implemented
-        # self.anomaly_detector = EarningsAnomalyDetector()
+        self.pattern_index = pattern_index
+        self.history_index = history_index
+        self.history_store = history_store
+        self.temporal_counter = temporal_counter
+        self.anomaly_detector = anomaly_detector
 
     HARD_RULES = {
         "earnings_too_high": lambda x: x['earnings'] > 20000,
@@ -26,13 +71,8 @@ class FraudDetector:
 
     def check_temporal_patterns(self, ssn_last4: str) -> bool:
         """Check for temporal patterns like frequent filing"""
-        # Note: This checks for more than 3 claims in the last year for the same SSN
-        with SessionLocal() as db:
-            past_claims_count = db.query(ClaimHistory).filter(
-                ClaimHistory.ssn_last4 == ssn_last4,
-                ClaimHistory.claim_date > datetime.now() - timedelta(days=365)
-            ).count()
-        return past_claims_count > 3
+        # Note: more than TEMPORAL_MAX_CLAIMS claims within the window for the same SSN
+        return self.temporal_counter.count(ssn_last4) > settings.TEMPORAL_MAX_CLAIMS
 
     def _get_risk_factor(self, region: str) -> float:
         """Placeholder for regional risk factor - currently returns 1.0"""
@@ -41,15 +81,17 @@ class FraudDetector:
 
     def calculate_score(
         self,
-        similar_patterns: List[FraudPattern],
+        similar_patterns: List[PatternMatch],
         hard_rules: List[str],
         temporal_redflags: bool,
-        is_anomaly: bool
+        is_anomaly: bool,
+        duplicate_claims: Optional[List[HistoryMatch]] = None
     ) -> float:
         """Calculate the final fraud score based on various factors"""
         base_score = sum(p.severity * 0.1 for p in similar_patterns)
         if hard_rules: base_score += 0.5
         if temporal_redflags: base_score += 0.3
+        if duplicate_claims: base_score += 0.3
         
         # Placeholder for regional risk factor - assuming a default region or applicant data includes it
         # For now, we'll just use a dummy region or omit regional factor
@@ -70,46 +112,97 @@ class FraudDetector:
 
     def analyze_claim(self, claim_data: Dict) -> Dict[str, Any]:
         """Analyze claim data using a hybrid detection approach"""
-        # 1. Get embedding
-        embedding = self.embedding_model.get_contextual_embedding(claim_data)
-        
-        with SessionLocal() as db:
-            # Store claim history
-            db.add(ClaimHistory(
-                ssn_last4=claim_data['ssn_last4'],
-                claim_date=datetime.now(),
-                employer=claim_data['employer'],
-                embedding=json.dumps(embedding)  # Properly serialize embedding
-            ))
-            db.commit()
-
-            # 2. Find similar patterns using cosine similarity
-            patterns = db.query(FraudPattern).all()
-            similar_patterns = []
-            for pattern in patterns:
-                if isinstance(pattern.embedding, str):
-                    pattern_embedding = json.loads(pattern.embedding)
-                else:
-                    pattern_embedding = pattern.embedding
-                similarity = self.cosine_similarity(embedding, pattern_embedding)
-                if similarity > 0.8:  # Threshold for similarity
-                    similar_patterns.append(pattern)
+        return self.analyze_claims([claim_data])[0]
+
+    def analyze_claims(self, claims: List[Dict]) -> List[Dict[str, Any]]:
+        """Analyze a batch of claims with one embedding request, one transaction
+        and one pattern matrix multiply.
+
+        Claims are treated as if submitted one after another in list order, so
+        each result matches what analyze_claim would have returned.
+        """
+        if not claims:
+            return []
+
+        # 1. Get embeddings
+        embeddings = self.embedding_model.get_contextual_embeddings(claims)
+        # Load before inserting so this batch is only indexed below, in order
+        self.history_index.load()
+
+        with ReadSessionLocal() as db:
+            now = datetime.now()
+            # Bring cold SSNs into the counter before this batch is written
+            self.temporal_counter.preload([claim['ssn_last4'] for claim in claims], db)
+
+            # Store claim history; the writer thread commits it together
+            # with whatever other sessions are writing
+            def store_history(session) -> List[int]:
+                history = [
+                    ClaimHistory(
+                        ssn_last4=claim['ssn_last4'],
+                        claim_date=now,
+                        employer=claim['employer'],
+                        embedding=embedding  # Stored as a float32 BLOB
+                    )
+                    for claim, embedding in zip(claims, embeddings)
+                ]
+                session.add_all(history)
+                session.flush()
+                return [row.id for row in history]
+
+            history_ids = writer.run(store_history)
+            self.history_store.append(history_ids, embeddings, now)
+
+            # 2. Find similar patterns with one matrix multiply, skipping
+            # claims whose embedding could not be computed
+            usable = [i for i, embedding in enumerate(embeddings) if not is_degraded(embedding)]
+            similar_patterns = [[] for _ in claims]
+            if usable:
+                matches = self.pattern_index.search_batch(
+                    [embeddings[i] for i in usable],
+                    threshold=self.SIMILARITY_THRESHOLD,
+                    top_k=self.PATTERN_TOP_K,
+                    db=db
+                )
+                for i, found in zip(usable, matches):
+                    similar_patterns[i] = found
+
+        results = []
+        for claim, embedding, history_id, patterns in zip(
+            claims, embeddings, history_ids, similar_patterns
+        ):
+            degraded = is_degraded(embedding)
+            duplicate_claims = []
+            if not degraded:
+                # Near-duplicates of earlier claims only
+                duplicate_claims = self.history_index.search(
+                    embedding,
+                    top_k=self.DUPLICATE_TOP_K,
+                    threshold=self.DUPLICATE_THRESHOLD,
+                    before_id=history_id
+                )
+                self.history_index.add(history_id, embedding)
 
             # 3. Other checks
-            hard_rules = self.apply_hard_rules(claim_data)
-            temporal_redflags = self.check_temporal_patterns(claim_data['ssn_last4'])
-            # Anomaly detection will be called here once implemented
-            # is_anomaly = self.anomaly_detector.check(claim_data)
-            is_anomaly = False # Placeholder until anomaly detector is added
-        
-        # 4. Calculate final score
-        score = self.calculate_score(similar_patterns, hard_rules, temporal_redflags, is_anomaly)
-
-        return {
-            "score": score,
-            "patterns": [p.description for p in similar_patterns],
-            "hard_rule_violations": hard_rules,
-            "temporal_redflags": temporal_redflags,
-            "is_anomaly": is_anomaly,
-            "embedding": embedding # Include embedding for potential future use (e.g., feedback loop)
-        } 
\ No newline at end of file
+            hard_rules = self.apply_hard_rules(claim)
+            self.temporal_counter.record(claim['ssn_last4'], now)
+            temporal_redflags = self.check_temporal_patterns(claim['ssn_last4'])
+            is_anomaly = self.anomaly_detector.observe(claim)
+
+            # 4. Calculate final score
+            score = self.calculate_score(
+                patterns, hard_rules, temporal_redflags, is_anomaly, duplicate_claims
+            )
+
+            results.append({
+                "score": score,
+                "patterns": [p.description for p in patterns],
+                "hard_rule_violations": hard_rules,
+                "temporal_redflags": temporal_redflags,
+                "is_anomaly": is_anomaly,
+                "duplicate_claims": [m.id for m in duplicate_claims],
+                "embedding_degraded": degraded,
+                "embedding": embedding # Include embedding for potential future use (e.g., feedback loop)
+            })
+
+        return results
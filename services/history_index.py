@@ -0,0 +1,542 @@
+import atexit
+import os
+import threading
+import time
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from services.embedding_store import EmbeddingStore
+from services.pattern_index import as_vector
+from services.shared_matrix import SharedArrayStore
+
+
+class HistoryMatch(NamedTuple):
+    id: int
+    similarity: float
+
+
+class _InvertedList:
+    """Growable (ids, vectors) buffer for one IVF cell"""
+
+    def __init__(self, dim: int, ids=None, vectors=None):
+        if ids is None:
+            ids = np.zeros(0, dtype=np.int64)
+            vectors = np.zeros((0, dim), dtype=np.float32)
+        self.size = len(ids)
+        capacity = max(16, self.size)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.ids[:self.size] = ids
+        self.vectors[:self.size] = vectors
+
+    def append(self, item_id: int, vector: np.ndarray) -> None:
+        if self.size == len(self.ids):
+            capacity = len(self.ids) * 2
+            self.ids = np.resize(self.ids, capacity)
+            vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=np.float32)
+            vectors[:self.size] = self.vectors
+            self.vectors = vectors
+        self.ids[self.size] = item_id
+        self.vectors[self.size] = vector
+        self.size += 1
+
+    def view(self):
+        return self.ids[:self.size], self.vectors[:self.size]
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """Nearest centroid per vector, chunked to bound the similarity matrix size"""
+    return np.concatenate([
+        np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), chunk)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors, returns normalized centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(vectors, centroids)
+        for c in range(k):
+            members = vectors[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:
+                # Re-seed empty cells so every centroid stays useful
+                centroids[c] = vectors[rng.integers(len(vectors))]
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+    return centroids.astype(np.float32)
+
+
+class ClaimHistoryIndex:
+    """Persistent IVF (inverted file) nearest-neighbour index over ClaimHistory embeddings.
+
+    Vectors are L2-normalized and bucketed under their closest k-means
+    centroid; a query only scans the ``nprobe`` closest buckets, so cost grows
+    with roughly sqrt(N) rather than N. Until ``min_train_size`` vectors have
+    been seen everything lives in a single bucket (exact search).
+
+    ``path`` holds a checkpoint of the index. Rows added after it are not
+    lost: on load they are replayed, read from the append-only ``store``
+    when it holds all of them and from the database otherwise. Retraining
+    and checkpointing run on a background thread, never in add(): a new
+    checkpoint is written once the rows since the last one reach
+    ``save_every`` or a quarter of the index, and at exit. The checkpoint
+    records the table's row count and highest id up to its ``last_id``;
+    if the table no longer matches (e.g. after a reseed) it is discarded
+    and the index rebuilt.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        model,
+        path: str,
+        nprobe: int = 8,
+        min_train_size: int = 1024,
+        save_every: int = 256,
+        store: Optional[EmbeddingStore] = None
+    ):
+        self.session_factory = session_factory
+        self.model = model
+        self.path = path
+        self.store = store
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.save_every = save_every
+
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._loaded = False
+        self._dim = None
+        self._centroids = None
+        self._lists: List[_InvertedList] = []
+        self._size = 0
+        self._trained_size = 0
+        self._last_id = 0
+        self._unsaved = 0
+        # Vectors added while a retrain runs, placed once it finishes
+        self._pending: Optional[List] = None
+        self._maintenance: Optional[threading.Thread] = None
+
+        atexit.register(self.save)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_id(self) -> int:
+        """Highest ClaimHistory id the index has seen"""
+        return self._last_id
+
+    @property
+    def trained_size(self) -> int:
+        """Number of vectors the current centroids were trained on"""
+        return self._trained_size
+
+    def _normalize(self, embedding: Any) -> Optional[np.ndarray]:
+        vector = as_vector(embedding)
+        if vector is None:
+            return None
+        if self._dim is not None and vector.size != self._dim:
+            return None
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def load(self) -> None:
+        """Load the index from disk (once) and catch up with the table"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.path):
+                signature = self._read(self.path)
+                if signature != self._table_signature(self._last_id):
+                    print(f"History index {self.path} does not match the claim history; rebuilding")
+                    self._clear()
+            self._catch_up()
+            self._loaded = True
+            self._maintain_if_due()
+
+    def refresh(self) -> None:
+        """Index rows other processes added to the table since the last look"""
+        self.load()
+        with self._lock:
+            self._catch_up()
+            self._maintain_if_due()
+
+    def _read(self, path: str) -> Tuple[int, int]:
+        """Load a checkpoint; returns the table signature saved with it"""
+        with np.load(path) as data:
+            ids, vectors, offsets = data["ids"], data["vectors"], data["offsets"]
+            centroids = data["centroids"]
+            self._dim = int(data["dim"]) or None
+            self._last_id = int(data["last_id"])
+            self._trained_size = int(data["trained_size"])
+            # Checkpoints written before the signature existed never match
+            signature = tuple(int(v) for v in data["signature"]) if "signature" in data else None
+
+        self._centroids = centroids if len(centroids) else None
+        self._lists = [
+            _InvertedList(vectors.shape[1], ids[start:end], vectors[start:end])
+            for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+        self._size = len(ids)
+        return signature
+
+    def _table_signature(self, last_id: int) -> Tuple[int, int]:
+        """Row count and highest id of the table up to ``last_id``; rows at
+        or below an id never change once committed, short of a reseed"""
+        with self.session_factory() as db:
+            rows, max_id = db.query(func.count(self.model.id), func.max(self.model.id)).filter(
+                self.model.id <= last_id
+            ).one()
+        return rows, max_id or 0
+
+    def _clear(self) -> None:
+        self._dim = None
+        self._centroids = None
+        self._lists = []
+        self._size = 0
+        self._trained_size = 0
+        self._last_id = 0
+
+    def _catch_up(self, after_id: Optional[int] = None) -> int:
+        """Index history rows with ids above ``after_id`` (by default, those
+        written since the index file was last saved); returns the highest
+        id read"""
+        if after_id is None:
+            after_id = self._last_id
+        with self.session_factory() as db:
+            if self.store is not None:
+                missing = db.query(func.count(self.model.id)).filter(
+                    self.model.id > after_id,
+                    self.model.embedding.isnot(None)
+                ).scalar()
+                if missing and self.store.count_after(after_id) == missing:
+                    return self._catch_up_from_store(after_id)
+            rows = db.query(self.model.id, self.model.embedding).filter(
+                self.model.id > after_id,
+                self.model.embedding.isnot(None)
+            ).order_by(self.model.id).yield_per(1000)
+            for row in rows:
+                self._add_locked(row.id, row.embedding)
+                self._unsaved += 1
+                after_id = row.id
+        return after_id
+
+    def _catch_up_from_store(self, after_id: int) -> int:
+        rows = []
+        for ids, vectors in self.store.iter_chunks(after_id=after_id):
+            rows.extend(zip(ids.tolist(), vectors))
+        # Appends from several processes may interleave out of id order
+        rows.sort(key=lambda row: row[0])
+        for item_id, vector in rows:
+            self._add_locked(item_id, vector)
+        self._unsaved += len(rows)
+        return rows[-1][0] if rows else after_id
+
+    def _add_locked(self, item_id: int, embedding: Any) -> None:
+        self._last_id = max(self._last_id, item_id)
+        vector = as_vector(embedding)
+        if vector is None:
+            return
+        if self._dim is None:
+            self._dim = vector.size
+        vector = self._normalize(vector)
+        if vector is None:
+            return
+
+        if not self._lists:
+            self._lists = [_InvertedList(self._dim)]
+        cell = 0
+        if self._centroids is not None:
+            cell = int(np.argmax(self._centroids @ vector))
+        self._lists[cell].append(item_id, vector)
+        self._size += 1
+        if self._pending is not None:
+            self._pending.append((item_id, vector))
+
+    def _needs_training(self) -> bool:
+        # Train once there is enough data, then retrain as the corpus grows
+        return (
+            self._pending is None
+            and self._size >= self.min_train_size
+            and self._size >= 4 * self._trained_size
+        )
+
+    def _needs_saving(self) -> bool:
+        return self.path is not None and self._unsaved >= max(self.save_every, self._size // 4)
+
+    def _maintain_if_due(self) -> None:
+        """Start the maintenance thread if a retrain or checkpoint is due"""
+        if self._maintenance is not None or not (self._needs_training() or self._needs_saving()):
+            return
+        self._maintenance = threading.Thread(target=self._maintain, name="history-index", daemon=True)
+        self._maintenance.start()
+
+    def _maintain(self) -> None:
+        while True:
+            with self._lock:
+                train = self._needs_training()
+                if not train and not self._needs_saving():
+                    self._maintenance = None
+                    return
+            try:
+                if train:
+                    self._train()
+                self.save()
+            except Exception as e:
+                # Searches keep using the current layout; the next add retries
+                print(f"History index maintenance failed: {str(e)}")
+                with self._lock:
+                    self._pending = None
+                    self._maintenance = None
+                return
+
+    def _train(self) -> None:
+        """Re-cluster the index. k-means runs on a snapshot without the
+        lock; rows added meanwhile are placed when the new cells go in."""
+        with self._lock:
+            ids = np.concatenate([lst.view()[0] for lst in self._lists])
+            vectors = np.concatenate([lst.view()[1] for lst in self._lists])
+            self._pending = []
+
+        k = int(min(4096, max(1, np.sqrt(len(vectors)))))
+        sample = vectors
+        if len(vectors) > 256 * k:
+            sample = vectors[np.random.default_rng(0).choice(len(vectors), 256 * k, replace=False)]
+        centroids = _kmeans(sample, k)
+        assignment = _assign(vectors, centroids)
+        lists = [
+            _InvertedList(self._dim, ids[assignment == c], vectors[assignment == c])
+            for c in range(k)
+        ]
+
+        with self._lock:
+            for item_id, vector in self._pending:
+                lists[int(np.argmax(centroids @ vector))].append(item_id, vector)
+            self._pending = None
+            self._centroids = centroids
+            self._lists = lists
+            self._trained_size = len(vectors)
+            # The checkpoint must reflect the new layout
+            self._unsaved = max(self._unsaved, self.save_every)
+
+    def add(self, item_id: int, embedding: Any) -> None:
+        """Add one ClaimHistory embedding to the index"""
+        self.load()
+        with self._lock:
+            self._add_locked(item_id, embedding)
+            self._unsaved += 1
+            self._maintain_if_due()
+
+    def search(
+        self,
+        embedding: Any,
+        top_k: int = 5,
+        threshold: float = 0.0,
+        before_id: Optional[int] = None
+    ) -> List[HistoryMatch]:
+        """Return up to top_k approximate nearest history rows above threshold,
+        only considering ids below ``before_id`` if given"""
+        self.load()
+        query = self._normalize(embedding)
+        if query is None or not self._size:
+            return []
+
+        with self._lock:
+            found_ids, found_scores = self._scan(query)
+
+        if not found_ids:
+            return []
+        ids = np.concatenate(found_ids)
+        scores = np.concatenate(found_scores)
+        keep = scores >= threshold
+        if before_id is not None:
+            keep &= ids < before_id
+        keep = np.flatnonzero(keep)
+        if keep.size > top_k:
+            keep = keep[np.argpartition(scores[keep], -top_k)[-top_k:]]
+        keep = keep[np.argsort(-scores[keep])]
+        return [HistoryMatch(id=int(ids[i]), similarity=float(scores[i])) for i in keep]
+
+    def _scan(self, query: np.ndarray):
+        """(ids, scores) arrays for the cells closest to the query"""
+        if self._centroids is not None:
+            cells = np.argsort(-(self._centroids @ query))[:self.nprobe]
+        else:
+            cells = range(len(self._lists))
+        found_ids, found_scores = [], []
+        for cell in cells:
+            ids, vectors = self._lists[cell].view()
+            if len(ids):
+                found_ids.append(ids)
+                found_scores.append(vectors @ query)
+        return found_ids, found_scores
+
+    def _arrays(self):
+        """The index as flat arrays: ids and vectors grouped by cell, with
+        cell boundaries in ``offsets``"""
+        views = [lst.view() for lst in self._lists]
+        dim = self._dim or 0
+        sizes = [len(ids) for ids, _ in views]
+        return {
+            "ids": np.concatenate([ids for ids, _ in views]) if views else np.zeros(0, dtype=np.int64),
+            "vectors": np.concatenate([v for _, v in views]) if views else np.zeros((0, dim), dtype=np.float32),
+            "offsets": np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+            "centroids": self._centroids if self._centroids is not None else np.zeros((0, dim), dtype=np.float32)
+        }
+
+    def publish(self, store: SharedArrayStore) -> int:
+        """Publish the index for SharedClaimHistoryIndex readers"""
+        self.load()
+        with self._lock:
+            return store.publish(self._arrays(), {
+                "dim": self._dim or 0,
+                "last_id": self._last_id,
+                "trained_size": self._trained_size
+            })
+
+    def save(self) -> None:
+        """Atomically write a checkpoint of the index next to the database.
+        The arrays are copied under the lock and written without it."""
+        with self._save_lock:
+            with self._lock:
+                if not self._loaded or not self._unsaved:
+                    return
+                arrays = self._arrays()
+                saved = self._unsaved
+                meta = {
+                    "dim": self._dim or 0,
+                    "last_id": self._last_id,
+                    "trained_size": self._trained_size
+                }
+            signature = self._table_signature(meta["last_id"])
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays, **meta, signature=np.array(signature, dtype=np.int64))
+            os.replace(tmp_path, self.path)
+            with self._lock:
+                self._unsaved -= saved
+
+
+class SharedClaimHistoryIndex(ClaimHistoryIndex):
+    """ClaimHistoryIndex attached to an index published by another process.
+
+    The cells published by the loader (services/index_loader.py) are mapped
+    read-only and shared by every worker. Rows added after that generation,
+    by this worker or any other, go to a small local delta that is scanned
+    exactly; when a new generation appears it is swapped in and the delta
+    is rebuilt from the rows it does not cover yet. Between generations
+    the delta picks up other processes' rows from the table at most every
+    ``refresh_interval`` seconds. Nothing is saved from here: the loader
+    owns the index file.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        model,
+        shared: SharedArrayStore,
+        nprobe: int = 8,
+        store: Optional[EmbeddingStore] = None,
+        refresh_interval: float = 2.0
+    ):
+        super().__init__(session_factory, model, path=None, nprobe=nprobe, store=store)
+        atexit.unregister(self.save)
+        self.shared = shared
+        self.refresh_interval = refresh_interval
+        self._generation = 0
+        # Highest table id the delta has read, and when it last looked
+        self._seen_id = 0
+        self._checked_at = 0.0
+        self._cells = []
+        self._delta: Optional[_InvertedList] = None
+        self._delta_ids = set()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def load(self) -> None:
+        """Attach the latest published generation if there is a newer one,
+        otherwise catch up with the table if it is time to"""
+        generation = self.shared.generation()
+        if self._loaded and generation == self._generation:
+            if time.monotonic() - self._checked_at >= self.refresh_interval:
+                with self._lock:
+                    self._catch_up()
+            return
+        with self._lock:
+            if self._loaded and self.shared.generation() == self._generation:
+                return
+            attached = self.shared.attach()
+            if attached is not None:
+                self._generation, arrays, meta = attached
+                ids, vectors, offsets = arrays["ids"], arrays["vectors"], arrays["offsets"]
+                self._cells = [
+                    (ids[start:end], vectors[start:end])
+                    for start, end in zip(offsets[:-1], offsets[1:])
+                ]
+                self._centroids = arrays["centroids"] if len(arrays["centroids"]) else None
+                self._dim = meta["dim"] or self._dim
+                self._last_id = meta["last_id"]
+                self._trained_size = meta["trained_size"]
+                self._size = len(ids)
+            # Everything past the generation comes from the table
+            self._delta = None
+            self._delta_ids = set()
+            self._seen_id = 0
+            self._catch_up()
+            self._loaded = True
+
+    def refresh(self) -> None:
+        self.load()
+        with self._lock:
+            self._catch_up()
+
+    def _catch_up(self, after_id: Optional[int] = None) -> int:
+        self._seen_id = super()._catch_up(max(self._last_id, self._seen_id))
+        self._checked_at = time.monotonic()
+        return self._seen_id
+
+    def _add_locked(self, item_id: int, embedding: Any) -> None:
+        if item_id <= self._last_id or item_id in self._delta_ids:
+            return
+        vector = as_vector(embedding)
+        if vector is None:
+            return
+        if self._dim is None:
+            self._dim = vector.size
+        vector = self._normalize(vector)
+        if vector is None:
+            return
+        if self._delta is None:
+            self._delta = _InvertedList(self._dim)
+        self._delta.append(item_id, vector)
+        self._delta_ids.add(item_id)
+        self._size += 1
+
+    def _scan(self, query: np.ndarray):
+        if self._centroids is not None:
+            cells = [self._cells[c] for c in np.argsort(-(self._centroids @ query))[:self.nprobe]]
+        else:
+            cells = self._cells
+        if self._delta is not None:
+            cells = cells + [self._delta.view()]
+        found_ids, found_scores = [], []
+        for ids, vectors in cells:
+            if len(ids):
+                found_ids.append(ids)
+                found_scores.append(vectors @ query)
+        return found_ids, found_scores
+
+    def save(self) -> None:
+        pass
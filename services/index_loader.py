@@ -0,0 +1,91 @@
+"""Loader process for multi-worker mode.
+
+Keeps the fraud pattern matrix and the claim history index up to date with
+the database and publishes new versions to SHARED_INDEX_DIR, where the
+worker processes map them read-only (see services/shared_matrix.py).
+Patterns are republished whenever they change. The history is republished
+after a retrain or once enough rows or time have accumulated (see
+HISTORY_REPUBLISH_ROWS); workers index newer rows themselves meanwhile.
+main.py runs it under a supervisor when STREAMLIT_WORKERS > 1.
+
+Usage: python -m services.index_loader [--once]
+"""
+import os
+import signal
+import sys
+import time
+
+from config import settings
+from database import ReadSessionLocal, DATA_DIR
+from database.models import FraudPattern, ClaimHistory
+from services.embedding_store import EmbeddingStore
+from services.history_index import ClaimHistoryIndex
+from services.pattern_index import FraudPatternIndex
+from services.shared_matrix import SharedArrayStore
+
+SHARED_INDEX_DIR = settings.SHARED_INDEX_DIR or os.path.join(DATA_DIR, "shared_index")
+HISTORY_INDEX_PATH = os.path.join(DATA_DIR, "unemployment.history_index.npz")
+HISTORY_VECTORS_PATH = os.path.join(DATA_DIR, "unemployment.history_vectors")
+
+
+class IndexLoader:
+    """Publishes the pattern and history indexes to the worker processes"""
+
+    def __init__(self, root: str = SHARED_INDEX_DIR):
+        self.pattern_index = FraudPatternIndex(ReadSessionLocal, FraudPattern, refresh_interval=0)
+        self.history_index = ClaimHistoryIndex(
+            ReadSessionLocal,
+            ClaimHistory,
+            HISTORY_INDEX_PATH,
+            store=EmbeddingStore(HISTORY_VECTORS_PATH)
+        )
+        self.pattern_store = SharedArrayStore(root, "patterns")
+        self.history_store = SharedArrayStore(root, "history")
+        self._published_signature = None
+        self._published_size = 0
+        self._published_trained_size = 0
+        self._published_at = 0.0
+
+    def _history_due(self) -> bool:
+        added = len(self.history_index) - self._published_size
+        return (
+            not self.history_store.generation()
+            or self.history_index.trained_size != self._published_trained_size
+            or added >= max(settings.HISTORY_REPUBLISH_ROWS, self._published_size // 4)
+            or (added > 0 and time.monotonic() - self._published_at >= settings.HISTORY_REPUBLISH_INTERVAL)
+        )
+
+    def publish(self) -> None:
+        """Publish the patterns if they changed and the history if it is due"""
+        self.pattern_index.refresh()
+        if self.pattern_index.signature != self._published_signature or not self.pattern_store.generation():
+            generation = self.pattern_index.publish(self.pattern_store)
+            self._published_signature = self.pattern_index.signature
+            print(f"Published {len(self.pattern_index)} fraud patterns (generation {generation})")
+
+        self.history_index.refresh()
+        if self._history_due():
+            generation = self.history_index.publish(self.history_store)
+            self._published_size = len(self.history_index)
+            self._published_trained_size = self.history_index.trained_size
+            self._published_at = time.monotonic()
+            print(f"Published {len(self.history_index)} history embeddings (generation {generation})")
+
+    def run(self, interval: float) -> None:
+        while True:
+            try:
+                self.publish()
+            except Exception as e:
+                # Workers keep serving the last generation meanwhile
+                print(f"Index publish failed: {str(e)}")
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    loader = IndexLoader()
+    if sys.argv[1:] == ["--once"]:
+        loader.publish()
+        sys.exit(0)
+    # Exit through atexit so the history index file is saved
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    loader.run(settings.INDEX_PUBLISH_INTERVAL)
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+
+from services.http_transport import ResilientTransport, RetryableStatusError
+
+
+class LLMUnavailable(Exception):
+    """The LLM call was shed: the queue was full or its deadline passed"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    ``reserve`` always takes a token and returns how long to wait before
+    using it, so waiters are served in arrival order; ``refund`` gives it
+    back when a waiter gives up.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back new calls for ``seconds`` (e.g. after a 429)"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class RateLimitedLLMClient:
+    """Shared completion client that stays inside the provider quota.
+
+    Calls take a token from a bucket refilled at ``rate_per_minute`` (with
+    ``burst`` headroom) and one of ``max_concurrency`` slots. At most
+    ``max_queue`` calls may wait; beyond that, or once a call's
+    ``deadline`` (seconds, covering queueing and the request) passes, it
+    fails fast with LLMUnavailable so the caller can fall back instead of
+    sleeping and retrying.
+    """
+
+    def __init__(
+        self,
+        transport: ResilientTransport,  # built with max_retries=0; the bucket paces calls
+        rate_per_minute: float = 60,
+        burst: int = 10,
+        max_concurrency: int = 4,
+        max_queue: int = 50,
+        deadline: float = 20.0
+    ):
+        self.transport = transport
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._waits = deque(maxlen=1000)
+        self.requests = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.throttled = 0
+
+    def _acquire(self, deadline: float) -> None:
+        expires = time.monotonic() + deadline
+        if not self._semaphore.acquire(timeout=deadline):
+            raise LLMUnavailable(f"No LLM capacity within {deadline}s")
+        delay = self._bucket.reserve()
+        if time.monotonic() + delay > expires:
+            self._bucket.refund()
+            self._semaphore.release()
+            raise LLMUnavailable(f"No LLM capacity within {deadline}s")
+        if delay > 0:
+            time.sleep(delay)
+
+    @contextmanager
+    def slot(self, deadline: Optional[float] = None) -> Iterator[float]:
+        """Wait for capacity; yields the seconds left of the deadline"""
+        deadline = self.deadline if deadline is None else deadline
+        with self._lock:
+            self.requests += 1
+            if self._waiting >= self.max_queue:
+                self.rejected += 1
+                raise LLMUnavailable("LLM queue is full")
+            self._waiting += 1
+
+        start = time.monotonic()
+        try:
+            self._acquire(deadline)
+        except LLMUnavailable:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        waited = time.monotonic() - start
+
+        with self._lock:
+            self._waits.append(waited)
+            self._in_flight += 1
+        try:
+            yield max(0.0, deadline - waited)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._semaphore.release()
+
+    def _post(self, payload: Dict[str, Any], remaining: float, **kwargs):
+        if remaining <= 0:
+            with self._lock:
+                self.timeouts += 1
+            raise LLMUnavailable("LLM call exceeded its deadline")
+        try:
+            return self.transport.request("POST", "completions", json=payload, timeout=remaining, **kwargs)
+        except RetryableStatusError as e:
+            if e.response is not None and e.response.status_code == 429:
+                with self._lock:
+                    self.throttled += 1
+                retry_after = e.response.headers.get("Retry-After", "")
+                self._bucket.pause(float(retry_after) if retry_after.replace(".", "", 1).isdigit() else 1.0)
+            raise
+        except requests.Timeout:
+            with self._lock:
+                self.timeouts += 1
+            raise LLMUnavailable("LLM call exceeded its deadline")
+
+    def complete(self, payload: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """POST /completions within the deadline"""
+        with self.slot(deadline) as remaining:
+            return self._post(payload, remaining).json()
+
+    def stream(self, payload: Dict[str, Any], deadline: Optional[float] = None) -> Iterator[str]:
+        """Streamed /completions; the deadline bounds the wait for each chunk"""
+        with self.slot(deadline) as remaining:
+            response = self._post({**payload, "stream": True}, remaining, stream=True)
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event.get("choices"):
+                        text = event["choices"][0].get("text") or ""
+                        if text:
+                            yield text
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "throttled": self.throttled,
+                "wait_seconds": {
+                    "recent": len(waits),
+                    "mean": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                    "p95": round(waits[int(0.95 * (len(waits) - 1))], 4) if waits else 0.0,
+                    "max": round(waits[-1], 4) if waits else 0.0,
+                },
+            }
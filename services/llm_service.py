@@ -1,31 +1,121 @@
-import together
 import sys
 import os
 
 # Add the project root directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import settings
-import json
+from database import DATA_DIR
+from services.explanation_cache import ExplanationCache
+from services.http_transport import CircuitBreaker, ResilientTransport
+from services.llm_client import LLMUnavailable, RateLimitedLLMClient
+from typing import Any, Dict, Iterator, Optional
+
+# Shared by every DeepSeekLLM in the process
+explanation_cache = ExplanationCache(
+    os.path.join(DATA_DIR, "explanation_cache.db")
+    if settings.EXPLANATION_CACHE_PATH is None else (settings.EXPLANATION_CACHE_PATH or None),
+    max_entries=settings.EXPLANATION_CACHE_SIZE,
+    ttl=settings.EXPLANATION_CACHE_TTL
+)
+
+# One quota for every completion call in the process (explanations and chat)
+llm_client = RateLimitedLLMClient(
+    ResilientTransport(
+        settings.TOGETHER_API_BASE,
+        headers={"Authorization": f"Bearer {settings.TOGETHER_API_KEY}"},
+        max_retries=0,
+        breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+    ),
+    rate_per_minute=settings.LLM_RATE_PER_MINUTE,
+    burst=settings.LLM_BURST,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_queue=settings.LLM_MAX_QUEUE,
+    deadline=settings.LLM_DEADLINE
+)
 
 class DeepSeekLLM:
-    def __init__(self):
-        together.api_key = settings.TOGETHER_API_KEY
+    MODEL = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
+    FALLBACK_MESSAGE = "I apologize, but I'm having trouble generating a response right now. Please try again later."
+
+    def __init__(
+        self,
+        cache: Optional[ExplanationCache] = None,
+        client: Optional[RateLimitedLLMClient] = None
+    ):
+        self.cache = cache or explanation_cache
+        self.client = client or llm_client
     
-    def generate_explanation(self, prompt: str) -> str:
-        """Generate explanation using Together API"""
+    def generate_explanation(
+        self,
+        prompt: str,
+        signature: Optional[str] = None,
+        values: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Generate explanation using Together API.
+
+        With a decision ``signature`` (see decision_signature) and the
+        claim's ``values`` (earnings, months, employer, reason), a cached
+        explanation for the same decision shape is reused when there is one.
+        """
+        if signature is not None:
+            cached = self.cache.get(signature, values or {})
+            if cached is not None:
+                return cached
         try:
             print(prompt)
-            response = together.Complete.create(
-                prompt=prompt,
-                model="meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
-                temperature=0.5,
-                max_tokens=150
-            )
+            response = self.client.complete({
+                "prompt": prompt,
+                "model": self.MODEL,
+                "temperature": 0.5,
+                "max_tokens": 150
+            })
             if 'choices' in response and response['choices']:
-                return response['choices'][0]['text'].strip()
+                text = response['choices'][0]['text'].strip()
+                if text and signature is not None:
+                    self.cache.put(signature, text, values or {})
+                return text
             else:
                 print(f"LLM response missing 'choices' key: {response}")
-                return "I apologize, but I'm having trouble generating a response right now. Please try again later."
+                return self.FALLBACK_MESSAGE
+        except LLMUnavailable as e:
+            print(f"LLM call shed: {str(e)}")
+            return self.FALLBACK_MESSAGE
+        except Exception as e:
+            print(f"LLM error: {str(e)}")
+            return self.FALLBACK_MESSAGE
+
+    def stream_explanation(
+        self,
+        prompt: str,
+        signature: Optional[str] = None,
+        values: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """Yield the explanation token by token as the model generates it.
+
+        Takes the same arguments as generate_explanation. A cached
+        explanation is yielded in one piece; if the stream fails before the
+        first token the fallback message is yielded instead.
+        """
+        if signature is not None:
+            cached = self.cache.get(signature, values or {})
+            if cached is not None:
+                yield cached
+                return
+        parts = []
+        try:
+            for token in self.client.stream({
+                "prompt": prompt,
+                "model": self.MODEL,
+                "temperature": 0.5,
+                "max_tokens": 150
+            }):
+                parts.append(token)
+                yield token
         except Exception as e:
             print(f"LLM error: {str(e)}")
-            return "I apologize, but I'm having trouble generating a response right now. Please try again later."
\ No newline at end of file
+            if not parts:
+                yield self.FALLBACK_MESSAGE
+            return
+        text = "".join(parts).strip()
+        if text and signature is not None:
+            self.cache.put(signature, text, values or {})
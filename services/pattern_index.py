@@ -0,0 +1,248 @@
+import json
+import threading
+import time
+from typing import Any, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import event, func
+
+from services.shared_matrix import SharedArrayStore
+
+
+class PatternMatch(NamedTuple):
+    id: int
+    description: str
+    severity: int
+    similarity: float
+
+
+def as_vector(value: Any) -> Optional[np.ndarray]:
+    """Decode a stored embedding (BLOB, JSON text, list or array) into a float32 vector"""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, memoryview)):
+        value = np.frombuffer(value, dtype="<f4")
+    elif isinstance(value, str):
+        value = json.loads(value)
+    vector = np.asarray(value, dtype=np.float32)
+    if vector.ndim != 1 or vector.size == 0:
+        return None
+    return vector
+
+
+class FraudPatternIndex:
+    """In-memory matrix of L2-normalized fraud pattern embeddings.
+
+    All pattern rows are loaded once into a float32 matrix so a claim is scored
+    with a single matrix-vector product instead of a Python loop over rows.
+    The index reloads when the pattern table changes: ORM writes in this process
+    mark it stale immediately, and a cheap (row count, max id) signature query
+    picks up changes from other processes at most every ``refresh_interval``
+    seconds.
+    """
+
+    def __init__(self, session_factory, model, refresh_interval: float = 5.0):
+        self.session_factory = session_factory
+        self.model = model
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        # (matrix, ids, severities, descriptions), swapped as a whole on reload
+        self._snapshot = (
+            np.zeros((0, 0), dtype=np.float32),
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int32),
+            []
+        )
+        self._signature = None
+        self._checked_at = 0.0
+        self._stale = True
+
+        for name in ("after_insert", "after_update", "after_delete"):
+            event.listen(model, name, self._mark_stale)
+
+    def _mark_stale(self, *args) -> None:
+        self._stale = True
+
+    @property
+    def dim(self) -> int:
+        return self._snapshot[0].shape[1]
+
+    def __len__(self) -> int:
+        return self._snapshot[0].shape[0]
+
+    @property
+    def signature(self):
+        """(row count, max id) of the pattern table at the last load"""
+        return self._signature
+
+    def _read_signature(self, db):
+        return tuple(db.query(func.count(self.model.id), func.max(self.model.id)).one())
+
+    def _load(self, db, signature) -> None:
+        rows = db.query(
+            self.model.id,
+            self.model.description,
+            self.model.severity,
+            self.model.embedding
+        ).order_by(self.model.id).all()
+
+        ids, severities, descriptions, vectors = [], [], [], []
+        dim = None
+        for row in rows:
+            vector = as_vector(row.embedding)
+            if vector is None:
+                continue
+            if dim is None:
+                dim = vector.size
+            # Embedding columns may carry a precomputed norm
+            norm = getattr(row.embedding, "norm", None)
+            if norm is None:
+                norm = np.linalg.norm(vector)
+            # Skip unusable rows rather than poisoning every score with NaNs
+            if vector.size != dim or norm == 0:
+                continue
+            ids.append(row.id)
+            severities.append(row.severity or 0)
+            descriptions.append(row.description)
+            vectors.append(vector / norm)
+
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        self._snapshot = (
+            np.ascontiguousarray(matrix, dtype=np.float32),
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(severities, dtype=np.int32),
+            descriptions
+        )
+        self._signature = signature
+
+    def refresh(self, db=None, force: bool = False) -> None:
+        """Reload the matrix if the pattern table changed since the last load"""
+        now = time.monotonic()
+        if not (force or self._stale) and now - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            if db is None:
+                with self.session_factory() as session:
+                    self._refresh_locked(session, force)
+            else:
+                self._refresh_locked(db, force)
+            self._checked_at = time.monotonic()
+
+    def _refresh_locked(self, db, force: bool) -> None:
+        stale = self._stale
+        self._stale = False
+        signature = self._read_signature(db)
+        if force or stale or signature != self._signature:
+            self._load(db, signature)
+
+    def publish(self, store: SharedArrayStore) -> int:
+        """Publish the current matrix for SharedFraudPatternIndex readers"""
+        with self._lock:
+            matrix, ids, severities, descriptions = self._snapshot
+            return store.publish(
+                {"matrix": matrix, "ids": ids, "severities": severities},
+                {"descriptions": descriptions, "signature": list(self._signature or ())}
+            )
+
+    def search(
+        self,
+        embedding: Any,
+        threshold: float = 0.8,
+        top_k: Optional[int] = None,
+        db=None
+    ) -> List[PatternMatch]:
+        """Return patterns whose cosine similarity exceeds threshold, best first"""
+        return self.search_batch([embedding], threshold, top_k, db)[0]
+
+    def search_batch(
+        self,
+        embeddings: List[Any],
+        threshold: float = 0.8,
+        top_k: Optional[int] = None,
+        db=None
+    ) -> List[List[PatternMatch]]:
+        """Score many embeddings against every pattern with one matrix multiply"""
+        self.refresh(db)
+        snapshot = self._snapshot
+        matrix = snapshot[0]
+        results: List[List[PatternMatch]] = [[] for _ in embeddings]
+        if len(matrix) == 0:
+            return results
+
+        rows, queries = [], []
+        for i, embedding in enumerate(embeddings):
+            query = as_vector(embedding)
+            if query is None or query.size != matrix.shape[1]:
+                continue
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                continue
+            rows.append(i)
+            queries.append(query / norm)
+        if not queries:
+            return results
+
+        similarities = np.vstack(queries) @ matrix.T
+        for row, scores in zip(rows, similarities):
+            results[row] = self._matches(scores, threshold, top_k, snapshot)
+        return results
+
+    def _matches(self, similarities, threshold, top_k, snapshot) -> List[PatternMatch]:
+        _, ids, severities, descriptions = snapshot
+        candidates = np.flatnonzero(similarities > threshold)
+        if top_k is not None and candidates.size > top_k:
+            best = np.argpartition(similarities[candidates], -top_k)[-top_k:]
+            candidates = candidates[best]
+        candidates = candidates[np.argsort(-similarities[candidates])]
+
+        return [
+            PatternMatch(
+                id=int(ids[i]),
+                description=descriptions[i],
+                severity=int(severities[i]),
+                similarity=float(similarities[i])
+            )
+            for i in candidates
+        ]
+
+
+class SharedFraudPatternIndex(FraudPatternIndex):
+    """FraudPatternIndex attached to a matrix published by another process.
+
+    The loader (services/index_loader.py) owns the database side and publishes
+    each new pattern matrix to ``shared``; this index maps it read-only, so
+    any number of worker processes share one copy. Its generation
+    counter is checked on every search and a new generation is swapped in
+    as a whole, just like a reload.
+    """
+
+    def __init__(self, shared: SharedArrayStore):
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._snapshot = (
+            np.zeros((0, 0), dtype=np.float32),
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int32),
+            []
+        )
+        self._signature = None
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def refresh(self, db=None, force: bool = False) -> None:
+        """Attach the latest published matrix if there is a newer one"""
+        if not force and self.shared.generation() == self._generation:
+            return
+        with self._lock:
+            attached = self.shared.attach()
+            if attached is None:
+                return
+            generation, arrays, meta = attached
+            self._snapshot = (arrays["matrix"], arrays["ids"], arrays["severities"], meta["descriptions"])
+            self._signature = tuple(meta["signature"]) or None
+            self._generation = generation
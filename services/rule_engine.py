@@ -0,0 +1,163 @@
+import ast
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from sqlalchemy import event
+
+# Node types a condition may contain; anything else (lambdas, comprehensions,
+# subscripts, arbitrary attribute access, ...) is rejected at compile time
+ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or,
+    ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.In, ast.NotIn, ast.Is, ast.IsNot,
+    ast.IfExp, ast.Call, ast.Attribute, ast.Name, ast.Load,
+    ast.Constant, ast.List, ast.Tuple, ast.Set,
+)
+ALLOWED_METHODS = {"lower", "upper", "strip", "title", "startswith", "endswith"}
+SAFE_BUILTINS = {
+    "len": len, "abs": abs, "min": min, "max": max,
+    "int": int, "float": float, "str": str, "round": round,
+}
+
+
+class RuleError(Exception):
+    """An eligibility condition could not be compiled or evaluated"""
+
+
+class CompiledCondition:
+    def __init__(self, source: str, code, names: FrozenSet[str]):
+        self.source = source
+        self.code = code
+        self.names = names
+
+    def __call__(self, data: Dict[str, Any]) -> bool:
+        missing = self.names.difference(data)
+        if missing:
+            raise RuleError(f"Missing field(s) {', '.join(sorted(missing))}")
+        try:
+            return bool(eval(self.code, {"__builtins__": SAFE_BUILTINS}, data))
+        except Exception as e:
+            raise RuleError(f"{type(e).__name__}: {e}") from e
+
+
+def _validate(tree: ast.AST) -> FrozenSet[str]:
+    """Check every node against the whitelist, returning the data fields used"""
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise RuleError(f"Disallowed syntax: {type(node).__name__}")
+        if isinstance(node, ast.Name):
+            if node.id.startswith("_"):
+                raise RuleError(f"Disallowed name: {node.id}")
+            if node.id not in SAFE_BUILTINS:
+                names.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            if node.attr not in ALLOWED_METHODS:
+                raise RuleError(f"Disallowed attribute: {node.attr}")
+        elif isinstance(node, ast.Call):
+            if node.keywords:
+                raise RuleError("Keyword arguments are not allowed")
+            func = node.func
+            if isinstance(func, ast.Name) and func.id in SAFE_BUILTINS:
+                continue
+            if isinstance(func, ast.Attribute):
+                continue
+            raise RuleError("Only whitelisted functions and string methods may be called")
+
+    # Attributes are only allowed as method calls, e.g. reason.lower()
+    called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and id(node) not in called:
+            raise RuleError(f"Attribute access is only allowed as a call: {node.attr}")
+    return frozenset(names)
+
+
+def parse_condition(source: str):
+    """Parse and whitelist a condition, returning (tree, data fields used)"""
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"Syntax error: {e.msg}") from e
+    return tree, _validate(tree)
+
+
+@lru_cache(maxsize=1024)
+def compile_condition(source: str) -> CompiledCondition:
+    """Parse, whitelist and compile a condition once; cached by source text"""
+    tree, names = parse_condition(source)
+    return CompiledCondition(source, compile(tree, "<eligibility rule>", "eval"), names)
+
+
+class CompiledRule:
+    def __init__(self, name: str, condition: str, message: str):
+        self.name = name
+        self.message = message
+        self.condition = condition
+        self.error: Optional[str] = None
+        self._check: Optional[CompiledCondition] = None
+        try:
+            self._check = compile_condition(condition or "")
+        except RuleError as e:
+            self.error = str(e)
+
+    def evaluate(self, data: Dict[str, Any]) -> bool:
+        """True if the claim satisfies the rule; raises RuleError on a broken rule"""
+        if self._check is None:
+            raise RuleError(self.error)
+        return self._check(data)
+
+
+class EligibilityRuleSet:
+    """Compiled eligibility rules kept in memory.
+
+    The rules table is small, so freshness is checked by re-reading its rows
+    at most every ``refresh_interval`` seconds (or right after an ORM write in
+    this process) and recompiling only when they differ. Unchanged
+    conditions come straight from the compile cache.
+    """
+
+    def __init__(self, session_factory, model, refresh_interval: float = 5.0):
+        self.session_factory = session_factory
+        self.model = model
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._rules: List[CompiledRule] = []
+        self._rows = None
+        self._checked_at = 0.0
+        self._stale = True
+
+        for name in ("after_insert", "after_update", "after_delete"):
+            event.listen(model, name, self._mark_stale)
+
+    def _mark_stale(self, *args) -> None:
+        self._stale = True
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not (force or self._stale) and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            self._stale = False
+            with self.session_factory() as db:
+                rows = tuple(db.query(
+                    self.model.id,
+                    self.model.rule_name,
+                    self.model.condition,
+                    self.model.message
+                ).order_by(self.model.id).all())
+            if force or rows != self._rows:
+                rules = [CompiledRule(row.rule_name, row.condition, row.message) for row in rows]
+                for rule in rules:
+                    if rule.error:
+                        print(f"Eligibility rule '{rule.name}' failed to compile: {rule.error}")
+                self._rules = rules
+                self._rows = rows
+            self._checked_at = time.monotonic()
+
+    def rules(self) -> List[CompiledRule]:
+        self.refresh()
+        return self._rules
@@ -0,0 +1,107 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+_COUNTER = struct.Struct("<Q")
+
+
+class SharedArrayStore:
+    """Named group of NumPy arrays shared between processes through
+    memory-mapped .npy files.
+
+    A single publisher writes each version to its own generation directory
+    (``<root>/<name>.<generation>``, fsynced and renamed into place) and
+    then bumps a counter in ``<root>/<name>.generation``. Readers keep the
+    counter file mapped, so checking for a new version is a memory read,
+    and map the arrays read-only: every process shares the one copy in the
+    page cache. Point ``root`` at /dev/shm to keep it in RAM. Only the
+    ``keep`` newest generations stay on disk; processes still mapping an
+    older one keep their view until they move on.
+    """
+
+    def __init__(self, root: str, name: str, keep: int = 2):
+        self.root = root
+        self.name = name
+        self.keep = keep
+        self._counter_path = os.path.join(root, f"{name}.generation")
+        self._counter: Optional[mmap.mmap] = None
+
+    def _generation_dir(self, generation: int) -> str:
+        return os.path.join(self.root, f"{self.name}.{generation}")
+
+    def generation(self) -> int:
+        """Latest published generation, 0 if nothing has been published"""
+        if self._counter is None:
+            try:
+                with open(self._counter_path, "rb") as f:
+                    self._counter = mmap.mmap(f.fileno(), _COUNTER.size, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                return 0
+        return _COUNTER.unpack_from(self._counter)[0]
+
+    def publish(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> int:
+        """Write a new generation and make it current; returns its number"""
+        os.makedirs(self.root, exist_ok=True)
+        generation = self.generation() + 1
+        target = self._generation_dir(generation)
+        tmp = f"{target}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for key, array in arrays.items():
+            with open(os.path.join(tmp, f"{key}.npy"), "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"arrays": sorted(arrays), "meta": meta or {}}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+
+        # Readers only look at a generation once the counter points at it
+        if not os.path.exists(self._counter_path):
+            with open(f"{self._counter_path}.tmp", "wb") as f:
+                f.write(_COUNTER.pack(0))
+            os.replace(f"{self._counter_path}.tmp", self._counter_path)
+        with open(self._counter_path, "r+b") as f:
+            with mmap.mmap(f.fileno(), _COUNTER.size) as counter:
+                _COUNTER.pack_into(counter, 0, generation)
+                counter.flush()
+
+        for old in range(generation - self.keep, 0, -1):
+            if not os.path.isdir(self._generation_dir(old)):
+                break
+            shutil.rmtree(self._generation_dir(old), ignore_errors=True)
+        return generation
+
+    def attach(self) -> Optional[Tuple[int, Dict[str, np.ndarray], Dict[str, Any]]]:
+        """Map the current generation read-only: (generation, arrays, meta),
+        or None if nothing has been published yet"""
+        for _ in range(3):
+            generation = self.generation()
+            if generation == 0:
+                return None
+            directory = self._generation_dir(generation)
+            try:
+                with open(os.path.join(directory, "meta.json")) as f:
+                    manifest = json.load(f)
+                arrays = {key: self._map(os.path.join(directory, f"{key}.npy")) for key in manifest["arrays"]}
+            except FileNotFoundError:
+                # Superseded and removed while we were reading; try the newer one
+                continue
+            return generation, arrays, manifest["meta"]
+        return None
+
+    @staticmethod
+    def _map(path: str) -> np.ndarray:
+        try:
+            return np.load(path, mmap_mode="r")
+        except ValueError:
+            # Empty arrays cannot be mapped
+            return np.load(path)
@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+
+
+class TemporalClaimCounter:
+    """Per-SSN sliding-window claim counter.
+
+    Keeps the claim timestamps inside the window for each SSN, in order, and
+    drops expired ones from the front as it goes, so counting is amortized
+    O(1) however large claim_history grows. SSNs are loaded from the database
+    the first time they are seen (a range scan on the (ssn_last4, claim_date)
+    index), or all at once with warm(). Inserts made through record() keep
+    the counts current.
+
+    When several processes write claims (multi-worker mode), pass
+    ``refresh_interval``: the counter then remembers the highest history id
+    it has read and, at most every ``refresh_interval`` seconds and after
+    each record(), picks up the rows above it, whichever process wrote them.
+    Cold loads stop at that id, so no row is counted twice. Without it,
+    inserts by other processes are only seen after a restart.
+    """
+
+    def __init__(self, session_factory, model, window_days: int = 365,
+                 refresh_interval: Optional[float] = None):
+        self.session_factory = session_factory
+        self.model = model
+        self.window = timedelta(days=window_days)
+        self.refresh_interval = refresh_interval
+        self._events: Dict[str, Deque[datetime]] = {}
+        self._warm = False
+        self._lock = threading.Lock()
+        # Shared mode only: serializes catch-ups and cold loads
+        self._sync_lock = threading.Lock()
+        self._last_id: Optional[int] = None
+        self._checked_at = 0.0
+
+    def warm(self) -> None:
+        """Load every SSN with claims inside the window in one pass"""
+        cutoff = datetime.now() - self.window
+        events: Dict[str, Deque[datetime]] = {}
+        with self._sync_lock, self.session_factory() as db:
+            query = db.query(self.model.ssn_last4, self.model.claim_date).filter(
+                self.model.claim_date > cutoff
+            )
+            last_id = None
+            if self.refresh_interval is not None:
+                last_id = db.query(func.max(self.model.id)).scalar() or 0
+                query = query.filter(self.model.id <= last_id)
+            rows = query.order_by(self.model.ssn_last4, self.model.claim_date).yield_per(10000)
+            for ssn, claim_date in rows:
+                events.setdefault(ssn, deque()).append(claim_date)
+            with self._lock:
+                self._events = events
+                self._warm = True
+                self._last_id = last_id
+                self._checked_at = time.monotonic()
+
+    def preload(self, ssns: Iterable[str], db=None) -> None:
+        """Load any SSNs not yet in memory with a single indexed query"""
+        self._refresh(ssns, db, force=False)
+
+    def _refresh(self, ssns: Iterable[str], db, force: bool) -> None:
+        cold = [] if self._warm else [ssn for ssn in set(ssns) if ssn not in self._events]
+        due = self.refresh_interval is not None and (
+            force or time.monotonic() - self._checked_at >= self.refresh_interval
+        )
+        if not cold and not due:
+            return
+        if db is None:
+            with self.session_factory() as session:
+                self._sync(cold, session)
+        else:
+            self._sync(cold, db)
+
+    def _sync(self, cold: List[str], db) -> None:
+        cutoff = datetime.now() - self.window
+        if self.refresh_interval is None:
+            self._load(cold, cutoff, db)
+            return
+        with self._sync_lock:
+            # Rows above _last_id only ever arrive through _catch_up
+            self._catch_up(db)
+            cold = [ssn for ssn in cold if ssn not in self._events]
+            self._load(cold, cutoff, db, max_id=self._last_id)
+
+    def _catch_up(self, db) -> None:
+        """Add the rows inserted (by any process) since the last look"""
+        if self._last_id is None:
+            # Nothing loaded yet: cold loads cover everything up to here
+            self._last_id = db.query(func.max(self.model.id)).scalar() or 0
+        else:
+            rows = db.query(self.model.id, self.model.ssn_last4, self.model.claim_date).filter(
+                self.model.id > self._last_id
+            ).order_by(self.model.id).all()
+            with self._lock:
+                for item_id, ssn, claim_date in rows:
+                    self._last_id = item_id
+                    # Untracked SSNs pick the row up when they are loaded
+                    if self._warm or ssn in self._events:
+                        self._append_locked(ssn, claim_date)
+        self._checked_at = time.monotonic()
+
+    def _load(self, ssns, cutoff: datetime, db, max_id: Optional[int] = None) -> None:
+        if not ssns:
+            return
+        query = db.query(self.model.ssn_last4, self.model.claim_date).filter(
+            self.model.ssn_last4.in_(ssns),
+            self.model.claim_date > cutoff
+        )
+        if max_id is not None:
+            query = query.filter(self.model.id <= max_id)
+        rows = query.order_by(self.model.ssn_last4, self.model.claim_date).all()
+        loaded: Dict[str, Deque[datetime]] = {ssn: deque() for ssn in ssns}
+        for ssn, claim_date in rows:
+            loaded[ssn].append(claim_date)
+        with self._lock:
+            for ssn, events in loaded.items():
+                self._events.setdefault(ssn, events)
+
+    def _append_locked(self, ssn: str, claim_date: datetime) -> None:
+        events = self._events.setdefault(ssn, deque())
+        if events and claim_date < events[-1]:
+            # Out-of-order insert (e.g. a backfill): keep the deque sorted
+            events.append(claim_date)
+            self._events[ssn] = deque(sorted(events))
+        else:
+            events.append(claim_date)
+
+    def record(self, ssn: str, claim_date: datetime) -> None:
+        """Register a claim that has just been written to claim_history"""
+        if self.refresh_interval is not None:
+            # The committed row comes in with everyone else's
+            self._refresh([ssn], None, force=True)
+            return
+        if not self._warm and ssn not in self._events:
+            # The cold load already includes the committed row
+            self.preload([ssn])
+            return
+        with self._lock:
+            self._append_locked(ssn, claim_date)
+
+    def count(self, ssn: str, now: Optional[datetime] = None) -> int:
+        """Claims for an SSN within the window ending at now"""
+        self.preload([ssn])
+        cutoff = (now or datetime.now()) - self.window
+        with self._lock:
+            events = self._events.get(ssn)
+            if not events:
+                return 0
+            while events and events[0] <= cutoff:
+                events.popleft()
+            return len(events)
@@ -0,0 +1,250 @@
+"""Bulk what-if evaluation of eligibility rule changes over all applicants.
+
+Usage: python -m services.what_if proposed_rules.json
+(a JSON list of {"rule_name", "condition", "message"} objects)
+"""
+import ast
+import json
+import operator
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.rule_engine import RuleError, compile_condition, parse_condition
+
+BINARY_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+}
+COMPARE_OPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+STRING_METHODS = {"lower", "upper", "strip", "title", "startswith", "endswith"}
+
+
+class _ColumnExpression:
+    """Evaluates a whitelisted condition AST against whole DataFrame columns"""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    def visit(self, node: ast.AST) -> Any:
+        method = getattr(self, f"visit_{type(node).__name__}", None)
+        if method is None:
+            raise RuleError(f"Cannot vectorize {type(node).__name__}")
+        return method(node)
+
+    def visit_Expression(self, node):
+        return self.visit(node.body)
+
+    def visit_Name(self, node):
+        return self.frame[node.id]
+
+    def visit_Constant(self, node):
+        return node.value
+
+    def visit_List(self, node):
+        return [self.visit(elt) for elt in node.elts]
+
+    visit_Tuple = visit_List
+    visit_Set = visit_List
+
+    def visit_BoolOp(self, node):
+        values = [_as_bool(self.visit(value)) for value in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        result = values[0]
+        for value in values[1:]:
+            result = combine(result, value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        operand = self.visit(node.operand)
+        if isinstance(node.op, ast.Not):
+            return np.logical_not(_as_bool(operand))
+        if isinstance(node.op, ast.USub):
+            return -operand
+        return operand
+
+    def visit_BinOp(self, node):
+        return BINARY_OPS[type(node.op)](self.visit(node.left), self.visit(node.right))
+
+    def visit_IfExp(self, node):
+        return np.where(_as_bool(self.visit(node.test)), self.visit(node.body), self.visit(node.orelse))
+
+    def visit_Compare(self, node):
+        result = None
+        left = self.visit(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = self.visit(comparator)
+            if isinstance(op, (ast.In, ast.NotIn)):
+                value = _contains(left, right)
+                if isinstance(op, ast.NotIn):
+                    value = np.logical_not(value)
+            elif isinstance(op, (ast.Is, ast.IsNot)):
+                raise RuleError("Cannot vectorize identity comparison")
+            else:
+                value = COMPARE_OPS[type(op)](left, right)
+            value = _as_bool(value)
+            result = value if result is None else np.logical_and(result, value)
+            left = right
+        return result
+
+    def visit_Call(self, node):
+        args = [self.visit(arg) for arg in node.args]
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr in STRING_METHODS:
+            target = self.visit(func.value)
+            if not isinstance(target, pd.Series):
+                return getattr(target, func.attr)(*args)
+            return getattr(target.astype(str).str, func.attr)(*args)
+        if isinstance(func, ast.Name):
+            if func.id == "len":
+                return args[0].astype(str).str.len()
+            if func.id == "abs":
+                return np.abs(args[0])
+            if func.id in ("float", "int"):
+                return pd.to_numeric(args[0], errors="coerce")
+            if func.id == "str":
+                return args[0].astype(str)
+        raise RuleError("Cannot vectorize this function call")
+
+
+def _as_bool(value: Any) -> np.ndarray:
+    if isinstance(value, pd.Series):
+        return value.fillna(False).to_numpy(dtype=bool)
+    return np.asarray(value, dtype=bool)
+
+
+def _contains(item: Any, container: Any) -> Any:
+    """Vectorized `item in container` for the shapes rules actually use"""
+    if isinstance(container, list):
+        if isinstance(item, pd.Series):
+            return item.isin(container)
+        return item in container
+    if isinstance(container, pd.Series) and isinstance(item, str):
+        return container.astype(str).str.contains(item, regex=False)
+    raise RuleError("Cannot vectorize membership test")
+
+
+class VectorRule:
+    """One rule compiled for whole-column evaluation, with a row-wise fallback"""
+
+    def __init__(self, name: str, condition: str, message: str = ""):
+        self.name = name
+        self.condition = condition
+        self.message = message
+        self.tree, self.names = parse_condition(condition)
+
+    def evaluate(self, frame: pd.DataFrame) -> np.ndarray:
+        """Boolean pass mask; rows with a missing referenced field fail"""
+        present = frame[sorted(self.names)].notna().all(axis=1).to_numpy() if self.names else True
+        try:
+            passed = _as_bool(_ColumnExpression(frame).visit(self.tree))
+            passed = np.broadcast_to(passed, (len(frame),))
+        except RuleError:
+            # Anything the translator does not cover is evaluated row by row
+            check = compile_condition(self.condition)
+            passed = np.fromiter(
+                (_row_passes(check, row) for row in frame[sorted(self.names)].to_dict("records")),
+                dtype=bool,
+                count=len(frame)
+            )
+        return np.logical_and(passed, present)
+
+
+def _row_passes(check: Callable, row: Dict) -> bool:
+    try:
+        return check(row)
+    except RuleError:
+        return False
+
+
+def _load_rules(rules: List[Any]) -> List[VectorRule]:
+    loaded = []
+    for rule in rules:
+        if isinstance(rule, dict):
+            loaded.append(VectorRule(rule["rule_name"], rule["condition"], rule.get("message", "")))
+        else:
+            loaded.append(VectorRule(rule.rule_name, rule.condition, rule.message))
+    return loaded
+
+
+def _empty_counts(rules: List[VectorRule]) -> Dict[str, Dict[str, int]]:
+    return {rule.name: {"pass": 0, "fail": 0} for rule in rules}
+
+
+def what_if(
+    proposed_rules: List[Dict],
+    current_rules: Optional[List[Any]] = None,
+    engine=None,
+    chunksize: int = 200_000,
+    max_ids: Optional[int] = None
+) -> Dict[str, Any]:
+    """Compare a proposed rule set with the current one over all applicants.
+
+    Returns per-rule pass/fail counts for both rule sets, overall eligible
+    counts, and the ids of applicants whose overall eligibility flips
+    (capped at ``max_ids`` per direction if given).
+    """
+    from database import ReadSessionLocal, read_engine as default_engine
+    from database.models import EligibilityRule
+
+    engine = engine or default_engine
+    if current_rules is None:
+        with ReadSessionLocal() as db:
+            current_rules = db.query(EligibilityRule).order_by(EligibilityRule.id).all()
+    current = _load_rules(current_rules)
+    proposed = _load_rules(proposed_rules)
+
+    names = set().union(*(rule.names for rule in current + proposed)) | {"id"}
+    with engine.connect() as conn:
+        table_columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(applicants)")}
+    # Fields applicants do not have are all-NaN, so rules using them fail per row
+    missing = sorted(names - table_columns)
+    query = f"SELECT {', '.join(sorted(names & table_columns))} FROM applicants ORDER BY id"
+
+    summary = {
+        "applicants": 0,
+        "current": {"eligible": 0, "rules": _empty_counts(current)},
+        "proposed": {"eligible": 0, "rules": _empty_counts(proposed)},
+        "newly_eligible": [],
+        "newly_ineligible": [],
+    }
+    for frame in pd.read_sql_query(query, engine, chunksize=chunksize):
+        for name in missing:
+            frame[name] = np.nan
+        ids = frame["id"].to_numpy()
+        summary["applicants"] += len(frame)
+
+        eligible = {}
+        for label, rules in (("current", current), ("proposed", proposed)):
+            all_passed = np.ones(len(frame), dtype=bool)
+            for rule in rules:
+                passed = rule.evaluate(frame)
+                counts = summary[label]["rules"][rule.name]
+                counts["pass"] += int(passed.sum())
+                counts["fail"] += int(len(passed) - passed.sum())
+                all_passed &= passed
+            summary[label]["eligible"] += int(all_passed.sum())
+            eligible[label] = all_passed
+
+        for key, mask in (
+            ("newly_eligible", eligible["proposed"] & ~eligible["current"]),
+            ("newly_ineligible", eligible["current"] & ~eligible["proposed"]),
+        ):
+            found = summary[key]
+            if max_ids is None or len(found) < max_ids:
+                found.extend(int(i) for i in ids[mask][:None if max_ids is None else max_ids - len(found)])
+
+    return summary
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m services.what_if proposed_rules.json")
+        sys.exit(1)
+    with open(sys.argv[1]) as f:
+        print(json.dumps(what_if(json.load(f), max_ids=1000), indent=2))
@@ -0,0 +1,179 @@
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+# Child states reported by ProcessSupervisor.status()
+STARTING = "starting"
+READY = "ready"
+UNHEALTHY = "unhealthy"
+STOPPED = "stopped"
+
+
+class ProcessSupervisor:
+    """Runs a child server process and keeps it up.
+
+    After launch the child's ``health_url`` is polled with a short, growing
+    interval (``poll_initial`` doubling up to ``poll_max``) so readiness is
+    noticed as soon as the server answers instead of after a fixed sleep.
+    Once ready it is probed every ``check_interval`` seconds. A child that
+    exits, or fails ``failure_threshold`` probes in a row, is restarted
+    with exponential backoff (reset after ``stable_after`` seconds up).
+    Children without an HTTP endpoint pass a ``health_check`` callable
+    instead of a URL.
+    """
+
+    def __init__(
+        self,
+        command: List[str],
+        health_url: Optional[str] = None,
+        poll_initial: float = 0.05,
+        poll_max: float = 0.5,
+        check_interval: float = 5.0,
+        failure_threshold: int = 3,
+        restart_backoff_max: float = 30.0,
+        stable_after: float = 60.0,
+        health_check: Optional[Callable[[], bool]] = None,
+        env: Optional[Dict[str, str]] = None,
+        name: str = "Streamlit"
+    ):
+        self.command = command
+        self.health_url = health_url
+        self.health_check = health_check
+        self.env = env
+        self.name = name
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.check_interval = check_interval
+        self.failure_threshold = failure_threshold
+        self.restart_backoff_max = restart_backoff_max
+        self.stable_after = stable_after
+
+        self.state = STOPPED
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self.last_exit_code: Optional[int] = None
+        self.startup_seconds: Optional[float] = None
+        self._started_at: Optional[float] = None
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._spawn()
+        self._thread = threading.Thread(target=self._monitor, name="supervisor", daemon=True)
+        self._thread.start()
+
+    def _spawn(self) -> None:
+        env = None
+        if self.env:
+            env = {**os.environ, **self.env}
+        self.process = subprocess.Popen(self.command, env=env)
+        self._started_at = time.monotonic()
+        self._ready.clear()
+        self.state = STARTING
+
+    def _healthy(self) -> bool:
+        if self.health_check is not None:
+            return self.health_check()
+        try:
+            return requests.get(self.health_url, timeout=1.0).ok
+        except requests.RequestException:
+            return False
+
+    def _wait(self, seconds: float) -> bool:
+        """Sleep up to ``seconds``; True if the child exited meanwhile"""
+        try:
+            self.process.wait(timeout=seconds)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+
+    def _monitor(self) -> None:
+        poll = self.poll_initial
+        failures = 0
+        backoff = 1.0
+        while not self._stopping.is_set():
+            if self.state == STARTING:
+                if self._healthy():
+                    self.startup_seconds = round(time.monotonic() - self._started_at, 3)
+                    self.state = READY
+                    self._ready.set()
+                    print(f"{self.name} ready after {self.startup_seconds}s (pid {self.process.pid})")
+                    failures = 0
+                    exited = False
+                else:
+                    exited = self._wait(poll)
+                    poll = min(poll * 2, self.poll_max)
+            else:
+                exited = self._wait(self.check_interval)
+                if not exited and not self._stopping.is_set():
+                    if self._healthy():
+                        failures = 0
+                        self.state = READY
+                    else:
+                        failures += 1
+                        self.state = UNHEALTHY
+                        if failures >= self.failure_threshold:
+                            print(f"{self.name} failed {failures} health checks; restarting")
+                            self._terminate()
+                            exited = True
+
+            if exited and not self._stopping.is_set():
+                self.last_exit_code = self.process.poll()
+                if time.monotonic() - self._started_at >= self.stable_after:
+                    backoff = 1.0
+                print(f"{self.name} exited with code {self.last_exit_code}; restarting in {backoff:.0f}s")
+                self.state = STARTING
+                self._ready.clear()
+                if self._stopping.wait(backoff):
+                    break
+                backoff = min(backoff * 2, self.restart_backoff_max)
+                self.restarts += 1
+                self._spawn()
+                poll = self.poll_initial
+                failures = 0
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the child answers its health check (or timeout)"""
+        return self._ready.wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def status(self) -> Dict[str, Any]:
+        running = self.process is not None and self.process.poll() is None
+        return {
+            "state": self.state,
+            "pid": self.process.pid if running else None,
+            "uptime_seconds": round(time.monotonic() - self._started_at, 1) if running else None,
+            "startup_seconds": self.startup_seconds,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+        }
+
+    def _terminate(self) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._terminate()
+        if self._thread is not None:
+            self._thread.join(timeout=15)
+            self._thread = None
+        self.state = STOPPED
+        self._ready.clear()
@@ -0,0 +1,74 @@
+import json
+
+from sqlalchemy import Column, Float, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from services.anomaly_detector import EarningsAnomalyDetector
+
+Base = declarative_base()
+
+
+class Applicant(Base):
+    __tablename__ = "applicants"
+
+    id = Column(Integer, primary_key=True)
+    employer = Column(String)
+    earnings = Column(Float)
+    employment_months = Column(Integer)
+
+
+def _claim(earnings, employer="Acme"):
+    return {"employer": employer, "earnings": earnings, "employment_months": 6}
+
+
+def _saved_count(path):
+    with open(path) as f:
+        return json.load(f)["overall"]["stats"]["count"]
+
+
+def test_merge_and_save_count_each_claim_once(tmp_path):
+    path = str(tmp_path / "sketch.json")
+    base = EarningsAnomalyDetector(path)
+    for i in range(10):
+        base.update(_claim(6000 + 100 * i))
+    base.save()
+    assert _saved_count(path) == 10
+
+    # Two workers start from the same snapshot; one sees a new claim
+    worker = EarningsAnomalyDetector(path)
+    other = EarningsAnomalyDetector(path)
+    other.update(_claim(9000))
+    worker.merge(other)
+    assert worker.snapshot()["overall"]["stats"]["count"] == 11
+
+    worker.save()
+    assert _saved_count(path) == 11
+    assert worker.snapshot()["overall"]["stats"]["count"] == 11
+
+
+def test_merge_adopts_seed_without_snapshot(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'claims.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add_all([Applicant(employer="Acme", earnings=6000 + i, employment_months=6) for i in range(5)])
+        db.commit()
+
+    # Seeded from the table (no snapshot yet) and then saw one claim
+    seeded = EarningsAnomalyDetector(None, session_factory, Applicant)
+    seeded.update(_claim(7000))
+
+    path = str(tmp_path / "sketch.json")
+    fresh = EarningsAnomalyDetector(path)
+    fresh.merge(seeded)
+    fresh.save()
+    assert _saved_count(path) == 6
+    engine.dispose()
+
+
+def test_observe_flags_outliers():
+    detector = EarningsAnomalyDetector(min_samples=30)
+    for i in range(200):
+        assert detector.observe(_claim(6000 + (i % 20) * 10)) is False
+    assert detector.observe(_claim(600000)) is True
+    assert detector.check(_claim(6100)) is False
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from sqlalchemy import Column, Integer, JSON, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from services.history_index import ClaimHistoryIndex
+
+Base = declarative_base()
+
+
+class History(Base):
+    __tablename__ = "claim_history"
+
+    id = Column(Integer, primary_key=True)
+    embedding = Column(JSON)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _insert(session_factory, vectors):
+    with session_factory() as db:
+        rows = [History(embedding=vector.tolist()) for vector in vectors]
+        db.add_all(rows)
+        db.commit()
+        return [row.id for row in rows]
+
+
+def _index(session_factory, tmp_path, **kwargs):
+    return ClaimHistoryIndex(session_factory, History, str(tmp_path / "history.npz"), **kwargs)
+
+
+def _wait_for_maintenance(index):
+    thread = index._maintenance
+    if thread is not None:
+        thread.join(timeout=30)
+
+
+def test_add_search_round_trip(db, tmp_path):
+    vectors = np.random.default_rng(0).normal(size=(300, 16)).astype(np.float32)
+    ids = _insert(db, vectors)
+
+    index = _index(db, tmp_path, min_train_size=64, save_every=32)
+    index.load()
+    _wait_for_maintenance(index)
+    assert len(index) == 300
+    assert index.trained_size >= 64
+
+    # Exact copies find themselves first
+    for i in (0, 150, 299):
+        match = index.search(vectors[i], top_k=1)[0]
+        assert match.id == ids[i]
+        assert match.similarity == pytest.approx(1.0, abs=1e-5)
+    assert all(m.id < ids[150] for m in index.search(vectors[150], top_k=5, before_id=ids[150]))
+
+    index.save()
+    reloaded = _index(db, tmp_path)
+    reloaded.load()
+    assert len(reloaded) == 300
+    assert reloaded.last_id == ids[-1]
+    assert reloaded.search(vectors[42], top_k=1)[0].id == ids[42]
+
+
+def test_rows_after_checkpoint_are_replayed(db, tmp_path):
+    vectors = np.random.default_rng(1).normal(size=(40, 8)).astype(np.float32)
+    _insert(db, vectors[:30])
+    index = _index(db, tmp_path)
+    index.load()
+    index.save()
+
+    # Added after the checkpoint and never saved
+    new_ids = _insert(db, vectors[30:])
+    for item_id, vector in zip(new_ids, vectors[30:]):
+        index.add(item_id, vector)
+    assert index._unsaved == 10
+
+    reloaded = _index(db, tmp_path)
+    reloaded.load()
+    assert len(reloaded) == 40
+    assert reloaded.search(vectors[35], top_k=1)[0].id == new_ids[5]
+
+
+def test_stale_checkpoint_is_rebuilt(db, tmp_path):
+    rng = np.random.default_rng(2)
+    _insert(db, rng.normal(size=(20, 8)).astype(np.float32))
+    index = _index(db, tmp_path)
+    index.load()
+    index.save()
+
+    # Reseed: same ids, fewer rows, different vectors
+    with db() as session:
+        session.query(History).delete()
+        session.commit()
+    reseeded = rng.normal(size=(5, 8)).astype(np.float32)
+    ids = _insert(db, reseeded)
+
+    reloaded = _index(db, tmp_path)
+    reloaded.load()
+    assert len(reloaded) == 5
+    assert reloaded.search(reseeded[3], top_k=1)[0].id == ids[3]
+
+
+def test_adds_during_retrain_are_kept(db, tmp_path):
+    vectors = np.random.default_rng(3).normal(size=(2000, 32)).astype(np.float32)
+    ids = _insert(db, vectors)
+    index = _index(db, tmp_path, min_train_size=256)
+    with index._lock:
+        for item_id, vector in zip(ids[:1000], vectors[:1000]):
+            index._add_locked(item_id, vector)
+        index._loaded = True
+        index._maintain_if_due()
+
+    # Training runs in the background; these land in the old cells and in
+    # the pending list, whichever the retrain sees
+    for item_id, vector in zip(ids[1000:], vectors[1000:]):
+        index.add(item_id, vector)
+    _wait_for_maintenance(index)
+
+    assert len(index) == 2000
+    assert sum(len(lst.view()[0]) for lst in index._lists) == 2000
+    for i in (10, 1500, 1999):
+        assert index.search(vectors[i], top_k=1)[0].id == ids[i]
@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import services.fraud_detector as fraud_detector_module
+from database import Base
+from database.models import Applicant, ClaimHistory, FraudPattern
+from database.writer import GroupCommitWriter
+from services.anomaly_detector import EarningsAnomalyDetector
+from services.embedding_backends import TogetherBackend
+from services.embedding_service import TogetherEmbedding, is_degraded
+from services.embedding_store import EmbeddingStore
+from services.fraud_detector import FraudDetector
+from services.history_index import ClaimHistoryIndex
+from services.http_transport import CircuitBreaker, CircuitOpenError, ResilientTransport
+from services.pattern_index import FraudPatternIndex
+from services.temporal_counter import TemporalClaimCounter
+
+CLAIM = {
+    "ssn_last4": "1234",
+    "employer": "Shell Co",
+    "separation_reason": "Laid off",
+    "earnings": 3000.0,
+    "employment_months": 12
+}
+
+
+class _EmbeddingHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.server.requests += 1
+        status = self.server.statuses.pop(0) if self.server.statuses else self.server.default_status
+        if status == 200:
+            data = [{"index": i, "embedding": [1.0, 0.0, 0.0]} for i, _ in enumerate(payload["input"])]
+            body = json.dumps({"data": data}).encode()
+        else:
+            body = b'{"error": "stub"}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EmbeddingHandler)
+    server.daemon_threads = True
+    server.requests = 0
+    server.statuses = []
+    server.default_status = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _transport(server, **kwargs) -> ResilientTransport:
+    kwargs.setdefault("backoff_base", 0.0)
+    return ResilientTransport(f"http://127.0.0.1:{server.server_address[1]}", timeout=5.0, **kwargs)
+
+
+def test_transient_statuses_are_retried(stub_server):
+    stub_server.statuses = [503, 429]
+    transport = _transport(stub_server, max_retries=2)
+
+    payload = transport.post_json("embeddings", {"model": "stub", "input": ["a"]})
+
+    assert payload["data"][0]["embedding"] == [1.0, 0.0, 0.0]
+    assert stub_server.requests == 3
+    assert transport.breaker.state == "closed"
+
+
+def test_retries_are_bounded(stub_server):
+    stub_server.default_status = 500
+    transport = _transport(stub_server, max_retries=2)
+
+    with pytest.raises(requests.HTTPError):
+        transport.post_json("embeddings", {"model": "stub", "input": ["a"]})
+    assert stub_server.requests == 3
+
+
+def test_client_errors_are_not_retried(stub_server):
+    stub_server.statuses = [400]
+    transport = _transport(stub_server, max_retries=2, breaker=CircuitBreaker(failure_threshold=1))
+
+    with pytest.raises(requests.HTTPError):
+        transport.post_json("embeddings", {"model": "stub", "input": ["a"]})
+    assert stub_server.requests == 1
+    assert transport.breaker.state == "closed"
+
+
+def test_breaker_opens_and_closes_again(stub_server):
+    stub_server.default_status = 503
+    transport = _transport(
+        stub_server, max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    )
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            transport.post_json("embeddings", {"model": "stub", "input": ["a"]})
+    assert transport.breaker.state == "open"
+
+    # Refused without touching the server
+    with pytest.raises(CircuitOpenError):
+        transport.post_json("embeddings", {"model": "stub", "input": ["a"]})
+    assert stub_server.requests == 2
+
+    time.sleep(0.25)
+    assert transport.breaker.state == "half_open"
+    stub_server.default_status = 200
+    transport.post_json("embeddings", {"model": "stub", "input": ["a"]})
+    assert transport.breaker.state == "closed"
+    assert stub_server.requests == 3
+
+
+@pytest.fixture
+def detector(tmp_path, monkeypatch):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'claims.db'}", connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    Base.metadata.create_all(engine, tables=[Applicant.__table__, FraudPattern.__table__, ClaimHistory.__table__])
+    sessions = sessionmaker(bind=engine, expire_on_commit=False)
+    monkeypatch.setattr(fraud_detector_module, "ReadSessionLocal", sessions)
+    monkeypatch.setattr(fraud_detector_module, "writer", GroupCommitWriter(sessions))
+
+    detector = FraudDetector()
+    detector.history_store = EmbeddingStore(str(tmp_path / "history_vectors"))
+    detector.pattern_index = FraudPatternIndex(sessions, FraudPattern)
+    detector.history_index = ClaimHistoryIndex(
+        sessions, ClaimHistory, str(tmp_path / "history.npz"), store=detector.history_store
+    )
+    detector.temporal_counter = TemporalClaimCounter(sessions, ClaimHistory)
+    detector.anomaly_detector = EarningsAnomalyDetector(None, sessions, Applicant)
+    yield detector
+    engine.dispose()
+
+
+def test_degraded_embedding_reaches_fraud_detector(stub_server, detector):
+    stub_server.default_status = 503
+    transport = _transport(stub_server, max_retries=1, breaker=CircuitBreaker(failure_threshold=1))
+    detector.embedding_model = TogetherEmbedding(
+        cache=None, micro_batch=False, backend=TogetherBackend("stub-model", transport)
+    )
+
+    first, second = detector.analyze_claims([CLAIM, dict(CLAIM, ssn_last4="5678")])
+    # Later claims are refused by the open breaker without another request
+    third = detector.analyze_claim(dict(CLAIM, ssn_last4="9012"))
+
+    assert stub_server.requests == 2
+    for result in (first, second, third):
+        assert result["embedding_degraded"] is True
+        assert is_degraded(result["embedding"])
+        assert result["patterns"] == []
+        assert result["duplicate_claims"] == []
+        # Scored on the remaining stages alone
+        assert result["hard_rule_violations"] == ["blacklisted_employers"]
+        assert result["score"] == 0.5
+    assert "Circuit open" in third["embedding"].reason
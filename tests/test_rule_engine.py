@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from services.rule_engine import CompiledRule, EligibilityRuleSet, RuleError, compile_condition
+
+Base = declarative_base()
+
+
+class Rule(Base):
+    __tablename__ = "eligibility_rules"
+
+    id = Column(Integer, primary_key=True)
+    rule_name = Column(String)
+    condition = Column(String)
+    message = Column(String)
+
+
+CLAIM = {"earnings": 2500.0, "employment_months": 6, "separation_reason": "Laid off"}
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("earnings >= 1000", True),
+    ("earnings >= 1000 and employment_months < 3", False),
+    ("separation_reason.lower() not in ['quit', 'resigned']", True),
+    ("max(earnings, 5000) == 5000", True),
+    ("len(separation_reason.strip()) > 20", False),
+    ("earnings / employment_months > 400 if employment_months else False", True),
+])
+def test_conditions(source, expected):
+    assert compile_condition(source)(CLAIM) is expected
+
+
+@pytest.mark.parametrize("source", [
+    "__import__('os').system('true')",
+    "earnings.__class__",
+    "separation_reason.format",
+    "[x for x in range(3)]",
+    "(lambda: 1)()",
+    "open('/etc/passwd')",
+    "CLAIM['earnings']",
+    "int(earnings, base=10)",
+    "earnings >=",
+])
+def test_rejected_at_compile_time(source):
+    with pytest.raises(RuleError):
+        compile_condition(source)
+
+
+def test_compiled_once_per_source():
+    assert compile_condition("earnings > 1") is compile_condition("earnings > 1")
+
+
+def test_missing_fields_and_runtime_errors():
+    with pytest.raises(RuleError, match="Missing field"):
+        compile_condition("weekly_hours > 20")(CLAIM)
+    with pytest.raises(RuleError, match="ZeroDivisionError"):
+        compile_condition("earnings / 0 > 1")(CLAIM)
+
+
+def test_broken_rule_raises_on_evaluate():
+    rule = CompiledRule("broken", "earnings >", "Broken")
+    assert rule.error
+    with pytest.raises(RuleError):
+        rule.evaluate(CLAIM)
+
+
+def test_rule_set_recompiles_on_change(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rules.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    rule_set = EligibilityRuleSet(session_factory, Rule, refresh_interval=3600)
+
+    with session_factory() as db:
+        db.add(Rule(rule_name="min_earnings", condition="earnings >= 1000", message="Too low"))
+        db.commit()
+    assert [rule.name for rule in rule_set.rules()] == ["min_earnings"]
+    first = rule_set.rules()
+
+    # ORM writes in this process mark the set stale despite the interval
+    with session_factory() as db:
+        db.query(Rule).one().condition = "earnings >= 5000"
+        db.commit()
+    rules = rule_set.rules()
+    assert rules is not first
+    assert rules[0].evaluate(CLAIM) is False
+
+    # Re-read after the interval: unchanged rows keep the compiled rules
+    rule_set._checked_at = 0.0
+    assert rule_set.rules() is rules
+    engine.dispose()
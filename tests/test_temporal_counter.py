@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from services.temporal_counter import TemporalClaimCounter
+
+Base = declarative_base()
+
+
+class History(Base):
+    __tablename__ = "claim_history"
+
+    id = Column(Integer, primary_key=True)
+    ssn_last4 = Column(String(4), index=True)
+    claim_date = Column(DateTime)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _insert(session_factory, ssn, claim_date=None):
+    claim_date = claim_date or datetime.now()
+    with session_factory() as db:
+        db.add(History(ssn_last4=ssn, claim_date=claim_date))
+        db.commit()
+    return claim_date
+
+
+def _file(session_factory, counter, ssn):
+    """What FraudDetector does for one claim"""
+    counter.preload([ssn])
+    counter.record(ssn, _insert(session_factory, ssn))
+
+
+def test_counts_window(session_factory):
+    _insert(session_factory, "1111", datetime.now() - timedelta(days=400))
+    _insert(session_factory, "1111", datetime.now() - timedelta(days=10))
+    counter = TemporalClaimCounter(session_factory, History)
+    assert counter.count("1111") == 1
+    _file(session_factory, counter, "1111")
+    assert counter.count("1111") == 2
+    assert counter.count("2222") == 0
+
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_workers_see_each_others_claims(session_factory, warm):
+    workers = [
+        TemporalClaimCounter(session_factory, History, refresh_interval=0)
+        for _ in range(2)
+    ]
+    if warm:
+        for counter in workers:
+            counter.warm()
+    for i in range(5):
+        _file(session_factory, workers[i % 2], "1111")
+
+    assert [counter.count("1111") for counter in workers] == [5, 5]
+    # Brand-new SSNs filed elsewhere show up too
+    _file(session_factory, workers[0], "3333")
+    assert workers[1].count("3333") == 1
+
+
+def test_refresh_interval_limits_catch_ups(session_factory):
+    counter = TemporalClaimCounter(session_factory, History, refresh_interval=3600)
+    _file(session_factory, counter, "1111")
+    _insert(session_factory, "1111")  # another worker
+    assert counter.count("1111") == 1
+    # Its own next claim brings in everything before it
+    _file(session_factory, counter, "1111")
+    assert counter.count("1111") == 3
@@ -0,0 +1,41 @@
+from sqlalchemy import create_engine
+
+from services.what_if import what_if
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'applicants.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE applicants (id INTEGER PRIMARY KEY, earnings FLOAT, "
+            "employment_months INTEGER, separation_reason TEXT)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO applicants (earnings, employment_months, separation_reason) VALUES "
+            "(500, 12, 'laid off'), (2000, 2, 'quit'), (5000, 24, 'Laid Off')"
+        )
+    return engine
+
+
+CURRENT = [{"rule_name": "minimum_earnings", "condition": "earnings >= 1000"}]
+
+
+def test_flips_between_rule_sets(tmp_path):
+    proposed = [
+        {"rule_name": "minimum_earnings", "condition": "earnings >= 400"},
+        {"rule_name": "not_quit", "condition": "separation_reason.lower() not in ['quit']"},
+    ]
+    summary = what_if(proposed, CURRENT, engine=_engine(tmp_path))
+    assert summary["applicants"] == 3
+    assert summary["current"]["eligible"] == 2
+    assert summary["proposed"]["rules"]["not_quit"] == {"pass": 2, "fail": 1}
+    assert summary["newly_eligible"] == [1]
+    assert summary["newly_ineligible"] == [2]
+
+
+def test_unknown_field_fails_only_that_rule(tmp_path):
+    proposed = CURRENT + [{"rule_name": "bonus", "condition": "bonus >= 3000"}]
+    summary = what_if(proposed, CURRENT, engine=_engine(tmp_path))
+    assert summary["proposed"]["rules"]["bonus"] == {"pass": 0, "fail": 3}
+    assert summary["proposed"]["rules"]["minimum_earnings"] == {"pass": 2, "fail": 1}
+    assert summary["proposed"]["eligible"] == 0